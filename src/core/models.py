@@ -58,6 +58,10 @@ class NetworkDevice:
     risk_score: float = 0.5
     is_gateway: bool = False
     last_seen: datetime = field(default_factory=datetime.now)
+    interface: Optional[str] = None
+    banners: Dict[int, str] = field(default_factory=dict)  # порт -> баннер сервиса
+    http_headers: Dict[str, str] = field(default_factory=dict)
+    ipv6_addresses: List[str] = field(default_factory=list)
     
     def __post_init__(self):
         """Проверка корректности IP-адреса"""
@@ -85,6 +89,10 @@ class NetworkDevice:
             'risk_score': self.risk_score,
             'is_gateway': self.is_gateway,
             'last_seen': self.last_seen.isoformat(),
+            'interface': self.interface,
+            'banners': {str(port): banner for port, banner in self.banners.items()},
+            'http_headers': self.http_headers,
+            'ipv6_addresses': self.ipv6_addresses,
         }
     
     @classmethod
@@ -99,7 +107,11 @@ class NetworkDevice:
             open_ports=data.get('open_ports', []),
             os_info=data.get('os_info'),
             risk_score=data.get('risk_score', 0.5),
-            is_gateway=data.get('is_gateway', False)
+            is_gateway=data.get('is_gateway', False),
+            interface=data.get('interface'),
+            banners={int(port): banner for port, banner in data.get('banners', {}).items()},
+            http_headers=data.get('http_headers', {}),
+            ipv6_addresses=data.get('ipv6_addresses', [])
         )
         if 'last_seen' in data:
             device.last_seen = datetime.fromisoformat(data['last_seen'])
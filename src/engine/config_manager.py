@@ -39,7 +39,7 @@ class ConfigManager:
                 'network_range': 'auto',
                 'scan_speed': 'normal',
                 'port_timeout': 1000,
-                'max_hosts': 254,
+                'max_hosts': 65534,
                 'auto_classify': True,
             },
             'security': {
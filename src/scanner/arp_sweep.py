@@ -0,0 +1,156 @@
+"""
+Шардированное ARP-сканирование больших подсетей
+"""
+
+import ipaddress
+import threading
+import time
+from queue import Empty, Queue
+from typing import Callable, Iterator, Optional, Tuple
+
+from scapy.all import ARP, Ether, AsyncSniffer, conf
+
+from ..core.exceptions import ScanError
+
+class ArpSweeper:
+    """
+    ARP-сканер для подсетей /20-/16 и больше
+    
+    Сеть делится на блоки (шарды). Отправка запросов идет в отдельном
+    потоке с ограничением скорости, а ответы собирает один сниффер на
+    весь скан, поэтому прием ответов на предыдущий блок совмещен с
+    отправкой следующего. Пакеты создаются по одному, а не списком
+    на всю сеть.
+    """
+    
+    def __init__(self, shard_prefix: int = 24, rate: float = 500, timeout: float = 2,
+                 iface: Optional[str] = None, logger=None):
+        self.shard_prefix = shard_prefix
+        self.rate = rate
+        self.timeout = timeout
+        self.iface = iface
+        self.logger = logger
+    
+    def shards(self, network: str) -> Iterator[ipaddress.IPv4Network]:
+        """Разбить сеть на блоки"""
+        net = ipaddress.IPv4Network(network, strict=False)
+        if net.prefixlen >= self.shard_prefix:
+            yield net
+        else:
+            yield from net.subnets(new_prefix=self.shard_prefix)
+    
+    def sweep(self, network: str, should_stop: Optional[Callable[[], bool]] = None,
+              iface: Optional[str] = None, timeout: Optional[float] = None,
+              on_rtt: Optional[Callable[[str, float], None]] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Просканировать сеть
+        
+        Args:
+            network: Сеть в формате CIDR
+            should_stop: Если возвращает True, отправка запросов прекращается
+            iface: Интерфейс (по умолчанию - заданный в конструкторе)
+            timeout: Ожидание ответов после последнего запроса (по умолчанию - из конструктора)
+            on_rtt: Вызывается с (ip, время отклика в секундах) для каждого ответа
+        
+        Returns:
+            Поток пар (ip, mac) в порядке получения ответов
+        """
+        net = ipaddress.IPv4Network(network, strict=False)
+        replies = Queue()
+        seen = set()
+        sent_at = {}
+        finished = object()
+        stop = threading.Event()
+        errors = []
+        iface = iface or self.iface
+        timeout = self.timeout if timeout is None else timeout
+        
+        def on_packet(packet):
+            if ARP not in packet or packet[ARP].op != 2:
+                return
+            ip = packet[ARP].psrc
+            if ip in seen or ipaddress.IPv4Address(ip) not in net:
+                return
+            seen.add(ip)
+            if on_rtt and ip in sent_at:
+                on_rtt(ip, max(0.0, float(packet.time) - sent_at[ip]))
+            replies.put((ip, packet[ARP].hwsrc))
+        
+        sniffer = AsyncSniffer(iface=iface, filter="arp", prn=on_packet, store=False)
+        sniffer.start()
+        
+        sender = threading.Thread(
+            target=self._send_requests,
+            args=(net, iface, timeout, sent_at, stop, replies, finished, errors, should_stop),
+            name="arp-sweep",
+            daemon=True
+        )
+        sender.start()
+        
+        try:
+            while True:
+                item = replies.get()
+                if item is finished:
+                    break
+                yield item
+            
+            # Ответы, пришедшие между окончанием отправки и остановкой сниффера
+            sniffer.stop()
+            while True:
+                try:
+                    yield replies.get_nowait()
+                except Empty:
+                    break
+        finally:
+            stop.set()
+            sender.join()
+            if sniffer.running:
+                sniffer.stop()
+        
+        if errors:
+            raise ScanError(f"Ошибка отправки ARP-запросов: {errors[0]}")
+    
+    def _send_requests(self, net: ipaddress.IPv4Network, iface: Optional[str],
+                       timeout: float, sent_at: dict, stop: threading.Event, replies: Queue,
+                       finished, errors: list, should_stop: Optional[Callable[[], bool]]):
+        """Отправить ARP-запросы по всем блокам с ограничением скорости"""
+        interval = 1.0 / self.rate if self.rate else 0
+        sent = 0
+        started = time.monotonic()
+        skip = {net.network_address, net.broadcast_address} if net.prefixlen < 31 else set()
+        sock = None
+        
+        try:
+            sock = conf.L2socket(iface=iface or conf.iface)
+            
+            for shard in self.shards(str(net)):
+                if stop.is_set() or (should_stop and should_stop()):
+                    return
+                
+                if self.logger:
+                    self.logger.debug(f"ARP-сканирование блока {shard}")
+                
+                # Адреса сети и broadcast исключаются только для всей сети, не для блока
+                for ip in shard:
+                    if ip in skip:
+                        continue
+                    if stop.is_set():
+                        return
+                    
+                    sent_at[str(ip)] = time.time()
+                    sock.send(Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=str(ip)))
+                    sent += 1
+                    
+                    # Ограничение скорости: не опережаем расписание rate пакетов/с
+                    delay = started + sent * interval - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+            
+            # Ждем запоздавшие ответы на последний блок
+            stop.wait(timeout)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            if sock is not None:
+                sock.close()
+            replies.put(finished)
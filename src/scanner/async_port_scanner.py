@@ -0,0 +1,312 @@
+"""
+Сканер портов на asyncio (TCP connect) - бэкенд без зависимости от nmap
+"""
+
+import asyncio
+import ipaddress
+import socket
+import threading
+from collections import deque
+from queue import Queue
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..core.exceptions import ScanError
+from .rate_controller import RateController
+
+class _SlotLimiter:
+    """
+    Счетчик занятых слотов, общий для всех потоков и циклов событий
+    
+    Состояние защищено threading.Lock, ожидающие корутины ждут future
+    своего цикла и будятся через call_soon_threadsafe, поэтому один
+    сканер можно одновременно использовать из нескольких asyncio.run().
+    Предел передается функцией и может меняться во время скана.
+    """
+    
+    def __init__(self, limit: Callable[[], int]):
+        self._limit = limit
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiters = deque()
+    
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+    
+    async def acquire(self):
+        """Занять слот, дождавшись освобождения при необходимости"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._in_use < self._limit():
+                    self._in_use += 1
+                    return
+                future = loop.create_future()
+                waiter = (loop, future)
+                self._waiters.append(waiter)
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    woken = waiter not in self._waiters
+                    if not woken:
+                        self._waiters.remove(waiter)
+                # Пробуждение досталось отмененной корутине - передаем его дальше
+                if woken:
+                    self._wake()
+                raise
+    
+    def release(self):
+        """Освободить слот"""
+        with self._lock:
+            self._in_use -= 1
+        self._wake()
+    
+    def _wake(self):
+        """Разбудить столько ожидающих, сколько свободно слотов"""
+        with self._lock:
+            free = self._limit() - self._in_use
+            woken = [self._waiters.popleft() for _ in range(min(max(free, 0), len(self._waiters)))]
+        for loop, future in woken:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # Цикл ожидающего уже закрыт
+                pass
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+class AsyncPortScanner:
+    """
+    Сканер TCP-портов на неблокирующих connect() в одном цикле событий
+    
+    Все соединения всех хостов проходят через общий лимит, поэтому
+    max_concurrency ограничивает число одновременно открытых сокетов
+    на весь сканер, а не на отдельный хост - в том числе когда сканер
+    одновременно используется из нескольких потоков (scan_all_networks).
+    
+    С rate_controller таймаут и число повторов каждой пробы берутся из
+    оценки времени отклика хоста, а число одновременных соединений - из
+    текущего окна контроллера (не больше max_concurrency). Окно сужают
+    только ошибки сети, а не таймауты фильтруемых портов.
+    """
+    
+    def __init__(self, max_concurrency: int = 1000, connect_timeout: float = 1.0,
+                 host_timeout: float = 30.0, logger=None,
+                 rate_controller: Optional[RateController] = None):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.connect_timeout = connect_timeout
+        self.host_timeout = host_timeout
+        self.logger = logger
+        self.rate_controller = rate_controller
+        self._connections = _SlotLimiter(lambda: self.max_concurrency)
+        self._window = _SlotLimiter(lambda: self.rate_controller.parallelism)
+    
+    async def check_port(self, ip: str, port: int) -> Optional[bool]:
+        """
+        Проверить один порт (с повторами, если задан rate_controller)
+        
+        Returns:
+            True - порт открыт, False - соединение отклонено,
+            None - нет ответа (таймаут или недоступность)
+        """
+        attempts = 1 + (self.rate_controller.retries_for(ip) if self.rate_controller else 0)
+        
+        state = None
+        for _ in range(attempts):
+            state = await self._probe(ip, port)
+            if state is not None:
+                break
+        return state
+    
+    async def _probe(self, ip: str, port: int) -> Optional[bool]:
+        """
+        Одна попытка соединения
+        
+        Таймаут соединения - обычный исход для фильтруемого порта, поэтому
+        он не считается потерей (см. RateController.record_timeout). Потеря -
+        ошибка сети (хост или сеть недоступны) или нехватка сокетов; такая
+        проба тоже возвращает None, а не прерывает сканирование хоста.
+        """
+        family = socket.AF_INET6 if ipaddress.ip_address(ip).version == 6 else socket.AF_INET
+        loop = asyncio.get_running_loop()
+        controller = self.rate_controller
+        
+        await self._connections.acquire()
+        try:
+            if controller:
+                await self._window.acquire()
+            try:
+                timeout = controller.timeout_for(ip) if controller else self.connect_timeout
+                started = loop.time()
+                sock = socket.socket(family, socket.SOCK_STREAM)
+                try:
+                    sock.setblocking(False)
+                    await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout=timeout)
+                    state = True
+                except ConnectionRefusedError:
+                    state = False
+                finally:
+                    sock.close()
+            except asyncio.TimeoutError:
+                if controller:
+                    controller.record_timeout(ip)
+                return None
+            except OSError as e:
+                if controller:
+                    controller.record_loss(ip)
+                if self.logger:
+                    self.logger.debug(f"Ошибка соединения с {ip}:{port}: {e}")
+                return None
+            finally:
+                if controller:
+                    self._window.release()
+            
+            # И SYN-ACK, и RST - ответ хоста, пригодный для оценки RTT
+            if controller:
+                controller.record_rtt(ip, loop.time() - started)
+            return state
+        finally:
+            self._connections.release()
+    
+    async def scan_host(self, ip: str, ports: Iterable[int]) -> Dict:
+        """Просканировать порты одного хоста (в формате port_info)"""
+        tasks = {
+            asyncio.ensure_future(self.check_port(ip, port)): port
+            for port in ports
+        }
+        
+        done, pending = await asyncio.wait(tasks, timeout=self.host_timeout)
+        
+        # Хост не уложился в свой таймаут - отдаем то, что успели узнать
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            if self.logger:
+                self.logger.debug(f"Таймаут сканирования хоста {ip}: не проверено портов {len(pending)}")
+        
+        open_ports = []
+        responded = False
+        for task in done:
+            state = task.result()
+            if state is not None:
+                responded = True
+            if state:
+                open_ports.append(tasks[task])
+        
+        return {
+            'open_ports': sorted(open_ports),
+            'os_info': None,
+            'hostname': None,
+            'status': 'up' if responded else 'down'
+        }
+    
+    async def iter_scan(self, hosts: Iterable[str], ports: Union[List[int], Dict[str, List[int]]],
+                        expand: Optional[Callable[[str, Dict], List[int]]] = None
+                        ) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Поток результатов (ip, port_info) по мере завершения хостов
+        
+        Args:
+            hosts: IP-адреса хостов
+            ports: Порты для всех хостов или словарь ip -> порты
+            expand: Вызывается с (ip, port_info) после первого прохода и
+                    возвращает порты для второго прохода (пустой список - не нужен)
+        """
+        async def scan(ip: str) -> Tuple[str, Dict]:
+            port_info = await self.scan_host(ip, ports[ip] if isinstance(ports, dict) else ports)
+            extra = expand(ip, port_info) if expand else None
+            if extra:
+                more = await self.scan_host(ip, extra)
+                port_info['open_ports'] = sorted(set(port_info['open_ports']) | set(more['open_ports']))
+                if more['status'] == 'up':
+                    port_info['status'] = 'up'
+            return ip, port_info
+        
+        tasks = [asyncio.ensure_future(scan(ip)) for ip in hosts]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Потребитель прервал итерацию - не оставляем висящих соединений
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def scan(self, hosts: Iterable[str], ports: Union[List[int], Dict[str, List[int]]],
+             on_result: Optional[Callable[[str, Dict], None]] = None,
+             should_stop: Optional[Callable[[], bool]] = None,
+             expand: Optional[Callable[[str, Dict], List[int]]] = None) -> Dict[str, Dict]:
+        """
+        Синхронно просканировать хосты
+        
+        Args:
+            hosts: IP-адреса хостов
+            ports: Порты для проверки (общие или словарь ip -> порты)
+            expand: Выбор портов второго прохода (см. iter_scan)
+            on_result: Вызывается для каждого хоста сразу после его завершения
+            should_stop: Если возвращает True, сканирование прерывается
+        
+        Returns:
+            Словарь ip -> port_info
+        """
+        async def run() -> Dict[str, Dict]:
+            results = {}
+            stream = self.iter_scan(hosts, ports, expand)
+            try:
+                async for ip, port_info in stream:
+                    results[ip] = port_info
+                    if on_result:
+                        on_result(ip, port_info)
+                    if should_stop and should_stop():
+                        break
+            finally:
+                await stream.aclose()
+            return results
+        
+        return asyncio.run(run())
+    
+    def iter_results(self, hosts: Iterable[str], ports: Union[List[int], Dict[str, List[int]]],
+                     expand: Optional[Callable[[str, Dict], List[int]]] = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        Синхронный поток результатов (ip, port_info)
+        
+        Цикл событий работает в отдельном потоке, поэтому медленный
+        потребитель не задерживает соединения и не вызывает ложных таймаутов.
+        """
+        results = Queue()
+        stop = threading.Event()
+        finished = object()
+        errors = []
+        
+        def run():
+            try:
+                self.scan(
+                    hosts, ports,
+                    on_result=lambda ip, port_info: results.put((ip, port_info)),
+                    should_stop=stop.is_set,
+                    expand=expand
+                )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                results.put(finished)
+        
+        thread = threading.Thread(target=run, name="async-port-scan", daemon=True)
+        thread.start()
+        
+        try:
+            while True:
+                item = results.get()
+                if item is finished:
+                    break
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+        
+        if errors:
+            raise ScanError(f"Ошибка асинхронного сканирования портов: {errors[0]}")
@@ -0,0 +1,209 @@
+"""
+Сбор баннеров сервисов (приветствия и HTTP-заголовки) на asyncio
+"""
+
+import asyncio
+import ssl
+import threading
+from concurrent.futures import Future
+from typing import Dict, Iterable, Optional
+
+# Порты, на которых сервер ждет запроса, а не здоровается первым
+HTTP_PORTS = {80, 81, 591, 5000, 7080, 8000, 8008, 8080, 8081, 8088, 8888, 9000, 49152}
+HTTPS_PORTS = {443, 5001, 7443, 8443, 9443}
+RTSP_PORTS = {554, 8554}
+
+class BannerGrabber:
+    """
+    Сборщик баннеров
+    
+    Для HTTP(S) отправляется HEAD-запрос и разбираются заголовки ответа,
+    для RTSP - OPTIONS, у остальных сервисов (SSH, FTP, SMTP, POP3, IMAP,
+    Telnet...) читается приветствие. Каждое соединение ограничено по
+    времени и по числу прочитанных байт, общее число соединений - семафором.
+    
+    Цикл событий работает в отдельном потоке и принимает задания через
+    submit(), поэтому сбор идет параллельно со сканированием портов.
+    """
+    
+    def __init__(self, max_concurrency: int = 200, connect_timeout: float = 1.0,
+                 read_timeout: float = 2.0, max_bytes: int = 1024,
+                 host_timeout: float = 10.0, logger=None):
+        """
+        Args:
+            max_concurrency: Предел одновременных соединений
+            connect_timeout: Таймаут соединения, секунды
+            read_timeout: Таймаут чтения ответа, секунды
+            max_bytes: Предел прочитанных байт на соединение
+            host_timeout: Предел времени на все порты хоста, секунды
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_bytes = max(1, int(max_bytes))
+        self.host_timeout = host_timeout
+        self.logger = logger
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        
+        # Баннеры собираются и с устройств с самоподписанными сертификатами
+        self._ssl_context = ssl.create_default_context()
+        self._ssl_context.check_hostname = False
+        self._ssl_context.verify_mode = ssl.CERT_NONE
+    
+    def _request(self, ip: str, port: int) -> Optional[bytes]:
+        """Запрос, который нужно отправить для получения баннера"""
+        if port in HTTP_PORTS or port in HTTPS_PORTS:
+            return (
+                f"HEAD / HTTP/1.0\r\nHost: {ip}\r\n"
+                f"User-Agent: ZeroTrust-Inspector\r\nConnection: close\r\n\r\n"
+            ).encode()
+        if port in RTSP_PORTS:
+            return f"OPTIONS rtsp://{ip}:{port} RTSP/1.0\r\nCSeq: 1\r\n\r\n".encode()
+        return None
+    
+    async def _read(self, reader: asyncio.StreamReader, until_newline: bool) -> bytes:
+        """
+        Прочитать не больше max_bytes до закрытия соединения или таймаута
+        
+        Args:
+            until_newline: Остановиться после первой полной строки (приветствие)
+        """
+        data = b""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.read_timeout
+        
+        while len(data) < self.max_bytes:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(reader.read(self.max_bytes - len(data)), remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            data += chunk
+            if until_newline and b"\n" in data:
+                break
+        
+        return data
+    
+    async def grab(self, ip: str, port: int) -> Optional[bytes]:
+        """Получить сырой ответ сервиса (None - соединение не удалось)"""
+        request = self._request(ip, port)
+        use_tls = port in HTTPS_PORTS
+        
+        async with self._semaphore:
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(ip, port, ssl=self._ssl_context if use_tls else None),
+                    timeout=self.connect_timeout
+                )
+            except (asyncio.TimeoutError, OSError):
+                return None
+            
+            try:
+                if request:
+                    writer.write(request)
+                    await asyncio.wait_for(writer.drain(), self.read_timeout)
+                return await self._read(reader, until_newline=request is None)
+            except (asyncio.TimeoutError, OSError):
+                return None
+            finally:
+                writer.close()
+                try:
+                    await asyncio.wait_for(writer.wait_closed(), self.connect_timeout)
+                except (asyncio.TimeoutError, OSError):
+                    pass
+    
+    @staticmethod
+    def parse_http_headers(response: bytes) -> Dict[str, str]:
+        """Заголовки из ответа HTTP/RTSP"""
+        headers = {}
+        head = response.split(b"\r\n\r\n", 1)[0].decode("latin-1")
+        for line in head.split("\r\n")[1:]:
+            name, sep, value = line.partition(":")
+            if sep and name.strip():
+                headers[name.strip()] = value.strip()
+        return headers
+    
+    async def grab_host(self, ip: str, ports: Iterable[int]) -> Dict:
+        """
+        Собрать баннеры с открытых портов хоста
+        
+        Returns:
+            {'banners': {порт: текст}, 'http_headers': {заголовок: значение}}
+        """
+        ports = sorted(set(ports))
+        tasks = {asyncio.ensure_future(self.grab(ip, port)): port for port in ports}
+        done, pending = await asyncio.wait(tasks, timeout=self.host_timeout) if tasks else (set(), set())
+        
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        banners = {}
+        http_headers = {}
+        for task in sorted(done, key=tasks.get):
+            if task.exception() is not None or not task.result():
+                continue
+            port, response = tasks[task], task.result()
+            if response.startswith((b"HTTP/", b"RTSP/")):
+                headers = self.parse_http_headers(response)
+                if port not in RTSP_PORTS:
+                    # Заголовки первого по номеру HTTP-порта имеют приоритет
+                    for name, value in headers.items():
+                        http_headers.setdefault(name, value)
+                status_line = response.split(b"\r\n", 1)[0].decode("latin-1")
+                server = headers.get("Server")
+                banners[port] = f"{status_line} | Server: {server}" if server else status_line
+            else:
+                banners[port] = response.decode("utf-8", errors="replace").strip()
+        
+        return {
+            'banners': {port: banners[port] for port in sorted(banners)},
+            'http_headers': http_headers,
+        }
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Запустить фоновый цикл событий при первом обращении"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                    ready.set()
+                    loop.run_forever()
+                
+                self._thread = threading.Thread(target=run, name="banner-grab", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+    
+    def submit(self, ip: str, ports: Iterable[int]) -> Future:
+        """Поставить хост в очередь сбора (результат grab_host во Future)"""
+        return asyncio.run_coroutine_threadsafe(self.grab_host(ip, list(ports)), self._ensure_loop())
+    
+    def grab_many(self, hosts: Dict[str, Iterable[int]]) -> Dict[str, Dict]:
+        """Синхронно собрать баннеры нескольких хостов параллельно"""
+        futures = {ip: self.submit(ip, ports) for ip, ports in hosts.items()}
+        return {ip: future.result() for ip, future in futures.items()}
+    
+    def close(self):
+        """Остановить фоновый цикл событий"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
@@ -3,68 +3,119 @@
 """
 
 import re
-from typing import Dict, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence
 import json
 from pathlib import Path
 
 from src.core.models import NetworkDevice, DeviceType
 from src.core.constants import ASSETS_DIR
 from src.core.exceptions import DeviceClassificationError
+from src.scanner.oui_database import get_oui_lookup
+from src.scanner.keyword_matcher import KeywordMatcher
+from src.scanner.rule_compiler import Rule, RuleSet, np, port_matrix
+
+# Базовый риск по типу устройства
+TYPE_RISK = {
+    DeviceType.ROUTER: 0.3,
+    DeviceType.COMPUTER: 0.2,
+    DeviceType.PHONE: 0.3,
+    DeviceType.TABLET: 0.3,
+    DeviceType.IOT: 0.5,
+    DeviceType.PRINTER: 0.4,
+    DeviceType.CAMERA: 0.6,
+    DeviceType.TV: 0.5,
+    DeviceType.NAS: 0.4,
+    DeviceType.SERVER: 0.3,
+    DeviceType.UNKNOWN: 0.5,
+}
+
+# Надбавка за открытые порты небезопасных сервисов
+PORT_RISK = {
+    21: 0.15,     # FTP
+    23: 0.3,      # Telnet
+    80: 0.05,     # HTTP без шифрования
+    139: 0.1,     # NetBIOS
+    161: 0.1,     # SNMP
+    445: 0.15,    # SMB
+    554: 0.1,     # RTSP
+    1883: 0.1,    # MQTT без шифрования
+    1900: 0.1,    # UPnP
+    3389: 0.15,   # RDP
+    5900: 0.2,    # VNC
+    37777: 0.15,  # Dahua DVR
+}
 
 class DeviceClassifier:
-    """Классификатор сетевых устройств"""
+    """
+    Классификатор сетевых устройств
     
-    def __init__(self):
-        self.oui_db = self._load_oui_database()
-        self.fingerprints = self._load_fingerprints()
-        self.rules = self._get_classification_rules()
+    Результаты запоминаются в LRU-кэше по исходным признакам (производитель,
+    имя хоста, окончание IP-адреса, порты): ключ строится без запуска
+    правил, поэтому типовые устройства одной модели классифицируются
+    одним поиском в словаре.
+    """
     
-    def _load_oui_database(self) -> Dict[str, str]:
+    def __init__(self, cache_size: int = 4096):
         """
-        Загрузить базу данных OUI (Organizationally Unique Identifier)
-        MAC-адреса: первые 3 байта определяют производителя
+        Args:
+            cache_size: Предел числа ключей в кэше классификации (0 - без кэша)
         """
-        oui_file = ASSETS_DIR / "oui_database.json"
-        
-        if oui_file.exists():
-            with open(oui_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        
-        # Минимальная база для начала работы
-        return {
-            "00:11:22": "Cisco Systems",
-            "00:50:56": "VMware",
-            "00:0C:29": "VMware",
-            "00:1A:2B": "ASUSTek",
-            "00:1D:0F": "TP-Link",
-            "00:26:18": "Raspberry Pi",
-            "00:26:5A": "Apple",
-            "00:50:F1": "Microsoft",
-            "00:E0:4C": "Realtek",
-            "08:00:27": "VirtualBox",
-            "0C:4D:E9": "Apple",
-            "18:68:CB": "Xiaomi",
-            "28:6C:07": "Philips",
-            "34:CE:00": "TP-Link",
-            "50:C7:BF": "TP-Link",
-            "74:AC:5F": "Qingdao",
-            "84:0D:8E": "TP-Link",
-            "A4:50:46": "Xiaomi",
-            "B8:27:EB": "Raspberry Pi",
-            "CC:46:D6": "Cisco",
-            "D8:BB:2C": "Apple",
-            "E4:8B:7F": "Xiaomi",
-            "F0:9F:C2": "Ubiquiti",
-        }
+        # Индекс OUI общий для всех экземпляров (mmap)
+        self.oui_lookup = get_oui_lookup()
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache: "OrderedDict[tuple, DeviceType]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.reload()
+    
+    def reload(self):
+        """Перечитать отпечатки, перекомпилировать правила и сбросить кэш"""
+        self.fingerprints = self._load_fingerprints()
+        self.rules = self._get_classification_rules()
+        # Правила компилируются один раз: порты - в битовые маски,
+        # ключевые слова правил и отпечатков - в один общий автомат
+        self._keywords = KeywordMatcher()
+        self._rules = self._compile_rules()
+        self._port_rules = self._compile_port_rules()
+        # Наборы слов отпечатков - те же категории, что в правилах по портам
+        self._fingerprint_bits: Dict[str, int] = {}
+        for name, fingerprint in self.fingerprints.items():
+            keywords = tuple(fingerprint.get('keywords', []))
+            if keywords:
+                self._fingerprint_bits[name] = self._keywords.add_category(keywords, keywords)
+        self.clear_cache()
+    
+    def clear_cache(self):
+        """Очистить кэш классификации (счетчики сохраняются)"""
+        with self._lock:
+            self._cache.clear()
+    
+    def cache_info(self) -> Dict:
+        """Статистика кэша классификации"""
+        with self._lock:
+            return {
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'size': len(self._cache),
+                'max_size': self.cache_size,
+            }
     
     def _load_fingerprints(self) -> Dict:
         """Загрузить отпечатки устройств"""
-        fingerprints_file = ASSETS_DIR / "device_fingerprints.json"
+        fingerprints_file = Path(ASSETS_DIR) / "device_fingerprints.json"
         
         if fingerprints_file.exists():
             with open(fingerprints_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
         
+        return self._default_fingerprints()
+    
+    @staticmethod
+    def _default_fingerprints() -> Dict:
+        """Отпечатки на случай отсутствия файла"""
         return {
             "printers": {
                 "ports": [9100, 515, 631],
@@ -85,60 +136,247 @@ class DeviceClassifier:
         }
     
     def _get_classification_rules(self) -> Dict:
-        """Правила классификации"""
+        """Правила классификации (по типам в порядке приоритета)"""
         return {
             DeviceType.ROUTER: [
-                lambda d: self._check_ports(d, [53, 67, 68]),  # DNS, DHCP
-                lambda d: d.ip_address.endswith('.1') or d.ip_address.endswith('.254'),
-                lambda d: self._check_vendor_keywords(d, ['cisco', 'mikrotik', 'asus', 'tp-link', 'ubiquiti']),
+                Rule(any_ports=(53, 67, 68)),  # DNS, DHCP
+                Rule(ip_suffixes=('.1', '.254')),
+                Rule(vendor_keywords=('cisco', 'mikrotik', 'asus', 'tp-link', 'ubiquiti')),
             ],
             DeviceType.COMPUTER: [
-                lambda d: self._check_ports(d, [22, 3389, 445, 139]),  # SSH, RDP, SMB
-                lambda d: self._check_vendor_keywords(d, ['microsoft', 'apple', 'dell', 'hp', 'lenovo']),
-                lambda d: len(d.open_ports) > 5,  # Много открытых портов
+                Rule(any_ports=(22, 3389, 445, 139)),  # SSH, RDP, SMB
+                Rule(vendor_keywords=('microsoft', 'apple', 'dell', 'hp', 'lenovo')),
+                Rule(more_ports_than=5),  # Много открытых портов
             ],
             DeviceType.PHONE: [
-                lambda d: self._check_vendor_keywords(d, ['apple', 'samsung', 'xiaomi', 'huawei']),
-                lambda d: self._check_ports(d, [62078, 5353]),  # iOS/Android порты
+                Rule(vendor_keywords=('apple', 'samsung', 'xiaomi', 'huawei')),
+                Rule(any_ports=(62078, 5353)),  # iOS/Android порты
             ],
             DeviceType.IOT: [
-                lambda d: self._check_ports(d, [80]) and len(d.open_ports) <= 3,
-                lambda d: self._check_vendor_keywords(d, ['philips', 'xiaomi', 'yeelight', 'smart']),
-                lambda d: 'camera' in str(d.hostname).lower() if d.hostname else False,
+                Rule(any_ports=(80,), max_ports=3),
+                Rule(vendor_keywords=('philips', 'xiaomi', 'yeelight', 'smart')),
+                Rule(hostname_keywords=('camera',)),
             ],
             DeviceType.PRINTER: [
-                lambda d: self._check_ports(d, [9100, 515, 631]),
-                lambda d: self._check_vendor_keywords(d, ['hp', 'epson', 'canon', 'brother']),
+                Rule(any_ports=(9100, 515, 631)),
+                Rule(vendor_keywords=('hp', 'epson', 'canon', 'brother')),
             ],
             DeviceType.CAMERA: [
-                lambda d: self._check_ports(d, [80, 554, 37777]),
-                lambda d: self._check_vendor_keywords(d, ['hikvision', 'dahua', 'camera']),
+                Rule(any_ports=(80, 554, 37777)),
+                Rule(vendor_keywords=('hikvision', 'dahua', 'camera')),
             ],
         }
     
+    def _compile_rules(self) -> RuleSet:
+        """Скомпилировать правила классификации"""
+        return RuleSet([
+            (device_type, rule)
+            for device_type, rules in self.rules.items()
+            for rule in rules
+        ], matcher=self._keywords)
+    
+    def _compile_port_rules(self) -> RuleSet:
+        """
+        Скомпилировать классификацию по портам: отпечатки (порт и ключевое
+        слово в имени хоста), затем эвристики
+        """
+        type_map = {
+            'printers': DeviceType.PRINTER,
+            'cameras': DeviceType.CAMERA,
+            'iot': DeviceType.IOT,
+            'routers': DeviceType.ROUTER,
+        }
+        rules = []
+        for name, fingerprint in self.fingerprints.items():
+            ports = tuple(fingerprint.get('ports', []))
+            keywords = tuple(fingerprint.get('keywords', []))
+            if ports and keywords:
+                rules.append((
+                    type_map.get(name, DeviceType.UNKNOWN),
+                    Rule(any_ports=ports, hostname_keywords=keywords)
+                ))
+        
+        rules += [
+            (DeviceType.PRINTER, Rule(any_ports=(9100,))),
+            (DeviceType.COMPUTER, Rule(any_ports=(3389,))),
+            (DeviceType.COMPUTER, Rule(all_ports=(22, 445))),
+            (DeviceType.IOT, Rule(any_ports=(80,), max_ports=3)),
+            (DeviceType.ROUTER, Rule(any_ports=(53, 67, 68))),
+        ]
+        return RuleSet(rules, distinct_ports=True, matcher=self._keywords)
+    
     def classify_device(self, device: NetworkDevice) -> DeviceType:
         """
         Классифицировать устройство на основе множества признаков
         """
-        if not device.mac_address:
-            return self._classify_by_ports(device)
-        
         # 1. Определяем производителя по MAC
-        vendor = self.get_vendor_from_mac(device.mac_address)
-        if vendor:
-            device.vendor = vendor
-        
-        # 2. Пробуем классифицировать по правилам
-        for device_type, rules in self.rules.items():
-            for rule in rules:
-                try:
-                    if rule(device):
-                        return device_type
-                except Exception:
-                    continue
-        
-        # 3. Если не удалось, классифицируем по портам
-        return self._classify_by_ports(device)
+        self._update_vendor(device)
+        
+        # 2. Правила применяются к устройствам с MAC, остальные - по портам
+        return self._classify_cached(device, use_rules=bool(device.mac_address))
+    
+    def classify(self, vendor: Optional[str], open_ports: Iterable[int],
+                 os_info: Optional[str] = None, ip_address: Optional[str] = None,
+                 hostname: Optional[str] = None) -> DeviceType:
+        """
+        Классифицировать по уже собранным признакам (производитель известен)
+        
+        Без ip_address правила по адресу шлюза не применяются.
+        """
+        device = NetworkDevice(
+            ip_address=ip_address or "0.0.0.0",
+            hostname=hostname,
+            vendor=vendor,
+            open_ports=list(open_ports),
+            os_info=os_info
+        )
+        return self._classify_cached(device, use_rules=True)
+    
+    def classify_many(self, devices: Sequence[NetworkDevice]) -> List[DeviceType]:
+        """
+        Классифицировать список устройств (как classify_device для каждого)
+        
+        Производители определяются одним проходом по индексу OUI (поиск на
+        каждый различный префикс), ключи, которых нет в кэше, проверяются
+        для всего списка сразу (см. RuleSet.match_many), по одному
+        устройству на ключ.
+        """
+        with_mac = [device for device in devices if device.mac_address]
+        vendors = self.oui_lookup.get_vendors(device.mac_address for device in with_mac)
+        for device, vendor in zip(with_mac, vendors):
+            if vendor:
+                device.vendor = vendor
+        
+        cache_key = self._cache_key
+        keys = [cache_key(device, bool(device.mac_address)) for device in devices]
+        types: List[Optional[DeviceType]] = [None] * len(devices)
+        missing: Dict[tuple, List[int]] = {}
+        
+        with self._lock:
+            for index, key in enumerate(keys):
+                device_type = self._cache.get(key)
+                if device_type is None:
+                    missing.setdefault(key, []).append(index)
+                else:
+                    self._cache.move_to_end(key)
+                    types[index] = device_type
+            self.cache_hits += len(devices) - len(missing)
+            self.cache_misses += len(missing)
+        
+        # Одно устройство-представитель на ключ; без MAC - только по портам
+        representatives = [devices[indexes[0]] for indexes in missing.values()]
+        with_mac = [device for device in representatives if device.mac_address]
+        by_rules = iter(self._rules.match_many(with_mac))
+        found = [next(by_rules) if device.mac_address else None for device in representatives]
+        
+        fallback = [index for index, device_type in enumerate(found) if device_type is None]
+        by_ports = self._port_rules.match_many([representatives[index] for index in fallback])
+        for index, device_type in zip(fallback, by_ports):
+            if device_type is None or not representatives[index].open_ports:
+                device_type = DeviceType.UNKNOWN
+            found[index] = device_type
+        
+        for indexes, device_type in zip(missing.values(), found):
+            for index in indexes:
+                types[index] = device_type
+        self._remember_many(list(missing), found)
+        
+        return types
+    
+    def _update_vendor(self, device: NetworkDevice):
+        """Записать в устройство производителя по MAC, если он известен"""
+        if device.mac_address:
+            vendor = self.get_vendor_from_mac(device.mac_address)
+            if vendor:
+                device.vendor = vendor
+    
+    def _cache_key(self, device: NetworkDevice, use_rules: bool) -> tuple:
+        """
+        Ключ кэша из исходных признаков (без запуска автоматов правил)
+        
+        Из IP-адреса берется только маска правил по его окончанию: это одно
+        сравнение, а адреса устройств одной модели различаются.
+        """
+        if use_rules:
+            return (True, device.vendor, device.hostname,
+                    self._rules.ip_mask(device.ip_address), tuple(device.open_ports))
+        # По портам: производитель и адрес правилами не используются
+        return (False, None, device.hostname, None, tuple(device.open_ports))
+    
+    def _remember(self, key: tuple, device_type: DeviceType):
+        """Сохранить результат в кэше, вытесняя давно не использованные"""
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[key] = device_type
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def _remember_many(self, keys: List[tuple], device_types: List[DeviceType]):
+        """Сохранить результаты пакета одной блокировкой"""
+        if self.cache_size <= 0:
+            return
+        # Вошедшие раньше все равно были бы вытеснены последними cache_size
+        start = max(0, len(keys) - self.cache_size)
+        with self._lock:
+            for key, device_type in zip(keys[start:], device_types[start:]):
+                self._cache[key] = device_type
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def _classify_cached(self, device: NetworkDevice, use_rules: bool) -> DeviceType:
+        """Классификация через кэш по исходным признакам"""
+        key = self._cache_key(device, use_rules)
+        with self._lock:
+            device_type = self._cache.get(key)
+            if device_type is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return device_type
+            self.cache_misses += 1
+        
+        device_type = self._rules.match(device) if use_rules else None
+        if device_type is None:
+            # Если не удалось, классифицируем по портам
+            device_type = self._classify_by_ports(device)
+        
+        self._remember(key, device_type)
+        return device_type
+    
+    def calculate_risk_score(self, device_type: DeviceType, open_ports: Iterable[int]) -> float:
+        """Оценка риска 0..1: база по типу и надбавки за небезопасные сервисы"""
+        score = TYPE_RISK.get(device_type, TYPE_RISK[DeviceType.UNKNOWN])
+        score += sum(PORT_RISK.get(port, 0.0) for port in set(open_ports))
+        return round(min(score, 1.0), 3)
+    
+    def risk_scores(self, devices: Sequence[NetworkDevice],
+                    device_types: Optional[Sequence[DeviceType]] = None) -> List[float]:
+        """
+        Оценки риска для списка устройств
+        
+        Args:
+            devices: Устройства
+            device_types: Типы (по умолчанию device_type каждого устройства)
+        """
+        if device_types is None:
+            device_types = [device.device_type for device in devices]
+        
+        if np is None or not devices:
+            return [
+                self.calculate_risk_score(device_type, device.open_ports)
+                for device, device_type in zip(devices, device_types)
+            ]
+        
+        type_index = {device_type: index for index, device_type in enumerate(DeviceType)}
+        base = np.array([TYPE_RISK.get(device_type, TYPE_RISK[DeviceType.UNKNOWN]) for device_type in DeviceType])
+        ports = sorted(PORT_RISK)
+        weights = np.array([PORT_RISK[port] for port in ports])
+        
+        scores = base[[type_index[device_type] for device_type in device_types]]
+        scores = scores + port_matrix(devices, ports) @ weights
+        return np.round(np.minimum(scores, 1.0), 3).tolist()
     
     def get_vendor_from_mac(self, mac: str) -> Optional[str]:
         """
@@ -147,59 +385,21 @@ class DeviceClassifier:
         if not mac:
             return None
         
-        # Нормализуем MAC-адрес
-        mac = mac.upper().replace('-', ':')
-        
-        # Берем первые 3 байта (OUI)
-        oui = ':'.join(mac.split(':')[:3])
-        
-        return self.oui_db.get(oui)
+        return self.oui_lookup.get_vendor(mac)
     
     def _classify_by_ports(self, device: NetworkDevice) -> DeviceType:
         """Классификация по открытым портам"""
         if not device.open_ports:
             return DeviceType.UNKNOWN
         
-        # Проверяем отпечатки
-        for device_type, fingerprint in self.fingerprints.items():
-            if self._check_ports(device, fingerprint.get('ports', [])):
-                # Дополнительная проверка по ключевым словам
-                if device.hostname:
-                    for keyword in fingerprint.get('keywords', []):
-                        if keyword in device.hostname.lower():
-                            # Маппинг строки на DeviceType enum
-                            type_map = {
-                                'printers': DeviceType.PRINTER,
-                                'cameras': DeviceType.CAMERA,
-                                'iot': DeviceType.IOT,
-                                'routers': DeviceType.ROUTER,
-                            }
-                            return type_map.get(device_type, DeviceType.UNKNOWN)
-        
-        # Эвристики на основе портов
-        ports = set(device.open_ports)
-        
-        if 9100 in ports:
-            return DeviceType.PRINTER
-        elif 3389 in ports:
-            return DeviceType.COMPUTER
-        elif 22 in ports and 445 in ports:
-            return DeviceType.COMPUTER
-        elif 80 in ports and len(ports) <= 3:
-            return DeviceType.IOT
-        elif {53, 67, 68}.intersection(ports):
-            return DeviceType.ROUTER
-        
-        return DeviceType.UNKNOWN
-    
-    def _check_ports(self, device: NetworkDevice, target_ports: list) -> bool:
-        """Проверить, содержит ли устройство указанные порты"""
-        return any(port in device.open_ports for port in target_ports)
-    
-    def _check_vendor_keywords(self, device: NetworkDevice, keywords: list) -> bool:
-        """Проверить производителя на ключевые слова"""
-        if not device.vendor:
-            return False
-        
-        vendor_lower = device.vendor.lower()
-        return any(keyword in vendor_lower for keyword in keywords)
+        device_type = self._port_rules.match(device)
+        return device_type if device_type is not None else DeviceType.UNKNOWN
+    
+    def match_fingerprints(self, device: NetworkDevice) -> List[str]:
+        """
+        Имена всех отпечатков, ключевые слова которых встречаются в
+        производителе или имени хоста (общий с правилами автомат)
+        """
+        found = self._keywords.match((device.vendor or '').lower())
+        found |= self._keywords.match((device.hostname or '').lower())
+        return [name for name, bit in self._fingerprint_bits.items() if found & bit]
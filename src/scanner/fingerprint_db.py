@@ -2,37 +2,281 @@
 База данных отпечатков сетевых устройств
 """
 
+import csv
 import json
+import re
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import sqlite3
 from datetime import datetime
 
 from ..core.constants import ASSETS_DIR
 from ..core.models import NetworkDevice, DeviceType
 
+# Настройки соединения: WAL позволяет читать во время записи, остальное -
+# меньше fsync и больше кэша страниц
+_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 67108864",
+    "PRAGMA foreign_keys = ON",
+)
+
+# Ключ уникальности отпечатка (выражения уникального индекса)
+_IDENTITY = "vendor, IFNULL(model, ''), IFNULL(mac_prefix, ''), IFNULL(device_type, '')"
+_SAME_IDENTITY = '''
+    f.vendor = i.vendor AND IFNULL(f.model, '') = IFNULL(i.model, '')
+    AND IFNULL(f.mac_prefix, '') = IFNULL(i.mac_prefix, '')
+    AND IFNULL(f.device_type, '') = IFNULL(i.device_type, '')
+'''
+
+# Импорт: строки пакетом попадают во временную таблицу соединения, затем
+# переносятся одним INSERT ... ON CONFLICT (повтор обновляет отпечаток)
+_CREATE_IMPORT_TABLE = '''
+    CREATE TEMP TABLE IF NOT EXISTS fingerprint_import (
+        seq INTEGER PRIMARY KEY,
+        vendor TEXT NOT NULL,
+        model TEXT,
+        mac_prefix TEXT,
+        common_ports TEXT,
+        http_headers TEXT,
+        banners TEXT,
+        device_type TEXT,
+        confidence REAL
+    )
+'''
+_INSERT_IMPORT = '''
+    INSERT INTO temp.fingerprint_import
+    (vendor, model, mac_prefix, common_ports, http_headers, banners, device_type, confidence)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_MERGE_IMPORT = f'''
+    INSERT INTO device_fingerprints
+    (vendor, model, mac_prefix, common_ports, http_headers, banners, device_type, confidence)
+    SELECT vendor, model, mac_prefix, common_ports, http_headers, banners, device_type, confidence
+    FROM temp.fingerprint_import WHERE true ORDER BY seq
+    ON CONFLICT ({_IDENTITY}) DO UPDATE SET
+        common_ports = excluded.common_ports,
+        http_headers = excluded.http_headers,
+        banners = excluded.banners,
+        confidence = excluded.confidence,
+        updated_at = CURRENT_TIMESTAMP
+'''
+_CLEAR_IMPORTED_PORTS = f'''
+    DELETE FROM fingerprint_ports WHERE fingerprint_id IN (
+        SELECT f.id FROM device_fingerprints AS f JOIN temp.fingerprint_import AS i ON {_SAME_IDENTITY}
+    )
+'''
+_INDEX_IMPORTED_PORTS = f'''
+    INSERT OR IGNORE INTO fingerprint_ports (fingerprint_id, port)
+    SELECT f.id, CAST(ports.value AS INTEGER)
+    FROM device_fingerprints AS f
+    JOIN temp.fingerprint_import AS i ON {_SAME_IDENTITY},
+    json_each(f.common_ports) AS ports
+'''
+_SELECT_BY_MAC_PREFIX = 'SELECT * FROM device_fingerprints WHERE mac_prefix = ?'
+# Отпечатки, которые можно сопоставить по баннерам
+_SELECT_WITH_SERVICES = '''
+    SELECT * FROM device_fingerprints
+    WHERE COALESCE(http_headers, '{}') NOT IN ('{}', '') OR COALESCE(banners, '{}') NOT IN ('{}', '')
+'''
+
+# Полнотекстовый индекс значений HTTP-заголовков и баннеров (rowid = id
+# отпечатка); поддерживается триггерами при любой записи в таблицу
+_SEARCH_CONTENT = (
+    "IFNULL((SELECT group_concat(value, ' ') FROM json_each(COALESCE({row}.http_headers, '{{}}'))), '')"
+    " || ' ' || "
+    "IFNULL((SELECT group_concat(value, ' ') FROM json_each(COALESCE({row}.banners, '{{}}'))), '')"
+)
+_SEARCH_SERVICES = '''
+    SELECT f.*, bm25(fingerprint_search) AS search_rank
+    FROM fingerprint_search
+    JOIN device_fingerprints AS f ON f.id = fingerprint_search.rowid
+    WHERE fingerprint_search MATCH ?
+    ORDER BY search_rank
+    LIMIT ?
+'''
+# Токены - как у токенизатора unicode61: буквы и цифры, "_" - разделитель
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Пакетное сопоставление: устройства скана - во временных таблицах,
+# кандидаты по MAC и по портам - двумя соединениями на весь скан
+_CREATE_MATCH_TABLES = (
+    '''
+    CREATE TEMP TABLE IF NOT EXISTS match_devices (
+        ip TEXT PRIMARY KEY,
+        mac_prefix TEXT
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TEMP TABLE IF NOT EXISTS match_ports (
+        port INTEGER NOT NULL,
+        ip TEXT NOT NULL,
+        PRIMARY KEY (port, ip)
+    ) WITHOUT ROWID
+    ''',
+)
+_INSERT_MATCH_DEVICE = 'INSERT OR REPLACE INTO temp.match_devices (ip, mac_prefix) VALUES (?, ?)'
+_INSERT_MATCH_PORT = 'INSERT OR IGNORE INTO temp.match_ports (port, ip) VALUES (?, ?)'
+_SELECT_MAC_MATCHES = '''
+    SELECT d.ip AS match_ip, f.*
+    FROM temp.match_devices AS d
+    JOIN device_fingerprints AS f ON f.mac_prefix = d.mac_prefix
+'''
+_SELECT_PORT_MATCHES = '''
+    SELECT m.ip AS match_ip, f.*, COUNT(*) AS port_overlap,
+           json_array_length(f.common_ports) AS port_total
+    FROM temp.match_ports AS m
+    JOIN fingerprint_ports AS p ON p.port = m.port
+    JOIN device_fingerprints AS f ON f.id = p.fingerprint_id
+    GROUP BY m.ip, f.id
+'''
+# Кандидаты по пересечению портов: индекс port -> отпечатки вместо
+# перебора таблицы; список портов передается одним JSON-параметром,
+# чтобы текст запроса (и подготовленное выражение) не менялся
+_SELECT_BY_PORTS = '''
+    SELECT f.*, COUNT(*) AS port_overlap, json_array_length(f.common_ports) AS port_total
+    FROM fingerprint_ports AS p
+    JOIN device_fingerprints AS f ON f.id = p.fingerprint_id
+    WHERE p.port IN (SELECT value FROM json_each(?))
+    GROUP BY f.id
+'''
+
 class FingerprintDatabase:
-    """База данных для хранения и сопоставления отпечатков устройств"""
+    """
+    База данных для хранения и сопоставления отпечатков устройств
+    
+    У каждого потока свое долгоживущее соединение (sqlite3 не разрешает
+    делить соединение между потоками без внешней блокировки). База в режиме
+    WAL: чтения не ждут записи, а записи начинаются с BEGIN IMMEDIATE и
+    ждут друг друга не дольше busy_timeout вместо ошибки "database is locked".
+    Одинаковый текст запросов позволяет sqlite3 брать подготовленные
+    выражения из кэша соединения.
+    """
     
-    def __init__(self, db_path: Optional[Path] = None):
-        self.db_path = db_path or ASSETS_DIR / "fingerprints.db"
+    def __init__(self, db_path: Optional[Union[str, Path]] = None, busy_timeout: float = 30.0):
+        """
+        Args:
+            db_path: Путь к файлу базы (":memory:" - общая база в памяти)
+            busy_timeout: Ожидание блокировки записи, секунды
+        """
+        self.db_path = db_path or Path(ASSETS_DIR) / "fingerprints.db"
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._keepalive: Optional[sqlite3.Connection] = None
+        
+        if str(self.db_path) == ":memory:":
+            # Соединения разных потоков должны видеть одну базу
+            self._database = f"file:fingerprints_{id(self)}?mode=memory&cache=shared"
+            self._uri = True
+            # База в памяти живет, пока открыто хотя бы одно соединение
+            self._keepalive = self._connect()
+        else:
+            self._database = str(self.db_path)
+            self._uri = False
+        
         self.init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """Открыть и настроить соединение"""
+        conn = sqlite3.connect(
+            self._database,
+            uri=self._uri,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=256,
+            # Транзакции управляются явно (см. _transaction)
+            isolation_level=None,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in _PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Соединение текущего потока (открывается при первом обращении)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Транзакция записи: блокировка берется сразу, а не при первом INSERT"""
+        conn = self.connection
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+    
+    def close(self):
+        """Закрыть соединения всех потоков"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        if self._keepalive is not None:
+            self._keepalive.close()
+            self._keepalive = None
+        self._local = threading.local()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
     def init_database(self):
-        """Инициализация базы данных"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """
+        Инициализация базы данных: применить недостающие миграции
         
+        Номер последней примененной миграции хранится в PRAGMA user_version,
+        поэтому начальные данные загружаются один раз, а не при каждом запуске.
+        """
+        migrations = [self._create_schema, self._deduplicate, self._load_initial_data, self._create_search_index]
+        for version, migration in enumerate(migrations, start=1):
+            with self._transaction() as conn:
+                # Версия читается под блокировкой записи: два процесса не
+                # применят одну миграцию дважды
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    continue
+                if migration(conn) is False:
+                    # Миграция невозможна в этой сборке SQLite - повторим при
+                    # следующем запуске, последующие миграции ждут ее
+                    break
+                conn.execute(f"PRAGMA user_version = {version}")
+        
+        self._fts = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'fingerprint_search'"
+        ).fetchone() is not None
+    
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection):
+        """Создать таблицы и индексы"""
         # Таблица отпечатков устройств
-        cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS device_fingerprints (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 vendor TEXT NOT NULL,
                 model TEXT,
                 mac_prefix TEXT,
-                common_ports TEXT,  # JSON список портов
-                http_headers TEXT,  # JSON заголовки HTTP
-                banners TEXT,       # JSON баннеры сервисов
+                common_ports TEXT,  -- JSON список портов
+                http_headers TEXT,  -- JSON заголовки HTTP
+                banners TEXT,       -- JSON баннеры сервисов
                 device_type TEXT,
                 confidence REAL DEFAULT 0.8,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -41,7 +285,7 @@ class FingerprintDatabase:
         ''')
         
         # Таблица известных уязвимостей
-        cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS known_vulnerabilities (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 cve_id TEXT UNIQUE,
@@ -56,18 +300,81 @@ class FingerprintDatabase:
         ''')
         
         # Индексы для ускорения поиска
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_mac_prefix ON device_fingerprints(mac_prefix)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_device_type ON device_fingerprints(device_type)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_vendor ON device_fingerprints(vendor)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_mac_prefix ON device_fingerprints(mac_prefix)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_device_type ON device_fingerprints(device_type)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_vendor ON device_fingerprints(vendor)')
         
-        conn.commit()
-        conn.close()
+        # Обратный индекс портов
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS fingerprint_ports (
+                port INTEGER NOT NULL,
+                fingerprint_id INTEGER NOT NULL REFERENCES device_fingerprints(id) ON DELETE CASCADE,
+                PRIMARY KEY (port, fingerprint_id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_fingerprint_ports_id ON fingerprint_ports(fingerprint_id)')
         
-        # Загрузка начальных данных
-        self._load_initial_data()
+        # Отпечатки, добавленные до появления индекса
+        conn.execute('''
+            INSERT OR IGNORE INTO fingerprint_ports (fingerprint_id, port)
+            SELECT f.id, CAST(ports.value AS INTEGER)
+            FROM device_fingerprints AS f, json_each(COALESCE(f.common_ports, '[]')) AS ports
+            WHERE NOT EXISTS (SELECT 1 FROM fingerprint_ports AS p WHERE p.fingerprint_id = f.id)
+        ''')
     
-    def _load_initial_data(self):
-        """Загрузка начальных данных в базу"""
+    @staticmethod
+    def _deduplicate(conn: sqlite3.Connection):
+        """Удалить повторы (оставить первый) и запретить их уникальным индексом"""
+        conn.execute(f'''
+            DELETE FROM device_fingerprints WHERE id NOT IN (
+                SELECT MIN(id) FROM device_fingerprints GROUP BY {_IDENTITY}
+            )
+        ''')
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_fingerprint_identity ON device_fingerprints({_IDENTITY})')
+    
+    @staticmethod
+    def _create_search_index(conn: sqlite3.Connection) -> bool:
+        """
+        Полнотекстовый индекс FTS5 по заголовкам и баннерам
+        
+        Returns:
+            False, если SQLite собран без FTS5 (индекс не создан)
+        """
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS fingerprint_search "
+                "USING fts5(content, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except sqlite3.OperationalError:
+            # SQLite без FTS5: баннеры сопоставляются перебором
+            return False
+        
+        new_content = _SEARCH_CONTENT.format(row='new')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS fingerprint_search_insert AFTER INSERT ON device_fingerprints BEGIN
+                INSERT INTO fingerprint_search (rowid, content) VALUES (new.id, {new_content});
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS fingerprint_search_delete AFTER DELETE ON device_fingerprints BEGIN
+                DELETE FROM fingerprint_search WHERE rowid = old.id;
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS fingerprint_search_update
+            AFTER UPDATE OF http_headers, banners ON device_fingerprints BEGIN
+                DELETE FROM fingerprint_search WHERE rowid = old.id;
+                INSERT INTO fingerprint_search (rowid, content) VALUES (new.id, {new_content});
+            END
+        ''')
+        conn.execute(f'''
+            INSERT INTO fingerprint_search (rowid, content)
+            SELECT f.id, {_SEARCH_CONTENT.format(row='f')} FROM device_fingerprints AS f
+        ''')
+        return True
+    
+    def _load_initial_data(self, conn: sqlite3.Connection):
+        """Загрузка начальных данных в базу (миграция)"""
         initial_fingerprints = [
             {
                 "vendor": "Raspberry Pi",
@@ -102,96 +409,334 @@ class FingerprintDatabase:
             },
         ]
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        for fp in initial_fingerprints:
-            cursor.execute('''
-                INSERT OR IGNORE INTO device_fingerprints 
-                (vendor, model, mac_prefix, common_ports, device_type)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                fp["vendor"],
-                fp.get("model"),
-                fp.get("mac_prefix"),
-                json.dumps(fp.get("common_ports", [])),
-                fp["device_type"]
-            ))
-        
-        conn.commit()
-        conn.close()
+        self._import_rows(conn, initial_fingerprints)
+    
+    @staticmethod
+    def _fingerprint_row(fp: Dict) -> Tuple:
+        """
+        Строка для импорта из записи отпечатка
+        
+        Списки и словари могут быть переданы как JSON-строки (CSV), порты -
+        также через пробел, запятую или точку с запятой. Баннеры и
+        HTTP-заголовки - только JSON-объект (имя -> значение).
+        """
+        def decode_ports(value):
+            if isinstance(value, str):
+                value = value.strip()
+                if not value:
+                    return []
+                if value[0] == '[':
+                    return json.loads(value)
+                return [item for item in re.split(r'[\s,;]+', value) if item]
+            return [] if value is None else value
+        
+        def decode_mapping(field):
+            value = fp.get(field)
+            if isinstance(value, str):
+                value = json.loads(value) if value.strip() else None
+            if value is None:
+                return {}
+            if not isinstance(value, dict):
+                raise ValueError(f"Поле {field} должно быть JSON-объектом: {fp}")
+            return value
+        
+        vendor = (fp.get('vendor') or '').strip()
+        if not vendor:
+            raise ValueError(f"Отпечаток без производителя: {fp}")
+        
+        mac_prefix = (fp.get('mac_prefix') or '').strip().upper().replace('-', ':') or None
+        ports = decode_ports(fp.get('common_ports', fp.get('ports')))
+        confidence = fp.get('confidence')
+        
+        return (
+            vendor,
+            (fp.get('model') or '').strip() or None,
+            mac_prefix,
+            json.dumps(sorted({int(port) for port in ports})),
+            json.dumps(decode_mapping('http_headers')),
+            json.dumps(decode_mapping('banners')),
+            (fp.get('device_type') or '').strip() or None,
+            float(confidence) if confidence not in (None, '') else 0.8,
+        )
+    
+    def _import_rows(self, conn: sqlite3.Connection, fingerprints: Iterable[Dict]) -> int:
+        """Импорт внутри уже открытой транзакции"""
+        count = 0
+        
+        def rows():
+            nonlocal count
+            for fp in fingerprints:
+                count += 1
+                yield self._fingerprint_row(fp)
+        
+        conn.execute(_CREATE_IMPORT_TABLE)
+        conn.execute("DELETE FROM temp.fingerprint_import")
+        conn.executemany(_INSERT_IMPORT, rows())
+        conn.execute(_MERGE_IMPORT)
+        conn.execute(_CLEAR_IMPORTED_PORTS)
+        conn.execute(_INDEX_IMPORTED_PORTS)
+        conn.execute("DELETE FROM temp.fingerprint_import")
+        return count
+    
+    def import_fingerprints(self, fingerprints: Iterable[Dict]) -> int:
+        """
+        Импортировать отпечатки одной транзакцией
+        
+        Записи читаются потоком (executemany), отпечаток с тем же ключом
+        (производитель, модель, MAC-префикс, тип) обновляется, а не
+        дублируется. Ошибка в любой записи отменяет весь импорт.
+        
+        Returns:
+            Число обработанных записей
+        """
+        with self._transaction() as conn:
+            return self._import_rows(conn, fingerprints)
+    
+    def import_file(self, path: Union[str, Path]) -> int:
+        """
+        Импортировать отпечатки из файла: .csv (заголовок - имена полей),
+        .jsonl (запись на строку) или .json (список записей либо словарь
+        в формате assets/device_fingerprints.json)
+        """
+        path = Path(path)
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            if path.suffix.lower() == '.csv':
+                return self.import_fingerprints(csv.DictReader(f))
+            if path.suffix.lower() == '.jsonl':
+                return self.import_fingerprints(json.loads(line) for line in f if line.strip())
+            return self.import_fingerprints(self._expand_feed(json.load(f)))
+    
+    @staticmethod
+    def _expand_feed(data) -> Iterator[Dict]:
+        """Записи из JSON: список или словарь с mac_prefixes (по записи на префикс)"""
+        entries = data.values() if isinstance(data, dict) else data
+        for entry in entries:
+            prefixes = entry.get('mac_prefixes')
+            if not prefixes:
+                yield entry
+                continue
+            for prefix in prefixes:
+                yield {**entry, 'mac_prefix': prefix}
     
     def match_device(self, device: NetworkDevice) -> Dict:
         """
         Найти совпадение для устройства в базе отпечатков
-        """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
         
-        matches = []
+        Кандидаты - отпечатки с тем же MAC-префиксом, с общими портами и с
+        совпавшими баннерами. У каждого есть match_score: 1.0 за MAC-префикс
+        или баннер, за порты - доля общих портов среди объединения портов
+        отпечатка и устройства. Лучший кандидат - с наибольшей
+        match_confidence = match_score * confidence.
+        """
+        cursor = self.connection.cursor()
+        candidates: Dict[int, Dict] = {}
         
         # Поиск по MAC-префиксу
-        if device.mac_address:
-            mac_prefix = ':'.join(device.mac_address.upper().split(':')[:3])
-            cursor.execute(
-                'SELECT * FROM device_fingerprints WHERE mac_prefix = ?',
-                (mac_prefix,)
-            )
-            matches.extend(cursor.fetchall())
+        mac_prefix = self._mac_prefix(device)
+        if mac_prefix:
+            for row in cursor.execute(_SELECT_BY_MAC_PREFIX, (mac_prefix,)).fetchall():
+                self._add_candidate(candidates, row, 1.0)
+        
+        # Поиск по открытым портам через обратный индекс
+        ports = set(device.open_ports)
+        if ports:
+            for row in cursor.execute(_SELECT_BY_PORTS, (json.dumps(sorted(ports)),)).fetchall():
+                self._add_candidate(candidates, row, self._port_score(row, len(ports)))
+        
+        # Поиск по HTTP-заголовкам и баннерам сервисов
+        if device.http_headers or device.banners:
+            for row in self._service_candidates(self.connection, [device]):
+                if self._matches_services(device, row):
+                    self._add_candidate(candidates, row, 1.0)
+        
+        return self._best_candidate(candidates)
+    
+    def match_devices(self, devices: Iterable[NetworkDevice]) -> Dict[str, Dict]:
+        """
+        Сопоставить все устройства скана за постоянное число запросов
         
-        # Поиск по открытым портам
-        if device.open_ports:
-            # Конвертируем порты в JSON для поиска
-            for row in cursor.execute('SELECT * FROM device_fingerprints'):
-                common_ports = json.loads(row['common_ports'])
-                if set(common_ports).intersection(set(device.open_ports)):
-                    matches.append(row)
+        Устройства записываются во временные таблицы соединения, кандидаты
+        по MAC-префиксам и по портам находятся двумя соединениями, отпечатки
+        с баннерами читаются одним запросом. Оценка - как в match_device.
         
-        # Убираем дубликаты
-        unique_matches = []
-        seen_ids = set()
-        for match in matches:
-            if match['id'] not in seen_ids:
-                unique_matches.append(dict(match))
-                seen_ids.add(match['id'])
+        Returns:
+            IP-адрес -> лучшее совпадение (с match_score и match_confidence);
+            устройства без совпадений не включаются
+        """
+        devices = {device.ip_address: device for device in devices}
+        if not devices:
+            return {}
         
-        conn.close()
+        conn = self.connection
+        candidates: Dict[str, Dict[int, Dict]] = {ip: {} for ip in devices}
+        port_counts = {ip: len(set(device.open_ports)) for ip, device in devices.items()}
         
-        if unique_matches:
-            # Возвращаем лучшее совпадение
-            return max(unique_matches, key=lambda x: x.get('confidence', 0))
+        # Временные таблицы пишутся в temp-базу соединения и не блокируют
+        # основную; транзакция дает согласованный снимок для обоих запросов
+        conn.execute("BEGIN")
+        try:
+            for statement in _CREATE_MATCH_TABLES:
+                conn.execute(statement)
+            conn.execute("DELETE FROM temp.match_devices")
+            conn.execute("DELETE FROM temp.match_ports")
+            conn.executemany(_INSERT_MATCH_DEVICE, [
+                (ip, self._mac_prefix(device)) for ip, device in devices.items()
+            ])
+            conn.executemany(_INSERT_MATCH_PORT, [
+                (port, ip) for ip, device in devices.items() for port in set(device.open_ports)
+            ])
+            
+            for row in conn.execute(_SELECT_MAC_MATCHES):
+                self._add_candidate(candidates[row['match_ip']], row, 1.0)
+            
+            for row in conn.execute(_SELECT_PORT_MATCHES):
+                ip = row['match_ip']
+                self._add_candidate(candidates[ip], row, self._port_score(row, port_counts[ip]))
+            
+            with_services = [device for device in devices.values() if device.http_headers or device.banners]
+            if with_services:
+                for row in self._service_candidates(conn, with_services):
+                    for device in with_services:
+                        if self._matches_services(device, row):
+                            self._add_candidate(candidates[device.ip_address], row, 1.0)
+            
+            conn.execute("DELETE FROM temp.match_devices")
+            conn.execute("DELETE FROM temp.match_ports")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
         
-        return {}
+        results = {}
+        for ip, device_candidates in candidates.items():
+            best = self._best_candidate(device_candidates)
+            if best:
+                results[ip] = best
+        return results
+    
+    @staticmethod
+    def _search_query(texts: Iterable[str]) -> Optional[str]:
+        """Запрос FTS5: любой из токенов текстов"""
+        tokens = set()
+        for text in texts:
+            tokens.update(_TOKEN_RE.findall(text.lower()))
+        if not tokens:
+            return None
+        return " OR ".join('"' + token.replace('"', '""') + '"' for token in sorted(tokens))
+    
+    @staticmethod
+    def _service_texts(device: NetworkDevice) -> List[str]:
+        """Собранные значения заголовков и баннеры устройства"""
+        return list(device.http_headers.values()) + list(device.banners.values())
+    
+    def _service_candidates(self, conn: sqlite3.Connection, devices: List[NetworkDevice]) -> List:
+        """
+        Отпечатки, у которых с баннерами устройств есть общие слова
+        
+        Один полнотекстовый запрос на все устройства; окончательная проверка
+        совпадения - _matches_services. Без FTS5 - все отпечатки с баннерами.
+        """
+        if not self._fts:
+            return conn.execute(_SELECT_WITH_SERVICES).fetchall()
+        
+        query = self._search_query(text for device in devices for text in self._service_texts(device))
+        if query is None:
+            return []
+        return conn.execute(_SEARCH_SERVICES, (query, -1)).fetchall()
+    
+    def search_banners(self, text: str, limit: int = 10) -> List[Dict]:
+        """
+        Отпечатки, похожие на баннер или значение заголовка, по релевантности
+        
+        Returns:
+            Записи отпечатков с search_rank (bm25: меньше - релевантнее)
+        """
+        query = self._search_query([text])
+        if query is None:
+            return []
+        
+        if not self._fts:
+            # Без ранжирования: значения отпечатка, входящие в текст подстрокой
+            text = text.lower()
+            matched = []
+            for row in self.connection.execute(_SELECT_WITH_SERVICES).fetchall():
+                values = list(json.loads(row['http_headers'] or '{}').values())
+                values += list(json.loads(row['banners'] or '{}').values())
+                if any(str(value).lower() in text for value in values):
+                    matched.append(dict(row, search_rank=0.0))
+            return matched[:limit]
+        
+        rows = self.connection.execute(_SEARCH_SERVICES, (query, limit)).fetchall()
+        return [dict(row) for row in rows]
+    
+    @staticmethod
+    def _mac_prefix(device: NetworkDevice) -> Optional[str]:
+        """OUI устройства в формате таблицы (AA:BB:CC)"""
+        if not device.mac_address:
+            return None
+        return ':'.join(device.mac_address.upper().split(':')[:3])
+    
+    @staticmethod
+    def _port_score(row, device_port_count: int) -> float:
+        """Доля общих портов среди объединения портов отпечатка и устройства"""
+        overlap = row['port_overlap']
+        return overlap / (row['port_total'] + device_port_count - overlap)
+    
+    @staticmethod
+    def _add_candidate(candidates: Dict[int, Dict], row, score: float):
+        """Учесть кандидата, сохранив для него лучшую оценку"""
+        match = candidates.get(row['id'])
+        if match is None:
+            match = candidates[row['id']] = {
+                key: row[key] for key in row.keys()
+                if key not in ('match_ip', 'port_overlap', 'port_total', 'search_rank')
+            }
+            match['match_score'] = 0.0
+        match['match_score'] = max(match['match_score'], score)
+    
+    @staticmethod
+    def _best_candidate(candidates: Dict[int, Dict]) -> Dict:
+        """Кандидат с наибольшей уверенностью (match_score * confidence)"""
+        if not candidates:
+            return {}
+        
+        for match in candidates.values():
+            match['match_confidence'] = round(match['match_score'] * (match.get('confidence') or 0), 4)
+        return max(candidates.values(), key=lambda match: (match['match_confidence'], match['match_score']))
+    
+    @staticmethod
+    def _matches_services(device: NetworkDevice, row) -> bool:
+        """
+        Совпадает ли отпечаток с собранными баннерами устройства
+        
+        Значение заголовка или баннера из отпечатка ищется подстрокой
+        без учета регистра.
+        """
+        def stored(column):
+            value = json.loads(row[column] or '{}')
+            return value if isinstance(value, dict) else {}
+        
+        device_headers = {name.lower(): str(value).lower() for name, value in (device.http_headers or {}).items()}
+        for name, value in stored('http_headers').items():
+            observed = device_headers.get(str(name).lower())
+            if observed is not None and str(value).lower() in observed:
+                return True
+        
+        device_banners = [str(banner).lower() for banner in (device.banners or {}).values()]
+        for banner in stored('banners').values():
+            if any(str(banner).lower() in observed for observed in device_banners):
+                return True
+        
+        return False
     
     def add_fingerprint(self, vendor: str, device_type: str, **kwargs):
-        """Добавить новый отпечаток в базу"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO device_fingerprints 
-            (vendor, device_type, mac_prefix, common_ports, http_headers, banners, model, confidence)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            vendor,
-            device_type,
-            kwargs.get('mac_prefix'),
-            json.dumps(kwargs.get('common_ports', [])),
-            json.dumps(kwargs.get('http_headers', {})),
-            json.dumps(kwargs.get('banners', {})),
-            kwargs.get('model'),
-            kwargs.get('confidence', 0.8)
-        ))
-        
-        conn.commit()
-        conn.close()
+        """Добавить новый отпечаток в базу (существующий с тем же ключом обновляется)"""
+        self.import_fingerprints([dict(kwargs, vendor=vendor, device_type=device_type)])
     
     def get_vulnerabilities(self, device_type: str = None, vendor: str = None) -> List[Dict]:
         """Получить известные уязвимости для типа устройств или производителя"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        cursor = self.connection.cursor()
         
         query = 'SELECT * FROM known_vulnerabilities WHERE 1=1'
         params = []
@@ -206,6 +751,5 @@ class FingerprintDatabase:
         
         cursor.execute(query, params)
         vulnerabilities = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return vulnerabilities
@@ -4,10 +4,21 @@
 
 from src.scanner.network_scanner import NetworkScanner
 from src.scanner.device_classifier import DeviceClassifier
+from src.scanner.parallel_classifier import ParallelClassifier
 from src.scanner.fingerprint_db import FingerprintDatabase
+from src.scanner.async_port_scanner import AsyncPortScanner
+from src.scanner.scan_cache import ScanCache, ScanDiff
+from src.scanner.scan_journal import ScanJournal
+from src.scanner.passive_discovery import PassiveDiscovery
 
 __all__ = [
     'NetworkScanner',
     'DeviceClassifier',
+    'ParallelClassifier',
     'FingerprintDatabase',
+    'AsyncPortScanner',
+    'ScanCache',
+    'ScanDiff',
+    'ScanJournal',
+    'PassiveDiscovery',
 ]
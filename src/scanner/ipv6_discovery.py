@@ -0,0 +1,251 @@
+"""
+Обнаружение устройств IPv6 (NDP и групповой ping)
+"""
+
+import ipaddress
+import re
+import socket
+import subprocess
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import netifaces
+from scapy.all import (
+    Ether, IPv6, IPv6ExtHdrDestOpt, HBHOptUnknown, ICMPv6EchoRequest, ICMPv6EchoReply,
+    ICMPv6ParamProblem, ICMPv6ND_NS, ICMPv6ND_NA, ICMPv6ND_RS, ICMPv6ND_RA,
+    ICMPv6NDOptSrcLLAddr, ICMPv6NDOptDstLLAddr, ICMPv6NDOptPrefixInfo,
+    AsyncSniffer, sendp, get_if_hwaddr, in6_getnsma, in6_getnsmac, in6_mactoifaceid, inet_pton
+)
+
+ALL_NODES = "ff02::1"
+ALL_ROUTERS = "ff02::2"
+
+# Строка `ip -6 neigh`: адрес dev интерфейс lladdr MAC [router] СОСТОЯНИЕ
+_NEIGH_RE = re.compile(
+    r"^(?P<ip>[0-9a-fA-F:.]+) dev (?P<iface>\S+) lladdr (?P<mac>[0-9a-fA-F:]{17})"
+    r"(?: router)?(?: proxy)? (?P<state>[A-Z]+)"
+)
+_DEAD_STATES = {"FAILED", "INCOMPLETE"}
+
+def parse_neighbour_table(output: str, iface: Optional[str] = None) -> Dict[str, Set[str]]:
+    """
+    Разобрать вывод `ip -6 neigh show`
+    
+    Returns:
+        MAC -> адреса IPv6
+    """
+    neighbours: Dict[str, Set[str]] = {}
+    for line in output.splitlines():
+        match = _NEIGH_RE.match(line.strip())
+        if not match or match.group('state') in _DEAD_STATES:
+            continue
+        if iface and match.group('iface') != iface:
+            continue
+        neighbours.setdefault(match.group('mac').lower(), set()).add(match.group('ip'))
+    return neighbours
+
+def eui64_address(prefix: ipaddress.IPv6Network, mac: str) -> str:
+    """Адрес SLAAC (модифицированный EUI-64) для MAC-адреса в сети /64"""
+    interface_id = int(in6_mactoifaceid(mac).replace(":", ""), 16)
+    return str(ipaddress.IPv6Address(int(prefix.network_address) | interface_id))
+
+class Ipv6Discovery:
+    """
+    Обнаружение соседей IPv6 без перебора адресов
+    
+    Перебрать /64 невозможно, поэтому адреса узнаются от самих узлов:
+    - эхо-запрос на ff02::1 (все узлы канала);
+    - пакет на ff02::1 с неизвестной обязательной опцией заголовка
+      назначения: на него отвечают Parameter Problem и узлы, которые
+      игнорируют групповой ping (Windows);
+    - Router Solicitation - маршрутизаторы и объявляемые префиксы;
+    - Neighbor Solicitation для адресов EUI-64, вычисленных из уже
+      известных MAC-адресов (двухстековые хосты из ARP), во всех
+      префиксах канала;
+    - таблица соседей ядра.
+    """
+    
+    def __init__(self, timeout: float = 2.0, logger=None):
+        self.timeout = timeout
+        self.logger = logger
+    
+    @staticmethod
+    def local_interfaces() -> List[Dict]:
+        """Интерфейсы с IPv6: адреса и префиксы (кроме loopback)"""
+        interfaces = []
+        for iface in netifaces.interfaces():
+            addrs = netifaces.ifaddresses(iface).get(netifaces.AF_INET6, [])
+            link_local = None
+            addresses = []
+            prefixes = set()
+            
+            for addr_info in addrs:
+                ip = (addr_info.get('addr') or '').split('%')[0]
+                if not ip:
+                    continue
+                address = ipaddress.IPv6Address(ip)
+                if address.is_loopback:
+                    continue
+                if address.is_link_local:
+                    link_local = ip
+                    continue
+                
+                addresses.append(ip)
+                # netifaces отдает маску как "ffff:ffff:ffff:ffff::/64" или просто маску
+                netmask = (addr_info.get('netmask') or '/64').split('/')[-1]
+                try:
+                    prefixes.add(str(ipaddress.IPv6Network(f"{ip}/{netmask}", strict=False)))
+                except ValueError:
+                    prefixes.add(str(ipaddress.IPv6Network(f"{ip}/64", strict=False)))
+            
+            if link_local:
+                interfaces.append({
+                    'interface': iface,
+                    'link_local': link_local,
+                    'addresses': addresses,
+                    'prefixes': sorted(prefixes),
+                })
+        return interfaces
+    
+    def read_neighbour_table(self, iface: Optional[str] = None) -> Dict[str, Set[str]]:
+        """Таблица соседей ядра (MAC -> адреса IPv6)"""
+        try:
+            result = subprocess.run(
+                ["ip", "-6", "neigh", "show"],
+                capture_output=True, text=True, timeout=5
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            if self.logger:
+                self.logger.debug(f"Таблица соседей IPv6 недоступна: {e}")
+            return {}
+        return parse_neighbour_table(result.stdout, iface)
+    
+    @staticmethod
+    def _multicast_probes(iface: Dict, own_mac: str) -> List:
+        """Групповые пробы: ping, неизвестная опция и Router Solicitation"""
+        src = iface['link_local']
+        return [
+            Ether(src=own_mac, dst="33:33:00:00:00:01") /
+            IPv6(src=src, dst=ALL_NODES, hlim=255) / ICMPv6EchoRequest(),
+            
+            # Тип опции 0x80: "отбросить и ответить Parameter Problem"
+            Ether(src=own_mac, dst="33:33:00:00:00:01") /
+            IPv6(src=src, dst=ALL_NODES, hlim=255) /
+            IPv6ExtHdrDestOpt(options=[HBHOptUnknown(otype=0x80, optdata=b"\x00" * 4)]) /
+            ICMPv6EchoRequest(),
+            
+            Ether(src=own_mac, dst="33:33:00:00:00:02") /
+            IPv6(src=src, dst=ALL_ROUTERS, hlim=255) /
+            ICMPv6ND_RS() / ICMPv6NDOptSrcLLAddr(lladdr=own_mac),
+        ]
+    
+    @staticmethod
+    def _solicitations(iface: Dict, own_mac: str, known_macs: Iterable[str],
+                       prefixes: Iterable[str]) -> List:
+        """Neighbor Solicitation для адресов EUI-64 известных MAC-адресов"""
+        src = iface['link_local']
+        # link-local и по одному адресу в каждом префиксе /64
+        networks = [ipaddress.IPv6Network("fe80::/64")]
+        networks += [network for network in map(ipaddress.IPv6Network, prefixes) if network.prefixlen == 64]
+        
+        probes = []
+        for mac in known_macs:
+            for network in networks:
+                target = eui64_address(network, mac)
+                solicited = in6_getnsma(inet_pton(socket.AF_INET6, target))
+                probes.append(
+                    Ether(src=own_mac, dst=in6_getnsmac(solicited)) /
+                    IPv6(src=src, dst=socket.inet_ntop(socket.AF_INET6, solicited), hlim=255) /
+                    ICMPv6ND_NS(tgt=target) / ICMPv6NDOptSrcLLAddr(lladdr=own_mac)
+                )
+        return probes
+    
+    @staticmethod
+    def parse_reply(packet, own_mac: str) -> Optional[Tuple[str, str, List[str]]]:
+        """
+        Извлечь (MAC, адрес IPv6, префиксы) из ответа
+        
+        Returns:
+            None, если пакет не несет сведений о соседе
+        """
+        if IPv6 not in packet or Ether not in packet:
+            return None
+        
+        mac = packet[Ether].src.lower()
+        if mac == own_mac:
+            return None
+        
+        ip = packet[IPv6].src
+        prefixes = []
+        
+        if ICMPv6ND_NA in packet:
+            ip = packet[ICMPv6ND_NA].tgt
+            if ICMPv6NDOptDstLLAddr in packet:
+                mac = packet[ICMPv6NDOptDstLLAddr].lladdr.lower()
+        elif ICMPv6ND_RA in packet:
+            option = packet.getlayer(ICMPv6NDOptPrefixInfo)
+            index = 1
+            while option is not None:
+                prefixes.append(f"{option.prefix}/{option.prefixlen}")
+                index += 1
+                option = packet.getlayer(ICMPv6NDOptPrefixInfo, index)
+        elif ICMPv6ND_NS in packet:
+            # Чужой запрос раскрывает адрес отправителя (кроме DAD с ::)
+            if ip == "::":
+                return None
+        elif ICMPv6EchoReply not in packet and ICMPv6ParamProblem not in packet:
+            return None
+        
+        if ipaddress.IPv6Address(ip).is_unspecified or ipaddress.IPv6Address(ip).is_multicast:
+            return None
+        return mac, ip, prefixes
+    
+    def discover(self, iface: Dict, known_macs: Iterable[str] = ()) -> Dict[str, Set[str]]:
+        """
+        Найти соседей IPv6 на интерфейсе
+        
+        Args:
+            iface: Запись из local_interfaces()
+            known_macs: MAC-адреса, уже найденные (например, ARP-сканированием)
+        
+        Returns:
+            MAC -> адреса IPv6
+        """
+        own_mac = get_if_hwaddr(iface['interface']).lower()
+        neighbours: Dict[str, Set[str]] = {}
+        prefixes = set(iface['prefixes'])
+        lock = threading.Lock()
+        
+        def on_packet(packet):
+            parsed = self.parse_reply(packet, own_mac)
+            if parsed:
+                mac, ip, advertised = parsed
+                with lock:
+                    neighbours.setdefault(mac, set()).add(ip)
+                    prefixes.update(advertised)
+        
+        sniffer = AsyncSniffer(iface=iface['interface'], filter="icmp6", prn=on_packet, store=False)
+        sniffer.start()
+        try:
+            # Групповые пробы и RS - сначала: RA может добавить префиксы для NS
+            sendp(self._multicast_probes(iface, own_mac), iface=iface['interface'], verbose=0)
+            time.sleep(self.timeout / 2)
+            with lock:
+                targets = set(known_macs) | set(neighbours)
+                current_prefixes = set(prefixes)
+            ns_probes = self._solicitations(iface, own_mac, targets, current_prefixes)
+            if ns_probes:
+                sendp(ns_probes, iface=iface['interface'], verbose=0, inter=0.001)
+            time.sleep(self.timeout / 2)
+        finally:
+            sniffer.stop()
+        
+        # Соседи, с которыми система уже обменивалась трафиком
+        for mac, addresses in self.read_neighbour_table(iface['interface']).items():
+            neighbours.setdefault(mac, set()).update(addresses)
+        
+        if self.logger:
+            self.logger.info(f"IPv6 на {iface['interface']}: найдено соседей {len(neighbours)}")
+        
+        return neighbours
@@ -0,0 +1,125 @@
+"""
+Поиск множества ключевых слов за один проход (автомат Ахо-Корасик)
+"""
+
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+class KeywordMatcher:
+    """
+    Автомат Ахо-Корасик над набором ключевых слов
+    
+    Каждому слову сопоставлена битовая маска; match() возвращает
+    объединение масок всех слов, входящих в текст подстрокой, за один
+    проход по тексту. Результаты для уже встречавшихся строк кэшируются:
+    в инвентаре производителей и имен хостов немного различных значений.
+    
+    Время поиска зависит от длины текста, а не от числа слов.
+    """
+    
+    def __init__(self, keywords: Iterable[Tuple[str, int]] = (), cache_size: int = 65536):
+        """
+        Args:
+            keywords: Пары (ключевое слово, маска)
+            cache_size: Предел числа запомненных результатов
+        """
+        self.cache_size = cache_size
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[int] = [0]
+        self._fail: List[int] = [0]
+        self._built = False
+        self._cache: Dict[str, int] = {}
+        self.categories: List[Hashable] = []
+        self._category_bits: Dict[Hashable, int] = {}
+        
+        for keyword, mask in keywords:
+            self.add(keyword, mask)
+    
+    @classmethod
+    def from_categories(cls, categories: Dict[str, Iterable[str]]) -> 'KeywordMatcher':
+        """Автомат по именованным наборам слов (бит маски на категорию)"""
+        matcher = cls()
+        for name, keywords in categories.items():
+            matcher.add_category(name, keywords)
+        return matcher
+    
+    def add_category(self, name: Hashable, keywords: Iterable[str]) -> int:
+        """
+        Добавить именованный набор слов и вернуть его бит маски
+        
+        Набор с уже известным именем не добавляется повторно: потребители
+        одного автомата, называющие наборы одинаково, делят один бит.
+        """
+        bit = self._category_bits.get(name)
+        if bit is None:
+            bit = self._category_bits[name] = 1 << len(self.categories)
+            self.categories.append(name)
+            for keyword in keywords:
+                self.add(keyword, bit)
+        return bit
+    
+    def add(self, keyword: str, mask: int):
+        """Добавить слово (до первого поиска)"""
+        if self._built:
+            raise RuntimeError("Автомат уже построен")
+        if not keyword:
+            return
+        
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._output.append(0)
+                self._fail.append(0)
+            state = next_state
+        self._output[state] |= mask
+    
+    def build(self):
+        """Построить переходы по неудаче (обход в ширину)"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                # Слова, оканчивающиеся в суффиксном состоянии, тоже найдены
+                self._output[next_state] |= self._output[self._fail[next_state]]
+        self._built = True
+    
+    def match(self, text: Optional[str]) -> int:
+        """Объединение масок слов, найденных в тексте"""
+        if not text:
+            return 0
+        
+        result = self._cache.get(text)
+        if result is not None:
+            return result
+        
+        if not self._built:
+            self.build()
+        
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        result = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            result |= output[state]
+        
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[text] = result
+        return result
+    
+    def match_categories(self, text: Optional[str]) -> List[Hashable]:
+        """Все категории, слова которых найдены в тексте (в порядке задания)"""
+        mask = self.match(text)
+        return [name for index, name in enumerate(self.categories) if mask >> index & 1]
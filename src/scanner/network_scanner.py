@@ -3,31 +3,153 @@
 """
 
 import ipaddress
-import socket
+import sqlite3
 import threading
-import time
-from typing import List, Dict, Optional, Set
+import xml.etree.ElementTree as ET
+from collections import deque
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, Future, as_completed, wait
+from typing import Iterator, List, Dict, Optional, Set, Tuple
 from queue import Queue
-import nmap
 import netifaces
 from scapy.all import ARP, Ether, srp
 from scapy.layers.l2 import getmacbyip
 
+try:
+    import nmap
+except ImportError:
+    nmap = None
+
 from ..core.models import NetworkDevice, DeviceType
+from ..core.constants import MAX_SCAN_THREADS, COMMON_PORTS
+from ..core.exceptions import ScanError, FileSystemError
+from .async_port_scanner import AsyncPortScanner
+from .scan_cache import ScanCache, ScanDiff
+from .arp_sweep import ArpSweeper
+from .scan_journal import ScanJournal
+from .rate_controller import RateController
+from .port_history import PortHistory
+from .banner_grabber import BannerGrabber
+from .fingerprint_db import FingerprintDatabase
+from .ipv6_discovery import Ipv6Discovery
+from ..utils.network_utils import get_hostname_resolver
 from .device_classifier import DeviceClassifier
-from .oui_database import OUILookup
+from .oui_database import get_oui_lookup
 
 class NetworkScanner:
     """Сканер сети"""
     
-    def __init__(self, logger=None):
+    DEFAULT_PORTS = [22, 23, 80, 443, 8080, 3389, 5353, 9100, 1900]
+    
+    def __init__(self, logger=None, config: Optional[Dict] = None):
         self.logger = logger
-        self.nm = nmap.PortScanner()
-        self.oui_lookup = OUILookup()
-        self.classifier = DeviceClassifier()
+        # Раздел scanning из configs/default.yaml
+        self.config = config or {}
+        self.max_workers = max(1, int(self.config.get('max_workers', MAX_SCAN_THREADS)))
+        # batch - один запуск nmap на группу хостов, single - по одному на хост
+        self.port_scan_mode = self.config.get('port_scan_mode', 'batch')
+        self.batch_size = max(1, int(self.config.get('batch_size', 32)))
+        # nmap или asyncio (TCP connect без внешних зависимостей)
+        self.port_backend = self.config.get('port_backend', 'nmap')
+        if self.port_backend == 'nmap' and nmap is None:
+            if self.logger:
+                self.logger.warning("nmap не установлен, используется бэкенд asyncio")
+            self.port_backend = 'asyncio'
+        self.max_hosts = int(self.config.get('max_hosts', 65534))
+        # Хосты большой сети передаются на сканирование портов группами, не дожидаясь конца ARP
+        self.arp_batch_size = max(1, int(self.config.get('arp_batch_size', 256)))
+        # Таймауты, повторы и параллелизм подстраиваются под сеть по ходу
+        # сканирования; scanning.scan_speed задает начальные значения
+        async_max_concurrency = self.config.get('async_max_concurrency', 1000)
+        self.rate_controller = RateController.from_config(
+            self.config,
+            max_parallelism=async_max_concurrency if self.port_backend == 'asyncio' else self.max_workers
+        )
+        self.arp_sweeper = ArpSweeper(
+            shard_prefix=self.config.get('arp_shard_prefix', 24),
+            rate=self.config.get('arp_rate', 500),
+            timeout=self.config.get('network_timeout', 2),
+            logger=logger
+        )
+        self.async_scanner = AsyncPortScanner(
+            max_concurrency=async_max_concurrency,
+            connect_timeout=self.config.get('port_scan_timeout', 1),
+            host_timeout=self.config.get('host_timeout', 30),
+            logger=logger,
+            rate_controller=self.rate_controller
+        )
+        # Сначала проверяются порты, чаще всего открытые у устройств этого
+        # класса, остальные - только если первый проход что-то нашел
+        self.port_history = None
+        if self.config.get('port_prioritization', True):
+            self.port_history = PortHistory(
+                history_file=self.config.get('port_history_file'),
+                base_ports=sorted(set(self.DEFAULT_PORTS) | set(COMMON_PORTS)),
+                first_pass_size=self.config.get('port_first_pass', 4)
+            )
+        # Баннеры собираются с открытых портов параллельно со сканированием
+        self.banner_grabber = None
+        if self.config.get('banner_grabbing', True):
+            self.banner_grabber = BannerGrabber(
+                max_concurrency=self.config.get('banner_max_concurrency', 200),
+                connect_timeout=self.config.get('port_scan_timeout', 1),
+                read_timeout=self.config.get('banner_timeout', 2),
+                max_bytes=self.config.get('banner_max_bytes', 1024),
+                logger=logger
+            )
+        # Собранные баннеры уточняют тип устройства по базе отпечатков
+        self.fingerprint_matching = (self.banner_grabber is not None
+                                     and self.config.get('fingerprint_matching', True))
+        self.fingerprint_min_confidence = self.config.get('fingerprint_min_confidence', 0.5)
+        self._fingerprint_db: Optional[FingerprintDatabase] = None
+        self._fingerprint_lock = threading.Lock()
+        # Соседи IPv6 (NDP) объединяются с найденными по ARP устройствами по MAC
+        self.ipv6_enabled = self.config.get('ipv6_discovery', True)
+        self.ipv6_discovery = Ipv6Discovery(timeout=self.config.get('network_timeout', 2), logger=logger)
+        # nmap.PortScanner хранит результат последнего запуска в себе,
+        # поэтому каждому рабочему потоку нужен свой экземпляр
+        self._local = threading.local()
+        self.oui_lookup = get_oui_lookup()
+        self.resolver = get_hostname_resolver()
+        self.classifier = DeviceClassifier(cache_size=self.config.get('classifier_cache_size', 4096))
         self.scan_results = []
         self.is_scanning = False
-        
+        self.last_scan_complete = False
+    
+    @property
+    def nm(self) -> 'nmap.PortScanner':
+        """Экземпляр nmap.PortScanner текущего потока"""
+        scanner = getattr(self._local, 'nm', None)
+        if scanner is None:
+            if nmap is None:
+                raise ScanError("Библиотека python-nmap не установлена")
+            scanner = nmap.PortScanner()
+            self._local.nm = scanner
+        return scanner
+    
+    @property
+    def fingerprint_db(self) -> FingerprintDatabase:
+        """База отпечатков (открывается при первом обращении)"""
+        with self._fingerprint_lock:
+            if self._fingerprint_db is None:
+                self._fingerprint_db = FingerprintDatabase(self.config.get('fingerprint_db_file'))
+            return self._fingerprint_db
+    
+    def close(self):
+        """Остановить цикл событий сборщика баннеров и закрыть базу отпечатков"""
+        if self.banner_grabber is not None:
+            self.banner_grabber.close()
+        with self._fingerprint_lock:
+            fingerprint_db, self._fingerprint_db = self._fingerprint_db, None
+        if fingerprint_db is not None:
+            fingerprint_db.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
     def get_local_interfaces(self) -> List[Dict]:
         """Получить список локальных сетевых интерфейсов"""
         interfaces = []
@@ -51,14 +173,19 @@ class NetworkScanner:
                                     'ip': ip,
                                     'netmask': netmask,
                                     'network': str(network),
-                                    'gateway': self._get_gateway(iface)
+                                    'gateway': self._get_gateway(iface),
+                                    'ipv6': [
+                                        a['addr'].split('%')[0]
+                                        for a in addrs.get(netifaces.AF_INET6, [])
+                                        if a.get('addr')
+                                    ]
                                 })
                             except ValueError as e:
                                 if self.logger:
                                     self.logger.warning(f"Ошибка обработки интерфейса {iface}: {e}")
                 elif self.logger:
                     self.logger.debug(f"Интерфейс {iface} не имеет IPv4 адреса")
-                    
+        
         except Exception as e:
             if self.logger:
                 self.logger.error(f"Ошибка при получении интерфейсов: {e}")
@@ -82,9 +209,26 @@ class NetworkScanner:
         
         return None
     
-    def arp_scan(self, network: str, timeout: int = 2) -> List[Dict]:
-        """Выполнить ARP-сканирование сети"""
+    def arp_scan(self, network: str, timeout: Optional[float] = None,
+                 iface: Optional[str] = None) -> List[Dict]:
+        """
+        Выполнить ARP-сканирование сети
+        
+        Args:
+            timeout: Ожидание ответов, секунды (по умолчанию - от контроллера скорости)
+        
+        Raises:
+            ScanError: если сеть больше scanning.max_hosts
+        """
         devices = []
+        if timeout is None:
+            timeout = self.rate_controller.arp_timeout(network)
+        
+        # Большие сети сканируются по блокам с ограничением скорости;
+        # превышение max_hosts и ошибки отправки передаются вызывающему
+        net = ipaddress.ip_network(network, strict=False)
+        if net.version == 4 and net.prefixlen < self.arp_sweeper.shard_prefix:
+            return list(self.iter_arp_scan(network, iface=iface, timeout=timeout))
         
         try:
             # Создаем ARP-пакет
@@ -93,146 +237,878 @@ class NetworkScanner:
             packet = ether/arp
             
             # Отправляем пакет
-            result = srp(packet, timeout=timeout, verbose=0)[0]
+            result = srp(packet, timeout=timeout, verbose=0, iface=iface)[0]
             
             for sent, received in result:
-                ip = received.psrc
-                mac = received.hwsrc
-                
-                # Получаем вендора по OUI
-                vendor = self.oui_lookup.get_vendor(mac)
-                
-                # Пытаемся получить hostname
-                try:
-                    hostname = socket.gethostbyaddr(ip)[0]
-                except (socket.herror, socket.gaierror):
-                    hostname = None
-                
-                devices.append({
-                    'ip': ip,
-                    'mac': mac,
-                    'vendor': vendor,
-                    'hostname': hostname
-                })
-                
-                if self.logger:
-                    self.logger.debug(f"Найдено устройство: {ip} ({mac}) - {vendor}")
-                    
+                if sent.sent_time:
+                    rtt = float(received.time) - float(sent.sent_time)
+                    self.rate_controller.record_rtt(received.psrc, max(0.0, rtt))
+                devices.append(self._make_arp_info(received.psrc, received.hwsrc, iface))
+        
         except Exception as e:
             if self.logger:
                 self.logger.error(f"Ошибка при ARP-сканировании: {e}")
         
         return devices
     
+    def iter_arp_scan(self, network: str, iface: Optional[str] = None,
+                      timeout: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Шардированное ARP-сканирование с выдачей устройств по мере ответа
+        
+        Raises:
+            ScanError: если сеть больше scanning.max_hosts
+        """
+        net = ipaddress.IPv4Network(network, strict=False)
+        if net.num_addresses - 2 > self.max_hosts:
+            raise ScanError(
+                f"Сеть {network} содержит {net.num_addresses - 2} адресов, "
+                f"ограничение max_hosts: {self.max_hosts}"
+            )
+        
+        if self.logger:
+            self.logger.info(
+                f"ARP-сканирование {network} блоками /{self.arp_sweeper.shard_prefix}, "
+                f"до {self.arp_sweeper.rate} пакетов/с"
+            )
+        
+        stream = self.arp_sweeper.sweep(
+            network,
+            should_stop=lambda: not self.is_scanning,
+            iface=iface,
+            timeout=timeout if timeout is not None else self.rate_controller.arp_timeout(network),
+            on_rtt=self.rate_controller.record_rtt
+        )
+        for ip, mac in stream:
+            yield self._make_arp_info(ip, mac, iface)
+    
+    def _make_arp_info(self, ip: str, mac: str, iface: Optional[str] = None) -> Dict:
+        """Сформировать результат ARP для найденного устройства"""
+        # Получаем вендора по OUI
+        vendor = self.oui_lookup.get_vendor(mac)
+        
+        arp_info = {
+            'ip': ip,
+            'mac': mac,
+            'vendor': vendor,
+            'hostname': None,
+            'interface': iface
+        }
+        
+        # Hostname определяется в фоне и подставляется по готовности
+        self.resolver.resolve_async(ip, callback=self._hostname_setter(arp_info))
+        
+        if self.logger:
+            self.logger.debug(f"Найдено устройство: {ip} ({mac}) - {vendor}")
+        
+        return arp_info
+    
     def port_scan(self, ip: str, ports: List[int] = None) -> Dict:
         """Сканировать порты устройства"""
         if ports is None:
-            ports = [22, 23, 80, 443, 8080, 3389, 5353, 9100, 1900]
+            ports = self.DEFAULT_PORTS
         
         try:
             # Используем nmap для сканирования портов
-            self.nm.scan(ip, arguments=f"-p {','.join(map(str, ports))} -T4")
+            self.nm.scan(ip, arguments=f"-p {','.join(map(str, ports))} {self.rate_controller.nmap_arguments([ip])}")
+            self._record_timings([ip])
             
             if ip in self.nm.all_hosts():
-                host_info = self.nm[ip]
-                
-                # Получаем открытые порты
-                open_ports = []
-                for proto in host_info.all_protocols():
-                    for port in host_info[proto]:
-                        if host_info[proto][port]['state'] == 'open':
-                            open_ports.append(port)
-                
-                # Пытаемся определить OS
-                os_info = None
-                if 'osmatch' in host_info:
-                    os_matches = host_info['osmatch']
-                    if os_matches:
-                        os_info = os_matches[0].get('name', 'Unknown')
-                
-                return {
-                    'open_ports': open_ports,
-                    'os_info': os_info,
-                    'hostname': host_info.hostname(),
-                    'status': host_info.state()
-                }
-                
+                return self._parse_host_info(self.nm[ip])
+        
         except Exception as e:
             if self.logger:
                 self.logger.error(f"Ошибка при сканировании портов {ip}: {e}")
         
+        return self._empty_port_info()
+    
+    def port_scan_batch(self, ips: List[str], ports: List[int] = None) -> Dict[str, Dict]:
+        """
+        Сканировать порты нескольких устройств одним запуском nmap
+        
+        Returns:
+            Словарь ip -> port_info в том же формате, что и port_scan
+        """
+        if ports is None:
+            ports = self.DEFAULT_PORTS
+        
+        results = {ip: self._empty_port_info() for ip in ips}
+        if not ips:
+            return results
+        
+        try:
+            self.nm.scan(
+                hosts=' '.join(ips),
+                arguments=f"-p {','.join(map(str, ports))} {self.rate_controller.nmap_arguments(ips)}"
+            )
+            self._record_timings(ips)
+            
+            for ip in self.nm.all_hosts():
+                if ip in results:
+                    results[ip] = self._parse_host_info(self.nm[ip])
+        
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Ошибка при пакетном сканировании портов ({len(ips)} хостов): {e}")
+        
+        return results
+    
+    def _record_timings(self, ips: List[str]):
+        """
+        Передать контроллеру скорости замеры последнего запуска nmap
+        
+        python-nmap не разбирает элемент <times>, поэтому SRTT хостов
+        читается из XML-вывода. Хост, ответивший на ARP, но не найденный
+        nmap, считается потерей.
+        """
+        try:
+            root = ET.fromstring(self.nm.get_nmap_last_output())
+        except ET.ParseError:
+            return
+        
+        answered = set()
+        for host in root.iter('host'):
+            address = host.find('address')
+            times = host.find('times')
+            status = host.find('status')
+            if address is None or status is None or status.get('state') != 'up':
+                continue
+            
+            ip = address.get('addr')
+            answered.add(ip)
+            if times is not None and times.get('srtt'):
+                # nmap указывает время в микросекундах
+                self.rate_controller.record_rtt(ip, int(times.get('srtt')) / 1e6)
+        
+        for ip in ips:
+            if ip not in answered:
+                self.rate_controller.record_loss(ip)
+    
+    def _parse_host_info(self, host_info) -> Dict:
+        """Преобразовать результат nmap по хосту в port_info"""
+        # Получаем открытые порты
+        open_ports = []
+        for proto in host_info.all_protocols():
+            for port in host_info[proto]:
+                if host_info[proto][port]['state'] == 'open':
+                    open_ports.append(port)
+        
+        # Пытаемся определить OS
+        os_info = None
+        if 'osmatch' in host_info:
+            os_matches = host_info['osmatch']
+            if os_matches:
+                os_info = os_matches[0].get('name', 'Unknown')
+        
+        return {
+            'open_ports': open_ports,
+            'os_info': os_info,
+            'hostname': host_info.hostname(),
+            'status': host_info.state()
+        }
+    
+    @staticmethod
+    def _empty_port_info() -> Dict:
+        """port_info для недоступного хоста"""
         return {'open_ports': [], 'os_info': None, 'hostname': None, 'status': 'down'}
     
     def classify_device(self, arp_info: Dict, port_info: Dict) -> NetworkDevice:
         """Классифицировать устройство"""
         # Получаем тип устройства от классификатора
+        hostname = port_info.get('hostname') or arp_info.get('hostname')
         device_type = self.classifier.classify(
             arp_info['vendor'],
             port_info['open_ports'],
-            port_info['os_info']
+            port_info['os_info'],
+            ip_address=arp_info['ip'],
+            hostname=hostname
         )
         
         # Создаем объект устройства
         device = NetworkDevice(
             ip_address=arp_info['ip'],
             mac_address=arp_info['mac'],
-            hostname=port_info.get('hostname') or arp_info.get('hostname'),
+            hostname=hostname,
             device_type=device_type,
             vendor=arp_info['vendor'],
             open_ports=port_info['open_ports'],
             os_info=port_info['os_info'],
-            risk_score=self.classifier.calculate_risk_score(device_type, port_info['open_ports'])
+            risk_score=self.classifier.calculate_risk_score(device_type, port_info['open_ports']),
+            interface=arp_info.get('interface'),
+            banners=dict(port_info.get('banners') or {}),
+            http_headers=dict(port_info.get('http_headers') or {})
         )
         
+        # Обратный DNS еще не ответил - hostname будет заполнен позже
+        if not device.hostname and self.resolver.pending(device.ip_address):
+            self.resolver.resolve_async(device.ip_address, callback=self._hostname_setter(device))
+        
         return device
     
-    def scan_network(self, network: str, callback=None) -> List[NetworkDevice]:
-        """Полное сканирование сети"""
-        self.is_scanning = True
-        devices = []
+    def _match_fingerprint(self, device: NetworkDevice):
+        """
+        Уточнить тип устройства по базе отпечатков с учетом баннеров
+        
+        Тип и риск меняются, только если уверенность лучшего совпадения не
+        ниже fingerprint_min_confidence.
+        """
+        try:
+            match = self.fingerprint_db.match_device(device)
+        except (sqlite3.Error, OSError) as e:
+            if self.logger:
+                self.logger.debug(f"Ошибка поиска отпечатка {device.ip_address}: {e}")
+            return
+        
+        if not match or match['match_confidence'] < self.fingerprint_min_confidence:
+            return
+        try:
+            device_type = DeviceType(match.get('device_type'))
+        except ValueError:
+            return
+        
+        device.device_type = device_type
+        device.risk_score = self.classifier.calculate_risk_score(device_type, device.open_ports)
+    
+    @staticmethod
+    def _hostname_setter(target):
+        """Callback резолвера, записывающий hostname в результат ARP или в устройство"""
+        def set_hostname(hostname: Optional[str]):
+            if not hostname:
+                return
+            if isinstance(target, dict):
+                target['hostname'] = target.get('hostname') or hostname
+            elif not target.hostname:
+                target.hostname = hostname
+        return set_hostname
+    
+    def scan_network(self, network: str, callback=None,
+                     journal: Optional[ScanJournal] = None) -> List[NetworkDevice]:
+        """
+        Полное сканирование сети
+        
+        Args:
+            journal: Журнал контрольных точек; если он открыт с resume=True,
+                     уже обработанные хосты повторно не сканируются
+        """
+        devices = list(self.iter_scan(network, callback, journal=journal))
+        if self.ipv6_enabled:
+            # Соседи IPv6 ищутся только на интерфейсах этой сети; если сеть
+            # не локальная (за маршрутизатором), поиск не выполняется
+            net = ipaddress.ip_network(network, strict=False)
+            interfaces = [
+                i['interface'] for i in self.get_local_interfaces()
+                if ipaddress.ip_network(i['network']) == net
+            ]
+            if interfaces:
+                devices = self.discover_ipv6(devices, interfaces)
+            elif self.logger:
+                self.logger.debug(f"Сеть {network} не подключена к локальным интерфейсам - поиск IPv6 пропущен")
+        devices.sort(key=self._address_key)
+        return devices
+    
+    @staticmethod
+    def _address_key(device: NetworkDevice):
+        """Ключ сортировки: сначала IPv4, затем IPv6"""
+        address = ipaddress.ip_address(device.ip_address)
+        return address.version, address
+    
+    def discover_ipv6(self, devices: List[NetworkDevice],
+                      interfaces: Optional[List[str]] = None) -> List[NetworkDevice]:
+        """
+        Найти соседей IPv6 и объединить их с устройствами по MAC
+        
+        Адреса IPv6 известных устройств добавляются в ipv6_addresses,
+        узлы, найденные только по IPv6, возвращаются как новые устройства.
+        
+        Args:
+            devices: Устройства, найденные по IPv4
+            interfaces: Интерфейсы для поиска (по умолчанию - все с IPv6)
+        """
+        ipv6_interfaces = [
+            iface for iface in self.ipv6_discovery.local_interfaces()
+            if interfaces is None or iface['interface'] in interfaces
+        ]
+        if not ipv6_interfaces:
+            return devices
+        
+        by_mac = {d.mac_address.lower(): d for d in devices if d.mac_address}
+        known_macs = list(by_mac)
+        neighbours: Dict[str, Tuple[str, Set[str]]] = {}
+        
+        def discover(iface: Dict):
+            try:
+                return iface['interface'], self.ipv6_discovery.discover(iface, known_macs)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Ошибка поиска соседей IPv6 на {iface['interface']}: {e}")
+                return iface['interface'], {}
+        
+        with ThreadPoolExecutor(max_workers=len(ipv6_interfaces), thread_name_prefix="ipv6") as executor:
+            for iface_name, found in executor.map(discover, ipv6_interfaces):
+                for mac, addresses in found.items():
+                    neighbours.setdefault(mac, (iface_name, set()))[1].update(addresses)
+        
+        result = list(devices)
+        for mac, (iface_name, addresses) in neighbours.items():
+            device = by_mac.get(mac)
+            if device is not None:
+                device.ipv6_addresses = sorted(set(device.ipv6_addresses) | addresses)
+                continue
+            
+            # Узел только с IPv6: основной адрес - глобальный, если он есть
+            ordered = sorted(addresses, key=lambda a: (ipaddress.IPv6Address(a).is_link_local, a))
+            device = NetworkDevice(
+                ip_address=ordered[0],
+                mac_address=mac,
+                vendor=self.oui_lookup.get_vendor(mac),
+                interface=iface_name,
+                ipv6_addresses=ordered
+            )
+            device.device_type = self.classifier.classify_device(device)
+            result.append(device)
         
         if self.logger:
-            self.logger.info(f"Начато сканирование сети: {network}")
+            self.logger.info(f"IPv6: соседей {len(neighbours)}, новых устройств {len(result) - len(devices)}")
+        
+        return result
+    
+    def incremental_scan(self, network: str, callback=None,
+                         cache: Optional[ScanCache] = None) -> Tuple[List[NetworkDevice], ScanDiff]:
+        """
+        Пересканирование сети с использованием кэша результатов
+        
+        Порты сканируются только у новых устройств, у сменивших IP
+        и у тех, чья запись в кэше устарела.
+        
+        Returns:
+            Список устройств и разница с предыдущим сканированием
+        """
+        if cache is None:
+            cache = ScanCache(
+                cache_file=self.config.get('cache_file'),
+                ttl=self.config.get('cache_ttl', 86400)
+            )
+        
+        previous = cache.devices(network)
+        devices = list(self.iter_scan(network, callback, cache=cache))
+        devices.sort(key=self._address_key)
+        
+        diff = ScanDiff.compute(previous, devices)
+        
+        if self.last_scan_complete:
+            for device in diff.removed:
+                cache.remove(device)
+        else:
+            # Сканирование прервано - об отсутствующих устройствах судить нельзя
+            diff.removed = []
+        cache.save()
         
-        # Этап 1: ARP-сканирование
         if self.logger:
-            self.logger.info("Этап 1: ARP-сканирование...")
+            self.logger.info(
+                f"Изменения в сети {network}: добавлено {len(diff.added)}, "
+                f"удалено {len(diff.removed)}, изменено {len(diff.changed)}"
+            )
         
-        arp_devices = self.arp_scan(network)
+        return devices, diff
+    
+    def iter_scan(self, network: str, callback=None, cache: Optional[ScanCache] = None,
+                  journal: Optional[ScanJournal] = None) -> Iterator[NetworkDevice]:
+        """
+        Полное сканирование сети с выдачей устройств по мере классификации
+        
+        Устройства приходят в порядке завершения сканирования, а не по IP.
+        Прерывание итерации (break/close) останавливает сканирование.
+        Если передан cache, актуальные записи используются вместо
+        сканирования портов, а новые результаты сохраняются в него.
+        Если передан journal, результаты ARP и готовые устройства
+        записываются в него по мере получения.
+        """
+        self.is_scanning = True
+        self.last_scan_complete = False
         
-        if callback:
-            callback("ARP сканирование завершено", len(arp_devices))
+        try:
+            self.last_scan_complete = yield from self._iter_scan_network(
+                network, callback, cache, journal=journal
+            )
+        finally:
+            self.is_scanning = False
+    
+    def scan_all_networks(self, callback=None, cache: Optional[ScanCache] = None,
+                          journal: Optional[ScanJournal] = None) -> List[NetworkDevice]:
+        """Параллельное сканирование всех локальных сетей (кроме loopback)"""
+        devices = list(self.iter_scan_all(callback, cache, journal))
+        if self.ipv6_enabled:
+            devices = self.discover_ipv6(devices)
+        devices.sort(key=self._address_key)
+        return devices
+    
+    def iter_scan_all(self, callback=None, cache: Optional[ScanCache] = None,
+                      journal: Optional[ScanJournal] = None) -> Iterator[NetworkDevice]:
+        """
+        Одновременное сканирование сетей всех интерфейсов
+        
+        Каждое устройство помечается интерфейсом, на котором найдено.
+        Устройство с одним MAC в нескольких сегментах сканируется и
+        выдается один раз. Потоки сканирования портов делятся между
+        интерфейсами поровну.
+        """
+        interfaces = []
+        networks = set()
+        for iface in self.get_local_interfaces():
+            if iface['network'] not in networks:
+                networks.add(iface['network'])
+                interfaces.append(iface)
+        
+        if not interfaces:
+            if self.logger:
+                self.logger.warning("Не найдено сетевых интерфейсов для сканирования")
+            return
         
-        # Этап 2: Сканирование портов и классификация
         if self.logger:
-            self.logger.info("Этап 2: Сканирование портов и классификация...")
+            self.logger.info(
+                "Сканирование сетей: " +
+                ", ".join(f"{i['network']} ({i['interface']})" for i in interfaces)
+            )
+        
+        self.is_scanning = True
+        self.last_scan_complete = False
+        workers = max(1, self.max_workers // len(interfaces))
+        results = Queue()
+        finished = object()
+        claimed_macs = set()
+        claim_lock = threading.Lock()
+        complete = []
         
-        for i, arp_info in enumerate(arp_devices):
-            if not self.is_scanning:
-                break
+        def claim(arp_info: Dict) -> bool:
+            if not arp_info.get('mac'):
+                return True
+            mac = arp_info['mac'].upper()
+            with claim_lock:
+                if mac in claimed_macs:
+                    return False
+                claimed_macs.add(mac)
+                return True
+        
+        def scan_interface(iface: Dict):
+            try:
+                stream = self._iter_scan_network(
+                    iface['network'], callback, cache, journal=journal,
+                    iface=iface['interface'], claim=claim, workers=workers
+                )
+                while True:
+                    try:
+                        results.put(next(stream))
+                    except StopIteration as stop:
+                        complete.append(stop.value)
+                        break
+            except Exception as e:
+                complete.append(False)
+                if self.logger:
+                    self.logger.error(f"Ошибка сканирования интерфейса {iface['interface']}: {e}")
+            finally:
+                results.put(finished)
+        
+        threads = [
+            threading.Thread(target=scan_interface, args=(iface,),
+                             name=f"scan-{iface['interface']}", daemon=True)
+            for iface in interfaces
+        ]
+        for thread in threads:
+            thread.start()
+        
+        try:
+            running = len(threads)
+            while running:
+                item = results.get()
+                if item is finished:
+                    running -= 1
+                else:
+                    yield item
+            self.last_scan_complete = all(complete)
+        finally:
+            self.is_scanning = False
+            for thread in threads:
+                thread.join()
+    
+    def _iter_scan_network(self, network: str, callback=None, cache: Optional[ScanCache] = None,
+                           journal: Optional[ScanJournal] = None, iface: Optional[str] = None,
+                           claim=None, workers: Optional[int] = None) -> Iterator[NetworkDevice]:
+        """
+        Сканирование одной сети (без управления флагом is_scanning)
+        
+        Args:
+            journal: Журнал контрольных точек
+            iface: Интерфейс для ARP-сканирования
+            claim: Фильтр результатов ARP - устройства, для которых он
+                   вернул False, не сканируются (уже найдены в другой сети)
+            workers: Число потоков сканирования портов
+        
+        Returns:
+            (значение StopIteration) True, если просканированы все хосты
+        """
+        found = 0
+        completed = 0
+        total = 0
+        resumed = 0
+        cached = 0
+        complete = False
+        arp_batches = None
+        stream = None
+        
+        if self.logger:
+            self.logger.info(f"Начато сканирование сети: {network}")
+        
+        try:
+            # Этап 1: ARP-сканирование. Хосты большой сети отдаются этапу 2
+            # группами по мере ответа, пока ARP-сканирование идет в фоне
+            if self.logger:
+                self.logger.info("Этап 1: ARP-сканирование...")
             
-            ip = arp_info['ip']
+            arp_batches = self._iter_arp_batches(network, iface, journal)
             
+            # Этап 2: Сканирование портов и классификация
             if self.logger:
-                self.logger.debug(f"Сканирование устройства {ip} ({i+1}/{len(arp_devices)})")
+                self.logger.info(f"Этап 2: Сканирование портов и классификация ({self.port_backend})...")
             
-            # Сканируем порты
-            port_info = self.port_scan(ip)
+            finished = journal.finished_devices(network) if journal is not None else {}
             
-            # Классифицируем устройство
-            device = self.classify_device(arp_info, port_info)
-            devices.append(device)
+            for arp_devices in arp_batches:
+                if claim is not None:
+                    arp_devices = [arp_info for arp_info in arp_devices if claim(arp_info)]
+                total += len(arp_devices)
+                
+                if callback:
+                    callback(f"ARP сканирование: найдено устройств {total}", total)
+                
+                to_scan = []
+                for arp_info in arp_devices:
+                    device = finished.get(arp_info['ip'])
+                    if device is None:
+                        to_scan.append(arp_info)
+                        continue
+                    
+                    resumed += 1
+                    found += 1
+                    completed += 1
+                    yield device
+                    
+                    if callback:
+                        callback(f"Обработано устройство: {arp_info['ip']} (журнал)", completed, total)
+                
+                if cache is not None:
+                    pending = to_scan
+                    to_scan = []
+                    for arp_info in pending:
+                        port_info = cache.lookup(arp_info)
+                        if port_info is None:
+                            to_scan.append(arp_info)
+                            continue
+                        
+                        device = self.classify_device(arp_info, port_info)
+                        cache.store(device, rescanned=False)
+                        if journal is not None:
+                            journal.record_host(network, device)
+                        cached += 1
+                        found += 1
+                        completed += 1
+                        yield device
+                        
+                        if callback:
+                            callback(f"Обработано устройство: {arp_info['ip']} (кэш)", completed, total)
+                
+                if self.port_backend == 'asyncio':
+                    stream = self._iter_hosts_async(to_scan)
+                else:
+                    stream = self._iter_hosts_nmap(to_scan, workers or self.max_workers)
+                if self.banner_grabber is not None:
+                    stream = self._iter_with_banners(stream)
+                
+                for arp_info, device in stream:
+                    completed += 1
+                    if device is not None:
+                        if cache is not None:
+                            cache.store(device)
+                        if journal is not None:
+                            journal.record_host(network, device)
+                        found += 1
+                        yield device
+                    
+                    if callback:
+                        callback(f"Обработано устройство: {arp_info['ip']}", completed, total)
+                    
+                    if not self.is_scanning:
+                        break
+                
+                stream.close()
+                stream = None
+                if not self.is_scanning:
+                    break
+            else:
+                complete = completed == total
+                if complete and journal is not None:
+                    journal.record_complete(network)
+            
+            if self.logger:
+                if resumed:
+                    self.logger.info(f"Возобновление: готово {resumed}, просканировано {total - resumed}")
+                if cache is not None:
+                    self.logger.info(f"Из кэша: {cached}, просканировано: {total - resumed - cached}")
+        finally:
+            if stream is not None:
+                stream.close()
+            if arp_batches is not None:
+                arp_batches.close()
             
-            if callback:
-                callback(f"Обработано устройство: {ip}", i+1, len(arp_devices))
+            if self.port_history is not None:
+                try:
+                    self.port_history.save()
+                except FileSystemError as e:
+                    if self.logger:
+                        self.logger.warning(str(e))
+            
+            if self.logger:
+                self.logger.info(f"Сканирование завершено. Найдено устройств: {found}")
         
-        self.is_scanning = False
+        return complete
+    
+    def _iter_arp_batches(self, network: str, iface: Optional[str] = None,
+                          journal: Optional[ScanJournal] = None) -> Iterator[List[Dict]]:
+        """
+        Результаты ARP-сканирования группами для сканирования портов
+        
+        Хосты большой сети отдаются группами по arp_batch_size по мере
+        ответа, пока блочное ARP-сканирование продолжается в фоне. Малая
+        сеть и результаты из журнала - одна группа. В журнал записывается
+        полный список, когда ARP-сканирование завершено.
+        
+        Raises:
+            ScanError: если сеть больше scanning.max_hosts
+        """
+        arp_devices = journal.arp_results(network) if journal is not None else None
+        if arp_devices is not None:
+            if self.logger:
+                self.logger.info(f"ARP-результаты взяты из журнала: {len(arp_devices)} устройств")
+            for arp_info in arp_devices:
+                if not arp_info.get('hostname'):
+                    self.resolver.resolve_async(arp_info['ip'], callback=self._hostname_setter(arp_info))
+            yield arp_devices
+            return
+        
+        net = ipaddress.ip_network(network, strict=False)
+        if net.version != 4 or net.prefixlen >= self.arp_sweeper.shard_prefix:
+            arp_devices = self.arp_scan(network, iface=iface)
+            if journal is not None:
+                journal.record_arp(network, arp_devices)
+            yield arp_devices
+            return
+        
+        arp_devices = []
+        stream = self.iter_arp_scan(network, iface=iface)
+        try:
+            while True:
+                batch = list(islice(stream, self.arp_batch_size))
+                if not batch:
+                    break
+                arp_devices.extend(batch)
+                yield batch
+        finally:
+            stream.close()
+        
+        if journal is not None:
+            journal.record_arp(network, arp_devices)
+    
+    def _iter_hosts_nmap(self, arp_devices: List[Dict],
+                         workers: int) -> Iterator[Tuple[Dict, Optional[NetworkDevice]]]:
+        """
+        Сканирование портов через nmap в пуле потоков
+        
+        Одновременно выполняется не больше групп, чем разрешает окно
+        контроллера скорости: при потерях оно сужается, на быстрой сети
+        растет до workers.
+        """
+        batches = deque(self._split_batches(arp_devices, workers))
+        executor = ThreadPoolExecutor(
+            max_workers=min(workers, len(batches)) or 1,
+            thread_name_prefix="port-scan"
+        )
+        futures = {}
+        
+        def submit_ready():
+            limit = min(workers, self.rate_controller.parallelism)
+            while batches and len(futures) < limit:
+                batch = batches.popleft()
+                futures[executor.submit(self._scan_hosts, batch)] = batch
+        
+        try:
+            submit_ready()
+            while futures:
+                future = next(iter(wait(futures, return_when=FIRST_COMPLETED)[0]))
+                batch = futures.pop(future)
+                
+                try:
+                    batch_devices = future.result()
+                except Exception as e:
+                    batch_devices = [None] * len(batch)
+                    if self.logger:
+                        self.logger.error(f"Ошибка при обработке группы из {len(batch)} устройств: {e}")
+                
+                for arp_info, device in zip(batch, batch_devices):
+                    yield arp_info, device
+                
+                if self.is_scanning:
+                    submit_ready()
+        finally:
+            # При остановке отменяем задачи, которые еще не начались
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    def _iter_with_banners(self, stream: Iterator[Tuple[Dict, Optional[NetworkDevice]]]
+                           ) -> Iterator[Tuple[Dict, Optional[NetworkDevice]]]:
+        """
+        Этап сбора баннеров поверх потока сканирования портов
+        
+        Хосты с открытыми портами отправляются сборщику сразу после
+        сканирования и выдаются, когда баннеры собраны и тип уточнен по
+        базе отпечатков; остальные проходят без задержки.
+        """
+        pending: Dict[Future, Tuple[Dict, NetworkDevice]] = {}
+        
+        def finish(future: Future) -> Tuple[Dict, NetworkDevice]:
+            arp_info, device = pending.pop(future)
+            try:
+                result = future.result()
+                device.banners = result['banners']
+                device.http_headers = result['http_headers']
+            except Exception as e:
+                if self.logger:
+                    self.logger.debug(f"Ошибка сбора баннеров {device.ip_address}: {e}")
+                return arp_info, device
+            if self.fingerprint_matching and (device.banners or device.http_headers):
+                self._match_fingerprint(device)
+            return arp_info, device
+        
+        try:
+            for arp_info, device in stream:
+                if device is None or not device.open_ports:
+                    yield arp_info, device
+                else:
+                    future = self.banner_grabber.submit(device.ip_address, device.open_ports)
+                    pending[future] = (arp_info, device)
+                
+                for future in [f for f in pending if f.done()]:
+                    yield finish(future)
+            
+            for future in as_completed(list(pending)):
+                yield finish(future)
+        finally:
+            stream.close()
+            for future in pending:
+                future.cancel()
+    
+    def _iter_hosts_async(self, arp_devices: List[Dict]) -> Iterator[Tuple[Dict, Optional[NetworkDevice]]]:
+        """Сканирование портов бэкендом asyncio в одном цикле событий"""
+        arp_by_ip = {arp_info['ip']: arp_info for arp_info in arp_devices}
+        ports = self.DEFAULT_PORTS
+        expand = None
+        probed = {}
+        
+        if self.port_history is not None:
+            ports = {ip: self.port_history.first_pass(arp_info['vendor']) for ip, arp_info in arp_by_ip.items()}
+            
+            def expand(ip: str, port_info: Dict) -> List[int]:
+                extra = self._second_pass(arp_by_ip[ip], port_info, ports[ip])
+                probed[ip] = ports[ip] + extra
+                return extra
+        
+        try:
+            for ip, port_info in self.async_scanner.iter_results(list(arp_by_ip), ports, expand):
+                device = self.classify_device(arp_by_ip[ip], port_info)
+                self._record_ports(device, port_info, probed.get(ip, []))
+                yield arp_by_ip[ip], device
+        except ScanError as e:
+            if self.logger:
+                self.logger.error(f"Ошибка при сканировании портов (asyncio): {e}")
+    
+    def _split_batches(self, arp_devices: List[Dict], workers: int) -> List[List[Dict]]:
+        """Разбить хосты на группы для одного запуска nmap"""
+        if self.port_scan_mode != 'batch':
+            return [[arp_info] for arp_info in arp_devices]
+        
+        # Не делаем групп меньше, чем нужно для загрузки всех потоков
+        size = min(self.batch_size, -(-len(arp_devices) // workers)) or 1
+        return [arp_devices[i:i + size] for i in range(0, len(arp_devices), size)]
+    
+    def _scan_hosts(self, batch: List[Dict]) -> List[Optional[NetworkDevice]]:
+        """Просканировать порты и классифицировать группу устройств (в рабочем потоке)"""
+        if not self.is_scanning:
+            return [None] * len(batch)
+        
+        ips = [arp_info['ip'] for arp_info in batch]
         
         if self.logger:
-            self.logger.info(f"Сканирование завершено. Найдено устройств: {len(devices)}")
+            self.logger.debug(f"Сканирование устройств: {', '.join(ips)}")
+        
+        if self.port_history is None:
+            port_infos = self._scan_ports(ips, self.DEFAULT_PORTS)
+            return [
+                self.classify_device(arp_info, port_infos[arp_info['ip']])
+                for arp_info in batch
+            ]
+        
+        # -p у nmap общий на запуск, поэтому группа проверяет объединение
+        # портов первого прохода своих хостов
+        first = sorted(set().union(*(self.port_history.first_pass(a['vendor']) for a in batch)))
+        port_infos = self._scan_ports(ips, first)
+        probed = {ip: list(first) for ip in ips}
+        
+        second = {}
+        for arp_info in batch:
+            extra = self._second_pass(arp_info, port_infos[arp_info['ip']], first)
+            if extra:
+                second[arp_info['ip']] = extra
         
+        if second and self.is_scanning:
+            extra_ports = sorted(set().union(*second.values()))
+            for ip, port_info in self._scan_ports(list(second), extra_ports).items():
+                merged = port_infos[ip]
+                merged['open_ports'] = sorted(set(merged['open_ports']) | set(port_info['open_ports']))
+                merged['os_info'] = merged['os_info'] or port_info['os_info']
+                merged['hostname'] = merged['hostname'] or port_info['hostname']
+                probed[ip] += extra_ports
+        
+        devices = []
+        for arp_info in batch:
+            device = self.classify_device(arp_info, port_infos[arp_info['ip']])
+            self._record_ports(device, port_infos[arp_info['ip']], probed[arp_info['ip']])
+            devices.append(device)
         return devices
     
+    def _scan_ports(self, ips: List[str], ports: List[int]) -> Dict[str, Dict]:
+        """Один запуск nmap по хостам (ip -> port_info)"""
+        if len(ips) == 1:
+            return {ips[0]: self.port_scan(ips[0], ports)}
+        return self.port_scan_batch(ips, ports)
+    
+    def _second_pass(self, arp_info: Dict, port_info: Dict, probed: List[int]) -> List[int]:
+        """Порты второго прохода по результату первого (пусто - не нужен)"""
+        if port_info['status'] != 'up':
+            return []
+        
+        # Тип по частичным данным уточняет, какие порты искать дальше
+        device_type = self.classifier.classify_device(NetworkDevice(
+            ip_address=arp_info['ip'],
+            mac_address=arp_info['mac'],
+            hostname=port_info.get('hostname') or arp_info.get('hostname'),
+            vendor=arp_info['vendor'],
+            open_ports=port_info['open_ports'],
+            os_info=port_info['os_info']
+        ))
+        return self.port_history.second_pass(arp_info['vendor'], device_type, probed)
+    
+    def _record_ports(self, device: NetworkDevice, port_info: Dict, probed: List[int]):
+        """Учесть результат сканирования хоста в истории портов"""
+        if self.port_history is not None and probed and port_info['status'] == 'up':
+            self.port_history.record(device.vendor, device.device_type, probed, device.open_ports)
+    
     def stop_scan(self):
         """Остановить сканирование"""
         self.is_scanning = False
@@ -0,0 +1,295 @@
+"""
+Компактный индекс OUI (производитель по MAC-адресу)
+
+Реестр IEEE (MA-L, MA-M, MA-S) компилируется в отсортированный бинарный
+файл, который открывается через mmap. Поиск - бинарный по целочисленным
+префиксам с выбором самого длинного совпадения, поэтому запуск почти
+ничего не стоит, а страницы файла общие для всех экземпляров и процессов.
+
+Формат файла:
+    заголовок  <8sHHII4B: сигнатура, версия, число длин, число записей,
+               смещение таблицы строк, длины префиксов в битах (по убыванию)
+    записи     <QI: ключ (префикс, выровненный влево до 48 бит, << 8 | длина),
+               смещение названия в таблице строк
+    строки     названия производителей в UTF-8, разделенные нулевым байтом
+"""
+
+import csv
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..core.constants import ASSETS_DIR
+from ..core.exceptions import FileSystemError
+
+INDEX_MAGIC = b"ZTOUIIDX"
+INDEX_VERSION = 1
+HEADER = struct.Struct("<8sHHII4B")
+RECORD = struct.Struct("<QI")
+
+# Длина присвоенного префикса в битах для реестров IEEE
+REGISTRY_BITS = {"MA-L": 24, "MA-M": 28, "MA-S": 36}
+
+_HEX_RE = re.compile(r"[^0-9A-Fa-f]")
+
+def mac_to_int(mac: str) -> Optional[int]:
+    """Преобразовать MAC-адрес в любом распространенном формате в число"""
+    digits = _HEX_RE.sub("", mac or "")
+    if len(digits) != 12:
+        return None
+    return int(digits, 16)
+
+def _record_key(prefix: int, bits: int) -> int:
+    """Ключ записи: префикс, выровненный до 48 бит, и его длина"""
+    return (prefix << (48 - bits)) << 8 | bits
+
+def _parse_prefix(text: str, bits: Optional[int] = None) -> Optional[Tuple[int, int]]:
+    """
+    Разобрать префикс вида "00:11:22", "001122", "70B3D5A" или "00:11:22:33:40/28"
+    
+    Returns:
+        (значение префикса, длина в битах)
+    """
+    text = text.strip()
+    if "/" in text:
+        text, length = text.split("/", 1)
+        bits = int(length)
+    
+    digits = _HEX_RE.sub("", text)
+    if not digits:
+        return None
+    
+    if bits is None:
+        bits = len(digits) * 4
+    elif len(digits) * 4 < bits:
+        return None
+    
+    # Лишние (нулевые) полубайты отбрасываем, оставляя ровно bits бит
+    value = int(digits, 16) >> (len(digits) * 4 - bits)
+    return value, bits
+
+def iter_registry(path: Union[str, Path]) -> Iterator[Tuple[int, int, str]]:
+    """
+    Прочитать источник данных OUI
+    
+    Поддерживаются CSV-файлы реестра IEEE (oui.csv, mam.csv, oui36.csv)
+    и JSON-словарь {"00:11:22": "Производитель"}.
+    
+    Returns:
+        Поток (префикс, длина в битах, производитель)
+    """
+    path = Path(path)
+    
+    if path.suffix.lower() == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            for prefix_text, vendor in json.load(f).items():
+                parsed = _parse_prefix(prefix_text)
+                if parsed and vendor:
+                    yield parsed[0], parsed[1], str(vendor)
+        return
+    
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            bits = REGISTRY_BITS.get((row.get("Registry") or "").strip())
+            assignment = row.get("Assignment") or ""
+            vendor = (row.get("Organization Name") or "").strip()
+            if bits is None or not vendor:
+                continue
+            parsed = _parse_prefix(assignment, bits)
+            if parsed:
+                yield parsed[0], parsed[1], vendor
+
+def compile_oui_index(sources: Iterable[Union[str, Path]], output: Union[str, Path]) -> int:
+    """
+    Скомпилировать источники OUI в бинарный индекс
+    
+    При повторе префикса побеждает источник, указанный позже.
+    
+    Returns:
+        Число записей в индексе
+    """
+    entries: Dict[int, str] = {}
+    for source in sources:
+        for prefix, bits, vendor in iter_registry(source):
+            entries[_record_key(prefix, bits)] = vendor
+    
+    lengths = sorted({key & 0xFF for key in entries}, reverse=True)
+    if len(lengths) > 4:
+        raise FileSystemError(f"Слишком много различных длин префиксов: {lengths}")
+    
+    strings = bytearray()
+    offsets: Dict[str, int] = {}
+    records = bytearray()
+    for key in sorted(entries):
+        vendor = entries[key]
+        if vendor not in offsets:
+            offsets[vendor] = len(strings)
+            strings += vendor.encode("utf-8") + b"\0"
+        records += RECORD.pack(key, offsets[vendor])
+    
+    strings_offset = HEADER.size + len(records)
+    header = HEADER.pack(
+        INDEX_MAGIC, INDEX_VERSION, len(lengths), len(entries), strings_offset,
+        *(lengths + [0] * (4 - len(lengths)))
+    )
+    
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    # Свой временный файл у каждого сборщика: процессы пула могут собирать
+    # индекс одновременно, а os.replace атомарно подменяет готовый файл
+    with tempfile.NamedTemporaryFile(dir=output.parent, prefix=output.name + ".",
+                                     suffix=".tmp", delete=False) as f:
+        try:
+            f.write(header)
+            f.write(records)
+            f.write(strings)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    try:
+        os.chmod(f.name, 0o644)
+        os.replace(f.name, output)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+    
+    return len(entries)
+
+class OUILookup:
+    """Поиск производителя по MAC-адресу в индексе, открытом через mmap"""
+    
+    def __init__(self, index_path: Optional[Union[str, Path]] = None,
+                 sources: Optional[List[Union[str, Path]]] = None):
+        """
+        Args:
+            index_path: Путь к бинарному индексу
+            sources: Источники для (пере)сборки индекса, если он отсутствует
+                     или старше источников. По умолчанию - файлы реестра
+                     IEEE и oui_database.json из каталога assets.
+        """
+        assets = Path(ASSETS_DIR)
+        self.index_path = Path(index_path) if index_path else assets / "oui.idx"
+        
+        if sources is None:
+            sources = [
+                path for path in (
+                    assets / "oui_database.json",
+                    assets / "oui.csv",
+                    assets / "mam.csv",
+                    assets / "oui36.csv",
+                )
+                if path.exists()
+            ]
+        self.sources = [Path(source) for source in sources]
+        
+        if self._needs_rebuild():
+            compile_oui_index(self.sources, self.index_path)
+        
+        self._file = open(self.index_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, version, n_lengths, self.count, self._strings_offset, *lengths = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self.close()
+            raise FileSystemError(f"Неверный формат индекса OUI: {self.index_path}")
+        self.prefix_lengths = lengths[:n_lengths]
+    
+    def _needs_rebuild(self) -> bool:
+        """Нужно ли пересобрать индекс"""
+        if not self.index_path.exists():
+            return True
+        index_mtime = self.index_path.stat().st_mtime
+        return any(source.stat().st_mtime > index_mtime for source in self.sources)
+    
+    def _find(self, key: int) -> Optional[int]:
+        """Бинарный поиск записи по ключу, возвращает смещение названия"""
+        low, high = 0, self.count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            record_key, name_offset = RECORD.unpack_from(self._mmap, HEADER.size + middle * RECORD.size)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle - 1
+            else:
+                return name_offset
+        return None
+    
+    def _read_name(self, offset: int) -> str:
+        """Прочитать название производителя из таблицы строк"""
+        start = self._strings_offset + offset
+        end = self._mmap.find(b"\0", start)
+        return self._mmap[start:end].decode("utf-8")
+    
+    def get_vendor(self, mac: str) -> Optional[str]:
+        """Определить производителя по MAC-адресу (самый длинный префикс)"""
+        value = mac_to_int(mac)
+        if value is None:
+            return None
+        return self._vendor_for(value)
+    
+    def get_vendors(self, macs: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """
+        Производители для списка MAC-адресов (как get_vendor для каждого)
+        
+        Результат зависит только от старших бит адреса (самый длинный
+        префикс в индексе), поэтому поиск выполняется один раз на каждый
+        различный префикс: у парка устройств одного производителя их мало.
+        """
+        shift = 48 - self.prefix_lengths[0] if self.prefix_lengths else 48
+        found: Dict[int, Optional[str]] = {}
+        vendors = []
+        for mac in macs:
+            value = mac_to_int(mac) if mac else None
+            if value is None:
+                vendors.append(None)
+                continue
+            prefix = value >> shift
+            if prefix not in found:
+                found[prefix] = self._vendor_for(value)
+            vendors.append(found[prefix])
+        return vendors
+    
+    def _vendor_for(self, value: int) -> Optional[str]:
+        """Поиск самого длинного префикса для MAC-адреса в виде числа"""
+        for bits in self.prefix_lengths:
+            name_offset = self._find(_record_key(value >> (48 - bits), bits))
+            if name_offset is not None:
+                return self._read_name(name_offset)
+        return None
+    
+    def close(self):
+        """Закрыть индекс"""
+        self._mmap.close()
+        self._file.close()
+    
+    def __len__(self) -> int:
+        return self.count
+
+_shared: Dict[Path, OUILookup] = {}
+_shared_lock = threading.Lock()
+
+def get_oui_lookup(index_path: Optional[Union[str, Path]] = None) -> OUILookup:
+    """Общий на процесс экземпляр OUILookup для указанного индекса"""
+    key = Path(index_path) if index_path else Path(ASSETS_DIR) / "oui.idx"
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = OUILookup(key)
+        return _shared[key]
+
+if __name__ == "__main__":
+    # python -m src.scanner.oui_database assets/oui.idx oui.csv mam.csv oui36.csv
+    if len(sys.argv) < 3:
+        print("Использование: python -m src.scanner.oui_database <индекс> <источник> [...]")
+        sys.exit(1)
+    count = compile_oui_index(sys.argv[2:], sys.argv[1])
+    print(f"Индекс {sys.argv[1]}: {count} префиксов")
@@ -0,0 +1,133 @@
+"""
+Параллельная классификация больших инвентарей в пуле процессов
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from ..core.models import NetworkDevice, DeviceType
+from .device_classifier import DeviceClassifier
+from .oui_database import get_oui_lookup
+
+# Классификатор процесса-исполнителя: создается один раз в initializer
+_worker_classifier: Optional[DeviceClassifier] = None
+
+def _init_worker(cache_size: int):
+    """Построить правила и открыть индекс OUI в процессе пула"""
+    global _worker_classifier
+    _worker_classifier = DeviceClassifier(cache_size=cache_size)
+
+def _features(device: NetworkDevice) -> Tuple:
+    """Признаки, передаваемые в процесс (без лишних полей устройства)"""
+    return (device.ip_address, device.mac_address, device.hostname, device.vendor, device.open_ports)
+
+def _classify_chunk(rows: List[Tuple]) -> List[Tuple[str, Optional[str]]]:
+    """
+    Классифицировать часть инвентаря в процессе пула
+    
+    Returns:
+        (тип, производитель) для каждой строки
+    """
+    devices = [
+        NetworkDevice(ip_address=ip, mac_address=mac, hostname=hostname, vendor=vendor, open_ports=list(ports))
+        for ip, mac, hostname, vendor, ports in rows
+    ]
+    types = _worker_classifier.classify_many(devices)
+    return [(device_type.value, device.vendor) for device, device_type in zip(devices, types)]
+
+class ParallelClassifier:
+    """
+    Классификация инвентаря частями в пуле процессов
+    
+    Каждый процесс строит свой DeviceClassifier один раз (initializer),
+    в задания передаются только признаки устройств. Результаты отдаются
+    в порядке входа по мере готовности; одновременно в работе не больше
+    max_pending частей, поэтому вход может быть генератором на миллионы
+    строк.
+    """
+    
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 5000,
+                 cache_size: int = 4096, max_pending: Optional[int] = None):
+        """
+        Args:
+            workers: Число процессов (по умолчанию - число CPU; 1 - без пула)
+            chunk_size: Устройств в одном задании
+            cache_size: Размер кэша классификатора в каждом процессе
+            max_pending: Предел частей в работе (по умолчанию 2 * workers)
+        """
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.chunk_size = max(1, int(chunk_size))
+        self.cache_size = cache_size
+        self.max_pending = max_pending or 2 * self.workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._local: Optional[DeviceClassifier] = None
+    
+    def _chunks(self, devices: Iterable[NetworkDevice]) -> Iterator[List[NetworkDevice]]:
+        """Разбить вход на части по chunk_size"""
+        iterator = iter(devices)
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+    
+    def iter_classify(self, devices: Iterable[NetworkDevice]) -> Iterator[Tuple[NetworkDevice, DeviceType]]:
+        """
+        Классифицировать устройства, отдавая (устройство, тип) по порядку
+        
+        Как и classify_device, записывает в устройство производителя по MAC.
+        """
+        if self.workers == 1:
+            if self._local is None:
+                self._local = DeviceClassifier(cache_size=self.cache_size)
+            for chunk in self._chunks(devices):
+                yield from zip(chunk, self._local.classify_many(chunk))
+            return
+        
+        if self._executor is None:
+            # Индекс OUI собирается (если нужно) один раз здесь, процессы
+            # пула только открывают готовый файл
+            get_oui_lookup()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.cache_size,)
+            )
+        
+        pending = deque()
+        
+        def drain():
+            chunk, future = pending.popleft()
+            for device, (type_value, vendor) in zip(chunk, future.result()):
+                device.vendor = vendor
+                yield device, DeviceType(type_value)
+        
+        try:
+            for chunk in self._chunks(devices):
+                if len(pending) >= self.max_pending:
+                    yield from drain()
+                pending.append((chunk, self._executor.submit(_classify_chunk, [_features(d) for d in chunk])))
+            while pending:
+                yield from drain()
+        finally:
+            for _, future in pending:
+                future.cancel()
+    
+    def classify(self, devices: Iterable[NetworkDevice]) -> List[DeviceType]:
+        """Классифицировать все устройства (типы в порядке входа)"""
+        return [device_type for _, device_type in self.iter_classify(devices)]
+    
+    def close(self):
+        """Остановить пул процессов"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
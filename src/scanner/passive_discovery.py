@@ -0,0 +1,445 @@
+"""
+Пассивное обнаружение устройств по трафику (pcap-файлы и живой захват)
+"""
+
+import ipaddress
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+import netifaces
+from scapy.all import (
+    ARP, BOOTP, DHCP, DNS, DNSRRSRV, IP, TCP, UDP, Ether, AsyncSniffer, PcapReader
+)
+
+from ..core.exceptions import FileSystemError, ScanError
+from ..core.models import NetworkDevice
+from .oui_database import get_oui_lookup
+
+# Трафик, из которого извлекаются сведения об устройствах
+CAPTURE_FILTER = (
+    "arp or (udp and (port 67 or port 68 or port 5353 or port 1900)) "
+    "or (tcp[tcpflags] & (tcp-syn|tcp-ack) == (tcp-syn|tcp-ack))"
+)
+
+MDNS_PORT = 5353
+SSDP_PORT = 1900
+# Типы записей DNS
+DNS_TYPE_A = 1
+DNS_TYPE_AAAA = 28
+
+# Длина префикса сети отправителя ARP, если маска из DHCP неизвестна
+ARP_NETWORK_PREFIX = 24
+
+_ZERO_MAC = "00:00:00:00:00:00"
+_BROADCAST_MAC = "ff:ff:ff:ff:ff:ff"
+
+def _dns_records(section) -> List:
+    """Записи раздела DNS-сообщения (список или цепочка в старых scapy)"""
+    if not section:
+        return []
+    if isinstance(section, list):
+        return section
+    return list(section.iterpayloads())
+
+def _interface_networks(interfaces: Optional[Iterable[str]] = None) -> List:
+    """Сети IPv4 и IPv6, подключенные к интерфейсам (по умолчанию - ко всем, кроме loopback)"""
+    names = list(interfaces) if interfaces else netifaces.interfaces()
+    networks = []
+    for iface in names:
+        try:
+            addrs = netifaces.ifaddresses(iface)
+        except ValueError:
+            continue
+        for family in (netifaces.AF_INET, netifaces.AF_INET6):
+            for addr_info in addrs.get(family, []):
+                ip = (addr_info.get('addr') or '').split('%')[0]
+                # netifaces отдает маску IPv6 как "ffff:ffff:ffff:ffff::/64"
+                netmask = (addr_info.get('netmask') or '').split('/')[-1]
+                if not ip or not netmask:
+                    continue
+                try:
+                    network = ipaddress.ip_network(f"{ip}/{netmask}", strict=False)
+                except ValueError:
+                    continue
+                if not network.is_loopback and not network.is_link_local and network not in networks:
+                    networks.append(network)
+    return networks
+
+def _decode(value) -> str:
+    """bytes -> str для полей scapy"""
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+class PassiveDiscovery:
+    """
+    Обнаружение устройств без отправки пакетов
+    
+    Разбираются ARP, DHCP (имя хоста и выданный адрес), mDNS (имена и
+    порты служб из SRV-записей), SSDP (порт из LOCATION и заголовок
+    SERVER) и TCP SYN/ACK (открытые порты). pcap читается потоково, а
+    таблица устройств ограничена max_devices записями: при переполнении
+    вытесняется устройство, дольше всех не виденное.
+    
+    Если сети не заданы, живой захват учитывает сети своих интерфейсов,
+    а pcap - сети из самого файла (см. capture_networks): файл мог быть
+    записан в другой сети, и сети этой машины отбросили бы его трафик.
+    """
+    
+    def __init__(self, networks: Optional[Iterable[str]] = None,
+                 max_devices: int = 4096, logger=None,
+                 interfaces: Optional[Iterable[str]] = None):
+        """
+        Args:
+            networks: Учитываемые сети в формате CIDR. По умолчанию -
+                      сети интерфейсов захвата (для pcap - сети из файла)
+                      и link-local адреса: трафик из-за маршрутизатора
+                      (в том числе из частных сетей) приходит с MAC шлюза
+                      и исказил бы его запись.
+            max_devices: Предел размера таблицы устройств
+            logger: Логгер
+            interfaces: Интерфейсы живого захвата, чьи сети учитываются по
+                        умолчанию (по умолчанию - все локальные)
+        """
+        self._explicit_networks = bool(networks)
+        self.networks = [ipaddress.ip_network(n, strict=False) for n in networks] if networks else []
+        self.interfaces = list(interfaces) if interfaces else None
+        self.max_devices = max(1, int(max_devices))
+        self.logger = logger
+        self.oui_lookup = get_oui_lookup()
+        self.packets = 0
+        # ключ устройства -> устройство, в порядке последнего появления
+        self._devices: "OrderedDict[str, NetworkDevice]" = OrderedDict()
+        self._by_ip: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._sniffer: Optional[AsyncSniffer] = None
+    
+    def _is_local(self, ip: Optional[str]) -> bool:
+        """Относится ли адрес к наблюдаемым сетям"""
+        if not ip:
+            return False
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        if address.is_unspecified or address.is_multicast or address.is_loopback:
+            return False
+        if address.is_link_local and not self._explicit_networks:
+            return True
+        return any(address in network for network in self.networks)
+    
+    @staticmethod
+    def _valid_mac(mac: Optional[str]) -> bool:
+        """Индивидуальный, не нулевой MAC-адрес"""
+        if not mac:
+            return False
+        mac = mac.lower()
+        if mac in (_ZERO_MAC, _BROADCAST_MAC):
+            return False
+        # Младший бит первого октета - групповой адрес
+        return not int(mac[:2], 16) & 1
+    
+    def _observe(self, mac: Optional[str], ip: Optional[str], seen: datetime,
+                 hostname: Optional[str] = None, ports: Iterable[int] = (),
+                 os_info: Optional[str] = None) -> Optional[NetworkDevice]:
+        """
+        Обновить запись устройства
+        
+        Returns:
+            Устройство, если о нем узнали что-то новое, иначе None
+        """
+        mac = mac.lower() if self._valid_mac(mac) else None
+        if ip is not None and not self._is_local(ip):
+            # Внешний адрес: MAC в таком кадре - MAC шлюза, а не источника
+            return None
+        if mac is None and ip is None:
+            return None
+        
+        with self._lock:
+            key = f"mac:{mac}" if mac else self._by_ip.get(ip, f"ip:{ip}")
+            device = self._devices.get(key)
+            
+            # Устройство, известное только по IP, получило MAC
+            if device is None and mac and ip and self._by_ip.get(ip, "").startswith("ip:"):
+                device = self._devices.pop(self._by_ip[ip])
+                device.mac_address = mac
+                device.vendor = self.oui_lookup.get_vendor(mac)
+            
+            changed = False
+            if device is None:
+                if ip is None:
+                    # MAC без адреса (например, DHCP DISCOVER) - ждем адрес
+                    return None
+                device = NetworkDevice(
+                    ip_address=ip,
+                    mac_address=mac,
+                    vendor=self.oui_lookup.get_vendor(mac) if mac else None
+                )
+                changed = True
+                while len(self._devices) >= self.max_devices:
+                    old_key, old = self._devices.popitem(last=False)
+                    if self._by_ip.get(old.ip_address) == old_key:
+                        del self._by_ip[old.ip_address]
+            
+            if ip and device.ip_address != ip:
+                if self._by_ip.get(device.ip_address) == key:
+                    del self._by_ip[device.ip_address]
+                device.ip_address = ip
+                changed = True
+            
+            if hostname and device.hostname != hostname:
+                device.hostname = hostname
+                changed = True
+            
+            new_ports = set(ports) - set(device.open_ports)
+            if new_ports:
+                device.open_ports = sorted(set(device.open_ports) | new_ports)
+                changed = True
+            
+            if os_info and not device.os_info:
+                device.os_info = os_info
+                changed = True
+            
+            device.last_seen = seen
+            self._devices[key] = device
+            self._devices.move_to_end(key)
+            self._by_ip[device.ip_address] = key
+        
+        return device if changed else None
+    
+    def process_packet(self, packet) -> Optional[NetworkDevice]:
+        """
+        Разобрать пакет
+        
+        Returns:
+            Обновленное устройство или None, если пакет ничего не добавил
+        """
+        self.packets += 1
+        seen = datetime.fromtimestamp(float(packet.time))
+        mac = packet[Ether].src if Ether in packet else None
+        
+        if ARP in packet:
+            arp = packet[ARP]
+            return self._observe(arp.hwsrc, arp.psrc, seen)
+        
+        if IP not in packet:
+            return None
+        ip = packet[IP].src
+        
+        if TCP in packet:
+            tcp = packet[TCP]
+            # SYN/ACK: порт источника принимает соединения
+            if tcp.flags & 0x12 == 0x12:
+                return self._observe(mac, ip, seen, ports=[tcp.sport])
+            return None
+        
+        if UDP not in packet:
+            return None
+        udp = packet[UDP]
+        
+        if DHCP in packet and BOOTP in packet:
+            return self._process_dhcp(packet, seen)
+        if DNS in packet and MDNS_PORT in (udp.sport, udp.dport):
+            return self._process_mdns(packet[DNS], mac, ip, seen)
+        if SSDP_PORT in (udp.sport, udp.dport):
+            return self._process_ssdp(bytes(udp.payload), mac, ip, seen)
+        return None
+    
+    def _process_dhcp(self, packet, seen: datetime) -> Optional[NetworkDevice]:
+        """DHCP: MAC клиента, имя хоста и выданный/запрошенный адрес"""
+        bootp = packet[BOOTP]
+        options = {}
+        for option in packet[DHCP].options:
+            if isinstance(option, tuple) and len(option) >= 2:
+                options[option[0]] = option[1]
+        
+        client_mac = ":".join(f"{b:02x}" for b in bytes(bootp.chaddr)[:6])
+        hostname = _decode(options['hostname']) if 'hostname' in options else None
+        
+        # 5 - ACK: адрес выдан; иначе - адрес, который клиент уже использует или просит
+        if options.get('message-type') == 5 and bootp.yiaddr != "0.0.0.0":
+            ip = bootp.yiaddr
+        elif bootp.ciaddr != "0.0.0.0":
+            ip = bootp.ciaddr
+        else:
+            ip = options.get('requested_addr')
+        
+        if packet[UDP].sport == 67:
+            # Ответ сервера: сам сервер тоже устройство сети
+            self._observe(packet[Ether].src if Ether in packet else None, packet[IP].src, seen, ports=[67])
+            # Имя в ответе сервера - не имя клиента
+            hostname = None
+        
+        return self._observe(client_mac, ip, seen, hostname=hostname)
+    
+    def _process_mdns(self, dns, mac: Optional[str], ip: str, seen: datetime) -> Optional[NetworkDevice]:
+        """mDNS: имя хоста из A/AAAA-записи своего адреса и порты служб из SRV"""
+        hostname = None
+        ports = []
+        
+        for record in _dns_records(dns.an) + _dns_records(dns.ar):
+            if isinstance(record, DNSRRSRV):
+                ports.append(record.port)
+            elif record.type in (DNS_TYPE_A, DNS_TYPE_AAAA) and _decode(record.rdata) == ip:
+                hostname = _decode(record.rrname).rstrip('.')
+                if hostname.endswith('.local'):
+                    hostname = hostname[:-len('.local')]
+        
+        return self._observe(mac, ip, seen, hostname=hostname, ports=ports)
+    
+    def _process_ssdp(self, payload: bytes, mac: Optional[str], ip: str,
+                      seen: datetime) -> Optional[NetworkDevice]:
+        """SSDP: порт описания устройства из LOCATION и заголовок SERVER"""
+        ports = []
+        server = None
+        
+        for line in payload.decode('utf-8', errors='replace').split('\r\n')[1:]:
+            name, _, value = line.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'location':
+                address = value.split('//', 1)[-1].split('/', 1)[0]
+                host, _, port = address.rpartition(':')
+                if host.strip('[]') == ip and port.isdigit():
+                    ports.append(int(port))
+            elif name == 'server' and value:
+                server = value
+        
+        return self._observe(mac, ip, seen, ports=ports, os_info=server)
+    
+    @staticmethod
+    def _open_pcap(path: Union[str, Path]) -> PcapReader:
+        """Открыть файл захвата для потокового чтения"""
+        try:
+            return PcapReader(str(path))
+        except (IOError, OSError) as e:
+            raise FileSystemError(f"Не удалось открыть файл захвата {path}: {e}")
+    
+    def capture_networks(self, path: Union[str, Path]) -> List:
+        """
+        Определить сети, в которых записан файл захвата
+        
+        Сеть берется из адреса и маски в ответах DHCP, а для отправителей
+        ARP, не попавших в такие сети, - /ARP_NETWORK_PREFIX вокруг
+        адреса: ARP не проходит через маршрутизатор, так что отправитель
+        всегда в сети захвата.
+        
+        Returns:
+            Список сетей IPv4
+        """
+        dhcp_networks = []
+        arp_senders = set()
+        
+        reader = self._open_pcap(path)
+        try:
+            for packet in reader:
+                try:
+                    if ARP in packet:
+                        arp_senders.add(ipaddress.ip_address(packet[ARP].psrc))
+                    elif DHCP in packet and BOOTP in packet:
+                        options = dict(o for o in packet[DHCP].options if isinstance(o, tuple) and len(o) == 2)
+                        ip = packet[BOOTP].yiaddr if packet[BOOTP].yiaddr != "0.0.0.0" else packet[BOOTP].ciaddr
+                        if 'subnet_mask' in options and ip != "0.0.0.0":
+                            network = ipaddress.ip_network(f"{ip}/{options['subnet_mask']}", strict=False)
+                            if network not in dhcp_networks:
+                                dhcp_networks.append(network)
+                except Exception:
+                    continue
+        finally:
+            reader.close()
+        
+        networks = list(dhcp_networks)
+        for address in sorted(arp_senders):
+            if address.is_unspecified or any(address in network for network in networks):
+                continue
+            networks.append(ipaddress.ip_network(f"{address}/{ARP_NETWORK_PREFIX}", strict=False))
+        return networks
+    
+    def iter_pcap(self, path: Union[str, Path]) -> Iterator[NetworkDevice]:
+        """
+        Прочитать pcap/pcapng-файл потоково
+        
+        Если сети не заданы, файл читается дважды: первый проход
+        определяет сети захвата (capture_networks).
+        
+        Returns:
+            Поток устройств в момент появления о них новых сведений
+        """
+        if not self._explicit_networks:
+            self.networks = self.capture_networks(path)
+            if self.logger:
+                self.logger.debug(f"Сети из файла захвата: {', '.join(map(str, self.networks)) or 'нет'}")
+        
+        reader = self._open_pcap(path)
+        try:
+            for packet in reader:
+                try:
+                    device = self.process_packet(packet)
+                except Exception as e:
+                    # Поврежденный или нестандартный пакет не должен прерывать разбор
+                    if self.logger:
+                        self.logger.debug(f"Пропущен пакет {self.packets}: {e}")
+                    continue
+                if device is not None:
+                    yield device
+        finally:
+            reader.close()
+        
+        if self.logger:
+            self.logger.info(f"Разобрано пакетов: {self.packets}, устройств: {len(self)}")
+    
+    def read_pcap(self, path: Union[str, Path]) -> List[NetworkDevice]:
+        """Прочитать файл захвата и вернуть все известные устройства"""
+        for _ in self.iter_pcap(path):
+            pass
+        return self.devices()
+    
+    def start_live(self, iface: Optional[str] = None,
+                   on_device: Optional[Callable[[NetworkDevice], None]] = None):
+        """
+        Начать живой захват
+        
+        Args:
+            iface: Интерфейс (по умолчанию - интерфейс scapy); если сети
+                   не заданы явно, учитываются сети этого интерфейса
+            on_device: Вызывается (в потоке захвата) для каждого обновленного устройства
+        """
+        if self._sniffer is not None:
+            raise ScanError("Захват трафика уже запущен")
+        if not self._explicit_networks:
+            self.networks = _interface_networks([iface] if iface else self.interfaces)
+        
+        def handle(packet):
+            try:
+                device = self.process_packet(packet)
+            except Exception as e:
+                if self.logger:
+                    self.logger.debug(f"Пропущен пакет: {e}")
+                return
+            if device is not None and on_device:
+                on_device(device)
+        
+        self._sniffer = AsyncSniffer(iface=iface, filter=CAPTURE_FILTER, prn=handle, store=False)
+        self._sniffer.start()
+        
+        if self.logger:
+            self.logger.info(f"Пассивное обнаружение запущено на {iface or 'интерфейсе по умолчанию'}")
+    
+    def stop_live(self) -> List[NetworkDevice]:
+        """Остановить живой захват и вернуть известные устройства"""
+        if self._sniffer is not None:
+            if self._sniffer.running:
+                self._sniffer.stop()
+            self._sniffer = None
+        return self.devices()
+    
+    def devices(self) -> List[NetworkDevice]:
+        """Снимок таблицы устройств, отсортированный по IP"""
+        with self._lock:
+            devices = list(self._devices.values())
+        return sorted(devices, key=lambda d: ipaddress.ip_address(d.ip_address))
+    
+    def __len__(self) -> int:
+        return len(self._devices)
@@ -0,0 +1,190 @@
+"""
+История открытых портов для приоритизации сканирования
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..core.constants import ASSETS_DIR, COMMON_PORTS
+from ..core.exceptions import FileSystemError
+from ..core.models import DeviceType
+
+HISTORY_VERSION = 1
+
+class PortHistory:
+    """
+    Статистика открытых портов по классам устройств
+    
+    Для каждого класса (производитель, тип устройства и все устройства
+    вместе) хранится, сколько раз порт проверялся и сколько раз был
+    открыт. Учитываются только реально проверенные порты, поэтому
+    пропущенный второй проход не занижает оценки.
+    
+    Хост сначала проверяется по небольшому набору портов с наибольшей
+    вероятностью открытия. Остальные порты проверяются, только если
+    история класса (уточненного результатом первого прохода) обещает
+    находки среди них: открытый порт первого прохода сам по себе второй
+    проход не вызывает.
+    """
+    
+    def __init__(self, history_file: Optional[Path] = None,
+                 base_ports: Optional[Iterable[int]] = None,
+                 first_pass_size: int = 4, min_samples: int = 5,
+                 expand_threshold: float = 0.1):
+        """
+        Args:
+            history_file: Файл истории
+            base_ports: Порты, проверяемые всегда (в одном из проходов)
+            first_pass_size: Число портов первого прохода
+            min_samples: Сколько проверок порта нужно, чтобы доверять оценке
+            expand_threshold: Ожидаемое число находок среди оставшихся
+                              портов, при котором выполняется второй проход
+        """
+        self.history_file = Path(history_file) if history_file else Path(ASSETS_DIR) / "port_history.json"
+        self.base_ports = sorted(set(base_ports or COMMON_PORTS))
+        self.first_pass_size = max(1, int(first_pass_size))
+        self.min_samples = max(1, int(min_samples))
+        self.expand_threshold = expand_threshold
+        # класс -> порт -> [проверок, открыт]
+        self._classes: Dict[str, Dict[int, List[int]]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+    
+    @staticmethod
+    def _class_keys(vendor: Optional[str] = None,
+                    device_type: Optional[DeviceType] = None) -> List[str]:
+        """Ключи классов от самого узкого к самому общему"""
+        keys = []
+        if device_type is not None and device_type != DeviceType.UNKNOWN:
+            keys.append(f"type:{device_type.value}")
+        if vendor:
+            keys.append(f"vendor:{vendor.strip().lower()}")
+        keys.append("*")
+        return keys
+    
+    def load(self):
+        """Загрузить историю из файла"""
+        if not self.history_file.exists():
+            return
+        
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            raise FileSystemError(f"Ошибка загрузки истории портов {self.history_file}: {e}")
+        
+        if data.get('version') != HISTORY_VERSION:
+            return
+        
+        with self._lock:
+            self._classes = {
+                key: {int(port): list(counts) for port, counts in ports.items()}
+                for key, ports in data.get('classes', {}).items()
+            }
+    
+    def save(self):
+        """Сохранить историю в файл, если она изменилась"""
+        with self._lock:
+            if not self._dirty:
+                return
+            
+            data = {
+                'version': HISTORY_VERSION,
+                'classes': {
+                    key: {str(port): counts for port, counts in sorted(ports.items())}
+                    for key, ports in self._classes.items()
+                },
+            }
+            
+            try:
+                self.history_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = self.history_file.with_suffix(self.history_file.suffix + '.tmp')
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                tmp_file.replace(self.history_file)
+            except IOError as e:
+                raise FileSystemError(f"Ошибка сохранения истории портов {self.history_file}: {e}")
+            
+            self._dirty = False
+    
+    def record(self, vendor: Optional[str], device_type: Optional[DeviceType],
+               probed: Iterable[int], open_ports: Iterable[int]):
+        """Учесть результат сканирования хоста"""
+        open_ports = set(open_ports)
+        
+        with self._lock:
+            for key in self._class_keys(vendor, device_type):
+                stats = self._classes.setdefault(key, {})
+                for port in set(probed):
+                    counts = stats.setdefault(port, [0, 0])
+                    counts[0] += 1
+                    if port in open_ports:
+                        counts[1] += 1
+            self._dirty = True
+    
+    def candidates(self) -> List[int]:
+        """Все порты, проверяемые за два прохода"""
+        with self._lock:
+            seen_open = {port for port, counts in self._classes.get("*", {}).items() if counts[1]}
+        return sorted(set(self.base_ports) | seen_open)
+    
+    def _probability(self, port: int, keys: List[str]) -> Optional[float]:
+        """Доля открытий порта в самом узком классе с достаточной статистикой"""
+        for key in keys:
+            probed, opened = self._classes.get(key, {}).get(port, (0, 0))
+            if probed >= self.min_samples:
+                return opened / probed
+        return None
+    
+    def _ranked(self, ports: Iterable[int], keys: List[str]) -> List[Tuple[int, Optional[float]]]:
+        """Порты по убыванию вероятности (без статистики - в начале)"""
+        with self._lock:
+            scored = [(port, self._probability(port, keys)) for port in ports]
+        scored.sort(key=lambda item: (-(1.0 if item[1] is None else item[1]), item[0]))
+        return scored
+    
+    def first_pass(self, vendor: Optional[str]) -> List[int]:
+        """
+        Порты первого прохода для хоста этого производителя
+        
+        Пока статистики по лучшим портам недостаточно, возвращаются все
+        порты - хост сканируется за один проход, как без истории.
+        """
+        ranked = self._ranked(self.candidates(), self._class_keys(vendor))
+        first = ranked[:self.first_pass_size]
+        if any(probability is None for _, probability in first):
+            return [port for port, _ in sorted(ranked)]
+        return sorted(port for port, _ in first)
+    
+    def second_pass(self, vendor: Optional[str], device_type: Optional[DeviceType],
+                    probed: Iterable[int]) -> List[int]:
+        """
+        Порты второго прохода
+        
+        Порт без достаточной статистики считается открытым с вероятностью
+        1, поэтому новые порты проверяются, пока история их не узнает.
+        
+        Args:
+            vendor: Производитель
+            device_type: Тип устройства по результатам первого прохода
+            probed: Порты, уже проверенные первым проходом
+        
+        Returns:
+            Оставшиеся порты или пустой список, если второй проход не нужен
+        """
+        probed = set(probed)
+        remaining = [port for port in self.candidates() if port not in probed]
+        if not remaining:
+            return []
+        
+        ranked = self._ranked(remaining, self._class_keys(vendor, device_type))
+        expected = sum(1.0 if probability is None else probability for _, probability in ranked)
+        if expected >= self.expand_threshold:
+            return [port for port, _ in ranked]
+        return []
+    
+    def __len__(self) -> int:
+        return len(self._classes)
@@ -0,0 +1,224 @@
+"""
+Адаптивное управление таймаутами, повторами и параллелизмом сканирования
+"""
+
+import ipaddress
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+@dataclass(frozen=True)
+class SpeedProfile:
+    """Начальные параметры и пределы для значения scanning.scan_speed"""
+    timeout_factor: float      # множитель к port_scan_timeout / network_timeout
+    min_timeout: float         # секунды
+    max_timeout: float         # секунды
+    base_retries: int          # повторы на сегменте без потерь
+    max_retries: int           # предел повторов на сегменте с потерями
+    initial_parallelism: float # доля от максимального параллелизма в начале
+    nmap_timing: int           # шаблон nmap -T
+
+SPEED_PROFILES = {
+    'slow': SpeedProfile(2.0, 0.1, 10.0, 2, 6, 0.25, 2),
+    'normal': SpeedProfile(1.0, 0.05, 5.0, 1, 4, 0.5, 4),
+    'fast': SpeedProfile(0.5, 0.02, 2.0, 0, 2, 1.0, 5),
+}
+
+class RttEstimator:
+    """
+    Оценка времени отклика по RFC 6298
+    
+    SRTT и RTTVAR сглаживаются экспоненциально, таймаут равен
+    SRTT + 4 * RTTVAR. После потери таймаут удваивается (алгоритм Карна)
+    до следующего успешного замера.
+    """
+    
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+    GRANULARITY = 0.01
+    # Вес последнего исхода в скользящей доле потерь
+    LOSS_WEIGHT = 0.1
+    
+    def __init__(self):
+        self.srtt: Optional[float] = None
+        self.rttvar: Optional[float] = None
+        self.backoff = 1
+        self.samples = 0
+        self.loss_rate = 0.0
+    
+    def update(self, rtt: float):
+        """Учесть успешный замер"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        
+        self.backoff = 1
+        self.samples += 1
+        self.loss_rate *= 1 - self.LOSS_WEIGHT
+    
+    def on_loss(self):
+        """Учесть потерю (ответ не получен за таймаут)"""
+        self.backoff = min(self.backoff * 2, 64)
+        self.loss_rate = self.loss_rate * (1 - self.LOSS_WEIGHT) + self.LOSS_WEIGHT
+    
+    def timeout(self, default: float, min_timeout: float, max_timeout: float) -> float:
+        """Текущий таймаут (default, пока нет замеров)"""
+        if self.srtt is None:
+            rto = default
+        else:
+            rto = self.srtt + max(self.GRANULARITY, self.K * self.rttvar)
+        return min(max(rto * self.backoff, min_timeout), max_timeout)
+
+class RateController:
+    """
+    Адаптивный контроллер скорости сканирования
+    
+    Время отклика и потери учитываются отдельно по хостам и по подсетям:
+    пока хост не ответил ни разу, используется оценка его подсети.
+    Параллелизм меняется по AIMD, как окно перегрузки TCP: каждый ответ
+    увеличивает окно на 1/окно (то есть примерно на единицу за "круг"),
+    потеря уменьшает его вдвое, но не чаще одного раза за таймаут.
+    Таймаут TCP-соединения потерей не считается: так молчит любой
+    фильтруемый порт (см. record_timeout). Все методы потокобезопасны.
+    """
+    
+    def __init__(self, speed: str = 'normal', max_parallelism: int = 10,
+                 port_timeout: float = 1.0, arp_timeout: float = 2.0,
+                 subnet_prefix: int = 24):
+        """
+        Args:
+            speed: slow, normal или fast (scanning.scan_speed)
+            max_parallelism: Верхний предел параллелизма (потоков или соединений)
+            port_timeout: Базовый таймаут проверки порта, секунды
+            arp_timeout: Базовое время ожидания ARP-ответов, секунды
+            subnet_prefix: Длина префикса, по которому хосты группируются в подсети
+        """
+        self.speed = speed if speed in SPEED_PROFILES else 'normal'
+        self.profile = SPEED_PROFILES[self.speed]
+        self.max_parallelism = max(1, int(max_parallelism))
+        self.initial_timeout = port_timeout * self.profile.timeout_factor
+        self.initial_arp_timeout = arp_timeout * self.profile.timeout_factor
+        self.subnet_prefix = subnet_prefix
+        
+        self._window = max(1.0, self.max_parallelism * self.profile.initial_parallelism)
+        self._last_decrease = 0.0
+        self._hosts: Dict[str, RttEstimator] = {}
+        self._subnets: Dict[str, RttEstimator] = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: Dict, max_parallelism: int) -> 'RateController':
+        """Создать контроллер по разделу scanning конфигурации"""
+        return cls(
+            speed=config.get('scan_speed', 'normal'),
+            max_parallelism=max_parallelism,
+            port_timeout=config.get('port_scan_timeout', 1),
+            arp_timeout=config.get('network_timeout', 2),
+        )
+    
+    def _subnet_key(self, ip: str) -> str:
+        """Подсеть, к которой относится хост"""
+        address = ipaddress.ip_address(ip)
+        prefix = self.subnet_prefix if address.version == 4 else 64
+        return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+    
+    def _estimators(self, ip: str):
+        """Оценки хоста и его подсети (вызывается под блокировкой)"""
+        host = self._hosts.get(ip)
+        if host is None:
+            host = self._hosts[ip] = RttEstimator()
+        
+        key = self._subnet_key(ip)
+        subnet = self._subnets.get(key)
+        if subnet is None:
+            subnet = self._subnets[key] = RttEstimator()
+        
+        return host, subnet
+    
+    def record_rtt(self, ip: str, rtt: float):
+        """Учесть ответ хоста, полученный через rtt секунд"""
+        with self._lock:
+            host, subnet = self._estimators(ip)
+            host.update(rtt)
+            subnet.update(rtt)
+            self._window = min(self._window + 1 / self._window, float(self.max_parallelism))
+    
+    def record_loss(self, ip: str):
+        """Учесть запрос к хосту, оставшийся без ответа"""
+        with self._lock:
+            host, subnet = self._estimators(ip)
+            host.on_loss()
+            subnet.on_loss()
+            
+            # Одна волна потерь - одно уменьшение окна
+            now = time.monotonic()
+            if now - self._last_decrease >= self._timeout(host, subnet):
+                self._window = max(1.0, self._window / 2)
+                self._last_decrease = now
+    
+    def record_timeout(self, ip: str):
+        """
+        Учесть соединение, не дождавшееся ответа (TCP connect)
+        
+        Молчание порта обычно означает фильтр, а не потерю пакета, поэтому
+        окно и доля потерь подсети не меняются. Пока хост не ответил ни
+        разу, его таймаут удваивается: оценка подсети могла оказаться
+        слишком оптимистичной.
+        """
+        with self._lock:
+            host, _ = self._estimators(ip)
+            if not host.samples:
+                host.backoff = min(host.backoff * 2, 64)
+    
+    def _timeout(self, host: RttEstimator, subnet: RttEstimator) -> float:
+        """Таймаут по оценке хоста, а без замеров - по оценке подсети"""
+        if host.samples:
+            return host.timeout(self.initial_timeout, self.profile.min_timeout, self.profile.max_timeout)
+        timeout = subnet.timeout(self.initial_timeout, self.profile.min_timeout, self.profile.max_timeout)
+        return min(timeout * host.backoff, self.profile.max_timeout)
+    
+    def timeout_for(self, ip: str) -> float:
+        """Таймаут одной пробы к хосту, секунды"""
+        with self._lock:
+            return self._timeout(*self._estimators(ip))
+    
+    def retries_for(self, ip: str) -> int:
+        """Число повторов пробы к хосту: растет с долей потерь в подсети"""
+        with self._lock:
+            _, subnet = self._estimators(ip)
+            extra = round(subnet.loss_rate * 10)
+        return min(self.profile.base_retries + extra, self.profile.max_retries)
+    
+    @property
+    def parallelism(self) -> int:
+        """Текущий допустимый параллелизм"""
+        with self._lock:
+            return int(self._window)
+    
+    def arp_timeout(self, network: str) -> float:
+        """Время ожидания запоздавших ARP-ответов в сети, секунды"""
+        key = str(ipaddress.ip_network(network, strict=False).network_address)
+        with self._lock:
+            subnet = self._subnets.get(self._subnet_key(key))
+            if subnet is None or not subnet.samples:
+                return self.initial_arp_timeout
+            return subnet.timeout(self.initial_arp_timeout, self.profile.min_timeout, self.profile.max_timeout) * 2
+    
+    def nmap_arguments(self, ips: Iterable[str]) -> str:
+        """Параметры синхронизации nmap для группы хостов"""
+        ips = list(ips)
+        initial = max((self.timeout_for(ip) for ip in ips), default=self.initial_timeout)
+        retries = max((self.retries_for(ip) for ip in ips), default=self.profile.base_retries)
+        max_rtt = max(initial, self.profile.max_timeout)
+        
+        return (
+            f"-T{self.profile.nmap_timing} "
+            f"--initial-rtt-timeout {int(initial * 1000)}ms "
+            f"--max-rtt-timeout {int(max_rtt * 1000)}ms "
+            f"--max-retries {retries}"
+        )
@@ -0,0 +1,323 @@
+"""
+Компиляция правил классификации устройств в битовые маски
+"""
+
+from dataclasses import dataclass
+from itertools import chain
+from operator import attrgetter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ..core.models import NetworkDevice, DeviceType
+from .keyword_matcher import KeywordMatcher
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    Правило классификации: выполняются все заданные условия
+    
+    Пустое условие не проверяется.
+    """
+    any_ports: Tuple[int, ...] = ()          # открыт хотя бы один порт
+    all_ports: Tuple[int, ...] = ()          # открыты все порты
+    vendor_keywords: Tuple[str, ...] = ()    # подстрока в производителе (без учета регистра)
+    hostname_keywords: Tuple[str, ...] = ()  # подстрока в имени хоста (без учета регистра)
+    ip_suffixes: Tuple[str, ...] = ()        # IP-адрес оканчивается на одну из строк
+    more_ports_than: Optional[int] = None    # открытых портов больше
+    max_ports: Optional[int] = None          # открытых портов не больше
+
+# Номера портов TCP/UDP: таблица порт -> столбец строится на весь диапазон
+PORT_RANGE = 65536
+
+def _flat_ports(devices: Sequence[NetworkDevice]):
+    """Порты всех устройств одним массивом и номер устройства для каждого порта"""
+    port_lists = list(map(attrgetter('open_ports'), devices))
+    lengths = np.fromiter(map(len, port_lists), dtype=np.intp, count=len(devices))
+    flat = np.fromiter(chain.from_iterable(port_lists), dtype=np.int64, count=int(lengths.sum()))
+    rows = np.repeat(np.arange(len(devices)), lengths)
+    valid = (flat >= 0) & (flat < PORT_RANGE)
+    return rows[valid], flat[valid], lengths
+
+def port_matrix(devices: Sequence[NetworkDevice], ports: Sequence[int]):
+    """
+    Матрица наличия портов: строка - устройство, столбец - порт из ports
+    
+    Требует NumPy.
+    """
+    rows, flat, _ = _flat_ports(devices)
+    return _port_matrix(rows, flat, len(devices), ports)
+
+def _port_matrix(rows, flat, count: int, ports: Sequence[int]):
+    """Матрица наличия портов по разобранным _flat_ports массивам"""
+    column = np.full(PORT_RANGE, -1, dtype=np.intp)
+    column[np.asarray(ports, dtype=np.intp)] = np.arange(len(ports))
+    columns = column[flat]
+    known = columns >= 0
+    
+    matrix = np.zeros((count, len(ports)), dtype=bool)
+    matrix[rows[known], columns[known]] = True
+    return matrix
+
+class RuleSet:
+    """
+    Упорядоченный набор правил, скомпилированный в битовые маски
+    
+    Каждому правилу соответствует бит. Для каждого признака устройства
+    заранее вычислена маска правил, которые он удовлетворяет: по порту,
+    по ключевому слову (автомат Ахо-Корасик), по окончанию IP и по числу
+    портов. Маска выполненных правил - пересечение масок признаков,
+    результат - тип первого правила (младший установленный бит), так что
+    порядок правил сохраняется, а сами правила не перебираются.
+    
+    Наборы ключевых слов правил - категории автомата (KeywordMatcher),
+    который можно разделить с другими наборами правил и отпечатками:
+    тогда все ключевые слова ищутся одним проходом по строке. Общий
+    автомат достраивается, пока по нему не было поиска.
+    """
+    
+    def __init__(self, rules: Sequence[Tuple[DeviceType, Rule]], distinct_ports: bool = False,
+                 matcher: Optional[KeywordMatcher] = None):
+        """
+        Args:
+            rules: Пары (тип, правило) в порядке приоритета
+            distinct_ports: Считать число портов без повторов
+            matcher: Общий автомат ключевых слов (по умолчанию - свой)
+        """
+        self.types = [device_type for device_type, _ in rules]
+        self.distinct_ports = distinct_ports
+        everything = (1 << len(rules)) - 1
+        
+        # Порты: правило any_ports выполнено любым своим портом,
+        # all_ports - когда набраны все биты его портов
+        self._any_port_rules: Dict[int, int] = {}
+        self._without_any_ports = everything
+        self._all_ports: List[Tuple[int, int]] = []
+        self._port_bits: Dict[int, int] = {}
+        
+        self._keywords = matcher if matcher is not None else KeywordMatcher()
+        # Бит категории автомата -> правила, выполненные при ее совпадении
+        self._vendor_rules: Dict[int, int] = {}
+        self._hostname_rules: Dict[int, int] = {}
+        self._without_vendor = everything
+        self._without_hostname = everything
+        self._ip_suffixes: Dict[str, int] = {}
+        self._without_ip = everything
+        self._count_rules: List[Tuple[int, Optional[int], Optional[int]]] = []
+        
+        for index, (_, rule) in enumerate(rules):
+            bit = 1 << index
+            
+            if rule.any_ports:
+                self._without_any_ports &= ~bit
+                for port in rule.any_ports:
+                    self._any_port_rules[port] = self._any_port_rules.get(port, 0) | bit
+            
+            if rule.all_ports:
+                required = 0
+                for port in rule.all_ports:
+                    if port not in self._port_bits:
+                        self._port_bits[port] = 1 << len(self._port_bits)
+                    required |= self._port_bits[port]
+                self._all_ports.append((bit, required))
+            
+            if rule.vendor_keywords:
+                self._without_vendor &= ~bit
+                category = self._keywords.add_category(rule.vendor_keywords, rule.vendor_keywords)
+                self._vendor_rules[category] = self._vendor_rules.get(category, 0) | bit
+            
+            if rule.hostname_keywords:
+                self._without_hostname &= ~bit
+                category = self._keywords.add_category(rule.hostname_keywords, rule.hostname_keywords)
+                self._hostname_rules[category] = self._hostname_rules.get(category, 0) | bit
+            
+            if rule.ip_suffixes:
+                self._without_ip &= ~bit
+                for suffix in rule.ip_suffixes:
+                    self._ip_suffixes[suffix] = self._ip_suffixes.get(suffix, 0) | bit
+            
+            if rule.more_ports_than is not None or rule.max_ports is not None:
+                self._count_rules.append((bit, rule.more_ports_than, rule.max_ports))
+        
+        # Найденные категории -> маска правил (различных сочетаний немного)
+        self._vendor_masks: Dict[int, int] = {}
+        self._hostname_masks: Dict[int, int] = {}
+        self._rule_vectors: Dict[int, object] = {}
+        self._suffixes = tuple(self._ip_suffixes)
+        self._everything = everything
+        
+        # Маски по числу портов: до наибольшего порога, дальше - последняя
+        thresholds = [0]
+        for _, more_than, max_ports in self._count_rules:
+            thresholds.extend(value + 1 for value in (more_than, max_ports) if value is not None)
+        self._count_masks = [self._count_mask(count) for count in range(max(thresholds) + 1)]
+    
+    def _count_mask(self, count: int) -> int:
+        """Маска правил, выполненных при данном числе портов"""
+        mask = self._everything
+        for bit, more_than, max_ports in self._count_rules:
+            if more_than is not None and not count > more_than:
+                mask &= ~bit
+            if max_ports is not None and not count <= max_ports:
+                mask &= ~bit
+        return mask
+    
+    @staticmethod
+    def _keyword_mask(found: int, rules: Dict[int, int], without: int) -> int:
+        """Маска правил по найденным категориям автомата"""
+        mask = without
+        for category, bits in rules.items():
+            if found & category:
+                mask |= bits
+        return mask
+    
+    def _vendor_mask(self, vendor: Optional[str]) -> int:
+        """Правила, выполненные по производителю"""
+        if not vendor:
+            return self._without_vendor
+        found = self._keywords.match(vendor.lower())
+        mask = self._vendor_masks.get(found)
+        if mask is None:
+            mask = self._vendor_masks[found] = self._keyword_mask(found, self._vendor_rules, self._without_vendor)
+        return mask
+    
+    def _hostname_mask(self, hostname: Optional[str]) -> int:
+        """Правила, выполненные по имени хоста"""
+        if not hostname:
+            return self._without_hostname
+        found = self._keywords.match(hostname.lower())
+        mask = self._hostname_masks.get(found)
+        if mask is None:
+            mask = self._hostname_masks[found] = self._keyword_mask(found, self._hostname_rules, self._without_hostname)
+        return mask
+    
+    def ip_mask(self, ip_address: str) -> int:
+        """Правила, выполненные по IP-адресу"""
+        mask = self._without_ip
+        if self._suffixes and ip_address.endswith(self._suffixes):
+            for suffix, bits in self._ip_suffixes.items():
+                if ip_address.endswith(suffix):
+                    mask |= bits
+        return mask
+    
+    def matching(self, device: NetworkDevice) -> int:
+        """Маска правил, которые выполняются для устройства"""
+        ports = device.open_ports
+        count = len(set(ports)) if self.distinct_ports else len(ports)
+        
+        mask = self._count_masks[min(count, len(self._count_masks) - 1)]
+        
+        port_mask = self._without_any_ports
+        port_bits = 0
+        for port in ports:
+            port_mask |= self._any_port_rules.get(port, 0)
+            port_bits |= self._port_bits.get(port, 0)
+        mask &= port_mask
+        
+        for bit, required in self._all_ports:
+            if port_bits & required != required:
+                mask &= ~bit
+        
+        mask &= self._vendor_mask(device.vendor)
+        mask &= self._hostname_mask(device.hostname)
+        mask &= self.ip_mask(device.ip_address)
+        
+        return mask
+    
+    def match(self, device: NetworkDevice) -> Optional[DeviceType]:
+        """Тип по первому выполненному правилу (None - ни одно не выполнено)"""
+        mask = self.matching(device)
+        if not mask:
+            return None
+        return self.types[(mask & -mask).bit_length() - 1]
+    
+    def match_many(self, devices: Sequence[NetworkDevice]) -> List[Optional[DeviceType]]:
+        """
+        Типы для списка устройств (как match() для каждого)
+        
+        С NumPy правила проверяются сразу для всех устройств матричными
+        операциями, без него - по одному устройству.
+        """
+        if np is None or not devices or not self.types:
+            return [self.match(device) for device in devices]
+        
+        satisfied = self._satisfied_matrix(devices)
+        first = satisfied.argmax(axis=1)
+        found = satisfied.any(axis=1)
+        return [self.types[index] if ok else None for index, ok in zip(first.tolist(), found.tolist())]
+    
+    def _rule_vector(self, mask: int):
+        """Булев вектор правил из битовой маски (запоминается, только чтение)"""
+        vector = self._rule_vectors.get(mask)
+        if vector is None:
+            vector = np.array([bool(mask >> index & 1) for index in range(len(self.types))])
+            vector.flags.writeable = False
+            self._rule_vectors[mask] = vector
+        return vector
+    
+    def _value_matrix(self, mask: Callable[[Optional[str]], int], values: List[Optional[str]]):
+        """
+        Выполненные правила по строковому признаку: маска вычисляется один
+        раз на каждое различное значение, строки собираются по индексу
+        """
+        index = {value: position for position, value in enumerate(dict.fromkeys(values))}
+        unique = np.array([self._rule_vector(mask(value)) for value in index])
+        inverse = np.fromiter(map(index.__getitem__, values), dtype=np.intp, count=len(values))
+        return unique[inverse]
+    
+    def _satisfied_matrix(self, devices: Sequence[NetworkDevice]):
+        """Матрица выполненных правил: строка - устройство, столбец - правило"""
+        rule_count = len(self.types)
+        ports = sorted(set(self._any_port_rules) | set(self._port_bits))
+        rows, flat, lengths = _flat_ports(devices)
+        present = _port_matrix(rows, flat, len(devices), ports)
+        
+        # Порт -> правила any_ports: пересечение сводится к умножению матриц
+        port_rules = np.array(
+            [self._rule_vector(self._any_port_rules.get(port, 0)) for port in ports],
+            dtype=np.int32
+        ).reshape(len(ports), rule_count)
+        satisfied = (present.astype(np.int32) @ port_rules) > 0
+        satisfied |= self._rule_vector(self._without_any_ports)
+        
+        column = {port: index for index, port in enumerate(ports)}
+        bit_ports = {bit: port for port, bit in self._port_bits.items()}
+        for bit, required in self._all_ports:
+            columns = [column[bit_ports[1 << index]] for index in range(required.bit_length()) if required >> index & 1]
+            satisfied[:, bit.bit_length() - 1] &= present[:, columns].all(axis=1)
+        
+        if self._count_rules:
+            if self.distinct_ports:
+                # Различные пары (устройство, порт)
+                pairs = np.unique(rows.astype(np.int64) * PORT_RANGE + flat)
+                counts = np.bincount(pairs // PORT_RANGE, minlength=len(devices))
+            else:
+                counts = lengths
+            for bit, more_than, max_ports in self._count_rules:
+                index = bit.bit_length() - 1
+                if more_than is not None:
+                    satisfied[:, index] &= counts > more_than
+                if max_ports is not None:
+                    satisfied[:, index] &= counts <= max_ports
+        
+        if self._vendor_rules:
+            satisfied &= self._value_matrix(self._vendor_mask, list(map(attrgetter('vendor'), devices)))
+        if self._hostname_rules:
+            satisfied &= self._value_matrix(self._hostname_mask, list(map(attrgetter('hostname'), devices)))
+        if self._suffixes:
+            # Адреса различны у всех устройств: маска считается только для
+            # оканчивающихся на один из суффиксов, остальным - общая
+            ips = list(map(attrgetter('ip_address'), devices))
+            matched = [index for index, ip in enumerate(ips) if ip.endswith(self._suffixes)]
+            ip_rules = np.tile(self._rule_vector(self._without_ip), (len(devices), 1))
+            if matched:
+                ip_rules[matched] = self._value_matrix(self.ip_mask, [ips[index] for index in matched])
+            satisfied &= ip_rules
+        
+        return satisfied
+    
+    def __len__(self) -> int:
+        return len(self.types)
@@ -0,0 +1,191 @@
+"""
+Кэш результатов сканирования для инкрементальных пересканирований
+"""
+
+import ipaddress
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..core.constants import ASSETS_DIR
+from ..core.exceptions import FileSystemError
+from ..core.models import NetworkDevice
+
+# Поля, изменение которых считается изменением устройства
+DIFF_FIELDS = ('ip_address', 'hostname', 'vendor', 'device_type', 'open_ports', 'os_info')
+
+@dataclass
+class ScanDiff:
+    """Разница между двумя сканированиями"""
+    added: List[NetworkDevice] = field(default_factory=list)
+    removed: List[NetworkDevice] = field(default_factory=list)
+    changed: List[Tuple[NetworkDevice, NetworkDevice]] = field(default_factory=list)
+    
+    @property
+    def has_changes(self) -> bool:
+        """Есть ли изменения"""
+        return bool(self.added or self.removed or self.changed)
+    
+    @classmethod
+    def compute(cls, previous: List[NetworkDevice], current: List[NetworkDevice]) -> 'ScanDiff':
+        """Сравнить два списка устройств (сопоставление по MAC, иначе по IP)"""
+        old_by_key = {ScanCache.device_key(d.mac_address, d.ip_address): d for d in previous}
+        diff = cls()
+        
+        for device in current:
+            old = old_by_key.pop(ScanCache.device_key(device.mac_address, device.ip_address), None)
+            if old is None:
+                diff.added.append(device)
+            elif cls._differs(old, device):
+                diff.changed.append((old, device))
+        
+        diff.removed = list(old_by_key.values())
+        return diff
+    
+    @staticmethod
+    def _differs(old: NetworkDevice, new: NetworkDevice) -> bool:
+        """Отличаются ли устройства по значимым полям"""
+        for name in DIFF_FIELDS:
+            old_value, new_value = getattr(old, name), getattr(new, name)
+            if name == 'open_ports':
+                old_value, new_value = set(old_value), set(new_value)
+            if old_value != new_value:
+                return True
+        return False
+    
+    def to_dict(self) -> Dict:
+        """Конвертировать в словарь"""
+        return {
+            'added': [d.to_dict() for d in self.added],
+            'removed': [d.to_dict() for d in self.removed],
+            'changed': [
+                {'before': old.to_dict(), 'after': new.to_dict()}
+                for old, new in self.changed
+            ],
+        }
+
+class ScanCache:
+    """
+    Постоянный кэш результатов сканирования портов
+    
+    Ключ записи - MAC-адрес (или IP, если MAC неизвестен). Запись считается
+    актуальной, пока не истек TTL и устройство не сменило IP-адрес.
+    """
+    
+    def __init__(self, cache_file: Optional[Path] = None, ttl: float = 86400):
+        self.cache_file = Path(cache_file) if cache_file else Path(ASSETS_DIR) / "scan_cache.json"
+        self.ttl = ttl
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.load()
+    
+    @staticmethod
+    def device_key(mac: Optional[str], ip: str) -> str:
+        """Ключ устройства в кэше"""
+        if mac:
+            return f"mac:{mac.upper().replace('-', ':')}"
+        return f"ip:{ip}"
+    
+    def load(self):
+        """Загрузить кэш из файла"""
+        if not self.cache_file.exists():
+            return
+        
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            raise FileSystemError(f"Ошибка загрузки кэша сканирования {self.cache_file}: {e}")
+    
+    def save(self):
+        """Сохранить кэш в файл"""
+        with self._lock:
+            data = dict(self._entries)
+        
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix(self.cache_file.suffix + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            tmp_file.replace(self.cache_file)
+        except IOError as e:
+            raise FileSystemError(f"Ошибка сохранения кэша сканирования {self.cache_file}: {e}")
+    
+    def lookup(self, arp_info: Dict) -> Optional[Dict]:
+        """
+        Получить сохраненный port_info для устройства из ARP-ответа
+        
+        Вместе с портами восстанавливаются собранные баннеры и HTTP-заголовки:
+        для устройств из кэша сбор баннеров не выполняется.
+        
+        Returns:
+            port_info, если запись актуальна, иначе None
+        """
+        key = self.device_key(arp_info.get('mac'), arp_info['ip'])
+        
+        with self._lock:
+            entry = self._entries.get(key)
+        
+        if entry is None:
+            return None
+        if entry['device']['ip_address'] != arp_info['ip']:
+            return None
+        if time.time() - entry['scanned_at'] > self.ttl:
+            return None
+        
+        device = entry['device']
+        return {
+            'open_ports': list(device.get('open_ports', [])),
+            'os_info': device.get('os_info'),
+            'hostname': device.get('hostname'),
+            'status': 'up',
+            'banners': {int(port): banner for port, banner in (device.get('banners') or {}).items()},
+            'http_headers': dict(device.get('http_headers') or {})
+        }
+    
+    def store(self, device: NetworkDevice, rescanned: bool = True):
+        """
+        Сохранить результат сканирования устройства
+        
+        Args:
+            device: Устройство
+            rescanned: False, если порты взяты из кэша - тогда TTL не продлевается
+        """
+        key = self.device_key(device.mac_address, device.ip_address)
+        
+        with self._lock:
+            previous = self._entries.get(key)
+            scanned_at = time.time()
+            if not rescanned and previous:
+                scanned_at = previous['scanned_at']
+            self._entries[key] = {'device': device.to_dict(), 'scanned_at': scanned_at}
+    
+    def remove(self, device: NetworkDevice):
+        """Удалить устройство из кэша"""
+        with self._lock:
+            self._entries.pop(self.device_key(device.mac_address, device.ip_address), None)
+    
+    def devices(self, network: Optional[str] = None) -> List[NetworkDevice]:
+        """Устройства из кэша (при указании сети - только из нее)"""
+        net = ipaddress.ip_network(network, strict=False) if network else None
+        
+        with self._lock:
+            entries = list(self._entries.values())
+        
+        devices = []
+        for entry in entries:
+            device = NetworkDevice.from_dict(entry['device'])
+            if net is None or ipaddress.ip_address(device.ip_address) in net:
+                devices.append(device)
+        return devices
+    
+    def clear(self):
+        """Очистить кэш"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
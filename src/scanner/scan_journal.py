@@ -0,0 +1,132 @@
+"""
+Журнал контрольных точек сканирования для возобновления после сбоя
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from ..core.exceptions import FileSystemError
+from ..core.models import NetworkDevice
+
+class ScanJournal:
+    """
+    Журнал сканирования в формате JSON Lines
+    
+    По мере выполнения в файл дописываются результаты ARP-сканирования
+    и готовые устройства. Каждая строка - самостоятельная запись, поэтому
+    после аварийного завершения теряется не больше одной последней строки.
+    
+    Запись ARP большой сети появляется после готовых устройств (их порты
+    сканируются, пока ARP-сканирование еще идет), поэтому она не сбрасывает
+    уже записанные устройства. Новым сканированием сети считается любая
+    запись после отметки о завершении.
+    """
+    
+    def __init__(self, path: Union[str, Path], resume: bool = False):
+        """
+        Args:
+            path: Путь к файлу журнала
+            resume: Загрузить существующий журнал, а не начинать заново
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._arp: Dict[str, List[Dict]] = {}
+        self._hosts: Dict[str, Dict[str, Dict]] = {}
+        self._completed = set()
+        
+        if resume and self.path.exists():
+            self._load()
+        
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        except IOError as e:
+            raise FileSystemError(f"Не удалось открыть журнал сканирования {self.path}: {e}")
+    
+    def _load(self):
+        """Прочитать записи журнала"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Недописанная строка в конце файла после сбоя
+                    continue
+                
+                network = record.get('network')
+                if record.get('type') == 'arp':
+                    self._start(network)
+                    self._arp[network] = record['devices']
+                elif record.get('type') == 'host':
+                    self._start(network)
+                    self._hosts.setdefault(network, {})[record['device']['ip_address']] = record['device']
+                elif record.get('type') == 'complete':
+                    self._completed.add(network)
+    
+    def _start(self, network: str):
+        """Начать новое сканирование сети, если предыдущее завершено"""
+        if network in self._completed:
+            self._completed.discard(network)
+            self._arp.pop(network, None)
+            self._hosts[network] = {}
+    
+    def _write(self, record: Dict, sync: bool = False):
+        """Дописать запись в журнал"""
+        record['time'] = datetime.now().isoformat()
+        line = json.dumps(record, ensure_ascii=False)
+        
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+    
+    def arp_results(self, network: str) -> Optional[List[Dict]]:
+        """Сохраненные результаты ARP-сканирования сети"""
+        devices = self._arp.get(network)
+        return [dict(arp_info) for arp_info in devices] if devices is not None else None
+    
+    def finished_devices(self, network: str) -> Dict[str, NetworkDevice]:
+        """Уже обработанные устройства сети (ip -> устройство)"""
+        return {
+            ip: NetworkDevice.from_dict(data)
+            for ip, data in self._hosts.get(network, {}).items()
+        }
+    
+    def is_complete(self, network: str) -> bool:
+        """Завершено ли сканирование сети"""
+        return network in self._completed
+    
+    def record_arp(self, network: str, arp_devices: List[Dict]):
+        """Записать результаты ARP-сканирования"""
+        self._start(network)
+        self._arp[network] = [dict(arp_info) for arp_info in arp_devices]
+        self._write({'type': 'arp', 'network': network, 'devices': self._arp[network]}, sync=True)
+    
+    def record_host(self, network: str, device: NetworkDevice):
+        """Записать готовое устройство"""
+        data = device.to_dict()
+        self._start(network)
+        self._hosts.setdefault(network, {})[device.ip_address] = data
+        self._write({'type': 'host', 'network': network, 'device': data})
+    
+    def record_complete(self, network: str):
+        """Отметить сканирование сети как завершенное"""
+        self._completed.add(network)
+        self._write({'type': 'complete', 'network': network}, sync=True)
+    
+    def close(self):
+        """Закрыть журнал"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+    
+    def __enter__(self) -> 'ScanJournal':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
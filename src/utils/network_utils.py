@@ -5,7 +5,12 @@
 import socket
 import ipaddress
 import subprocess
-from typing import Optional, List
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Optional, List, Dict, Tuple
 import re
 
 from ..core.exceptions import NetworkError
@@ -86,13 +91,143 @@ def port_scan_single(host: str, port: int, timeout: int = 2) -> bool:
     except Exception:
         return False
 
-def get_hostname(ip: str) -> Optional[str]:
-    """Получить hostname по IP-адресу"""
-    try:
-        hostname, _, _ = socket.gethostbyaddr(ip)
+class HostnameResolver:
+    """
+    Параллельный обратный DNS-резолвер с LRU+TTL кэшем
+    
+    socket.gethostbyaddr блокируется на время ответа PTR-сервера, поэтому
+    запросы выполняются в пуле потоков, а вызывающий код ждет не дольше
+    timeout. Ответ, пришедший после таймаута, все равно попадает в кэш.
+    
+    Очередь запросов ограничена max_pending: при переполнении отменяется
+    самый старый еще не начатый запрос (его вызывающий, скорее всего, уже
+    перестал ждать), а если все заняты - новый адрес не запрашивается.
+    """
+    
+    def __init__(self, max_workers: int = 16, timeout: float = 2.0,
+                 cache_size: int = 4096, ttl: float = 3600, negative_ttl: float = 300,
+                 max_pending: int = 1024):
+        self.timeout = timeout
+        self.max_pending = max(max_workers, max_pending)
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._cache: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rdns")
+    
+    def cached(self, ip: str) -> Tuple[bool, Optional[str]]:
+        """
+        Получить hostname из кэша
+        
+        Returns:
+            (найдено ли в кэше, hostname)
+        """
+        with self._lock:
+            entry = self._cache.get(ip)
+            if entry is None:
+                return False, None
+            
+            hostname, expires = entry
+            if expires < time.monotonic():
+                del self._cache[ip]
+                return False, None
+            
+            self._cache.move_to_end(ip)
+            return True, hostname
+    
+    def pending(self, ip: str) -> Optional[Future]:
+        """Незавершенный запрос для IP-адреса, если он есть"""
+        with self._lock:
+            return self._pending.get(ip)
+    
+    def resolve_async(self, ip: str,
+                      callback: Optional[Callable[[Optional[str]], None]] = None) -> Future:
+        """
+        Запустить обратный DNS-запрос, не дожидаясь ответа
+        
+        Args:
+            ip: IP-адрес
+            callback: Вызывается с hostname (или None), когда ответ получен
+        """
+        found, hostname = self.cached(ip)
+        
+        if found:
+            future = Future()
+            future.set_result(hostname)
+        else:
+            with self._lock:
+                future = self._pending.get(ip)
+                if future is None and self._make_room():
+                    # Повторные запросы того же IP присоединяются к уже идущему
+                    future = self._executor.submit(self._lookup, ip)
+                    self._pending[ip] = future
+            if future is None:
+                future = Future()
+                future.set_result(None)
+        
+        if callback:
+            future.add_done_callback(lambda f: callback(None if f.cancelled() else f.result()))
+        
+        return future
+    
+    def _make_room(self) -> bool:
+        """Освободить место в очереди запросов (под блокировкой)"""
+        if len(self._pending) < self.max_pending:
+            return True
+        # Словарь хранит запросы в порядке постановки
+        for ip, future in list(self._pending.items()):
+            if future.cancel():
+                del self._pending[ip]
+                return True
+        return False
+    
+    def resolve(self, ip: str, timeout: Optional[float] = None) -> Optional[str]:
+        """Получить hostname, ожидая не дольше timeout секунд"""
+        future = self.resolve_async(ip)
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except (FutureTimeoutError, CancelledError):
+            return None
+    
+    def clear_cache(self):
+        """Очистить кэш"""
+        with self._lock:
+            self._cache.clear()
+    
+    def _lookup(self, ip: str) -> Optional[str]:
+        """Выполнить запрос (в потоке пула) и сохранить результат"""
+        try:
+            hostname, _, _ = socket.gethostbyaddr(ip)
+        except (socket.herror, socket.gaierror, OSError):
+            hostname = None
+        
+        ttl = self.ttl if hostname else self.negative_ttl
+        
+        with self._lock:
+            self._cache[ip] = (hostname, time.monotonic() + ttl)
+            self._cache.move_to_end(ip)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self._pending.pop(ip, None)
+        
         return hostname
-    except (socket.herror, socket.gaierror):
-        return None
+
+_resolver: Optional[HostnameResolver] = None
+_resolver_lock = threading.Lock()
+
+def get_hostname_resolver() -> HostnameResolver:
+    """Общий резолвер приложения (кэш используется всеми модулями)"""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = HostnameResolver()
+        return _resolver
+
+def get_hostname(ip: str, timeout: Optional[float] = None) -> Optional[str]:
+    """Получить hostname по IP-адресу"""
+    return get_hostname_resolver().resolve(ip, timeout)
 
 def calculate_subnet(ip: str, netmask: str) -> str:
     """Рассчитать подсеть в формате CIDR"""
@@ -0,0 +1,201 @@
+"""
+Тесты для шардированного ARP-сканирования
+"""
+
+import ipaddress
+import unittest
+from unittest.mock import patch
+
+from scapy.all import ARP, Ether
+
+from src.core.exceptions import ScanError
+from src.scanner.arp_sweep import ArpSweeper
+from src.scanner.network_scanner import NetworkScanner
+
+class FakeClock:
+    """Часы, которые идут только во время sleep"""
+    
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+    
+    def monotonic(self) -> float:
+        return self.now
+    
+    def time(self) -> float:
+        return self.now
+    
+    def sleep(self, seconds: float):
+        self.slept += seconds
+        self.now += seconds
+
+class FakeSniffer:
+    """AsyncSniffer, получающий пакеты от FakeSocket"""
+    
+    instances = []
+    
+    def __init__(self, iface=None, filter=None, prn=None, store=False):
+        self.prn = prn
+        self.running = False
+        self.starts = 0
+        self.stops = 0
+        FakeSniffer.instances.append(self)
+    
+    def start(self):
+        self.starts += 1
+        self.running = True
+    
+    def stop(self):
+        self.stops += 1
+        self.running = False
+
+class FakeSocket:
+    """L2-сокет: запоминает запросы и отвечает за хосты из responders"""
+    
+    def __init__(self, responders, clock):
+        self.responders = responders
+        self.clock = clock
+        self.sent = []
+        self.closed = False
+    
+    def send(self, packet):
+        ip = packet[ARP].pdst
+        self.sent.append((ip, self.clock.now))
+        if ip in self.responders:
+            reply = Ether(src=self.responders[ip]) / ARP(op=2, psrc=ip, hwsrc=self.responders[ip])
+            reply.time = self.clock.now + 0.002
+            FakeSniffer.instances[-1].prn(reply)
+    
+    def close(self):
+        self.closed = True
+
+RESPONDERS = {
+    "10.0.0.5": "aa:bb:cc:00:00:05",
+    "10.0.1.7": "aa:bb:cc:00:01:07",
+    "10.0.3.254": "aa:bb:cc:00:03:fe",
+}
+
+class TestArpSweeper(unittest.TestCase):
+    """Тесты ArpSweeper с подмененным scapy"""
+    
+    def setUp(self):
+        FakeSniffer.instances = []
+        self.clock = FakeClock()
+        self.socket = FakeSocket(RESPONDERS, self.clock)
+        
+        patchers = [
+            patch('src.scanner.arp_sweep.AsyncSniffer', FakeSniffer),
+            patch('src.scanner.arp_sweep.conf.L2socket', return_value=self.socket),
+            patch('src.scanner.arp_sweep.time', self.clock),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_shards_and_rate(self):
+        """Тест обхода блоков по порядку с ограничением скорости"""
+        sweeper = ArpSweeper(shard_prefix=24, rate=1000, timeout=0)
+        rtts = {}
+        
+        replies = list(sweeper.sweep("10.0.0.0/22", on_rtt=lambda ip, rtt: rtts.setdefault(ip, rtt)))
+        
+        self.assertEqual(sorted(replies), sorted(RESPONDERS.items()))
+        self.assertEqual(set(rtts), set(RESPONDERS))
+        self.assertAlmostEqual(rtts["10.0.0.5"], 0.002, places=6)
+        
+        # Адреса сети и broadcast исключены только для всей /22
+        sent = [ip for ip, _ in self.socket.sent]
+        self.assertEqual(len(sent), 1022)
+        self.assertEqual(sent[0], "10.0.0.1")
+        self.assertIn("10.0.1.0", sent)
+        self.assertEqual(sent[-1], "10.0.3.254")
+        self.assertEqual(sent, sorted(sent, key=ipaddress.IPv4Address))
+        
+        # 1000 пакетов/с: на 1022 пакета уходит 1.022 с, не быстрее
+        self.assertAlmostEqual(self.clock.slept, 1.022, places=6)
+        times = [at for _, at in self.socket.sent]
+        self.assertAlmostEqual(times[500] - times[0], 0.5, places=6)
+        self.assertTrue(self.socket.closed)
+    
+    def test_sniffer_lifecycle(self):
+        """Тест: один сниффер на скан, остановлен и при полном проходе, и при прерывании"""
+        sweeper = ArpSweeper(shard_prefix=24, rate=0, timeout=0)
+        list(sweeper.sweep("10.0.0.0/23"))
+        
+        self.assertEqual(len(FakeSniffer.instances), 1)
+        sniffer = FakeSniffer.instances[0]
+        self.assertEqual(sniffer.starts, 1)
+        self.assertGreaterEqual(sniffer.stops, 1)
+        self.assertFalse(sniffer.running)
+        
+        # Потребитель прервал поток после первого ответа
+        self.socket.closed = False
+        stream = sweeper.sweep("10.0.0.0/22")
+        self.assertEqual(next(stream), ("10.0.0.5", RESPONDERS["10.0.0.5"]))
+        stream.close()
+        
+        self.assertEqual(len(FakeSniffer.instances), 2)
+        self.assertFalse(FakeSniffer.instances[1].running)
+        self.assertTrue(self.socket.closed)
+    
+    def test_send_error(self):
+        """Тест передачи ошибки отправки потребителю"""
+        def send(packet):
+            raise OSError("Нет доступа")
+        
+        self.socket.send = send
+        sweeper = ArpSweeper(rate=0, timeout=0)
+        
+        with self.assertRaises(ScanError):
+            list(sweeper.sweep("10.0.0.0/24"))
+        self.assertFalse(FakeSniffer.instances[0].running)
+
+class TestStreamingArp(unittest.TestCase):
+    """Тесты передачи результатов ARP сканированию портов по мере ответа"""
+    
+    def test_hosts_scanned_before_sweep_ends(self):
+        """Группы хостов уходят на сканирование портов, пока ARP еще идет"""
+        scanner = NetworkScanner(config={
+            'port_backend': 'asyncio', 'ipv6_discovery': False,
+            'banner_grabbing': False, 'arp_batch_size': 2
+        })
+        events = []
+        
+        def fake_arp(network, iface=None, timeout=None):
+            for i in range(1, 6):
+                events.append(f"arp {i}")
+                yield scanner._make_arp_info(f"10.0.{i}.1", f"aa:bb:cc:00:00:0{i}", iface)
+            events.append("arp done")
+        
+        def fake_hosts(arp_devices):
+            events.append(f"ports {len(arp_devices)}")
+            for arp_info in arp_devices:
+                yield arp_info, scanner.classify_device(
+                    arp_info, {'open_ports': [], 'os_info': None, 'hostname': None, 'status': 'up'}
+                )
+        
+        with patch.object(scanner, 'iter_arp_scan', side_effect=fake_arp), \
+                patch.object(scanner, 'arp_scan') as arp_scan, \
+                patch.object(scanner, '_iter_hosts_async', side_effect=fake_hosts):
+            devices = scanner.scan_network("10.0.0.0/16")
+            arp_scan.assert_not_called()
+        
+        self.assertEqual(len(devices), 5)
+        self.assertTrue(scanner.last_scan_complete)
+        self.assertEqual(events, [
+            "arp 1", "arp 2", "ports 2",
+            "arp 3", "arp 4", "ports 2",
+            "arp 5", "arp done", "ports 1",
+        ])
+    
+    def test_max_hosts_error_propagates(self):
+        """Превышение max_hosts не превращается в пустой результат"""
+        scanner = NetworkScanner(config={'port_backend': 'asyncio', 'max_hosts': 1022})
+        
+        with self.assertRaises(ScanError):
+            scanner.arp_scan("10.0.0.0/16")
+        with self.assertRaises(ScanError):
+            scanner.scan_network("10.0.0.0/16")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""
+Тесты для асинхронного сканера портов
+"""
+
+import errno
+import socket
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from src.scanner.async_port_scanner import AsyncPortScanner
+from src.scanner.rate_controller import RateController
+
+def _free_port() -> int:
+    """Найти свободный (закрытый) порт на loopback"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class TestAsyncPortScanner(unittest.TestCase):
+    """Тесты сканирования loopback-слушателей"""
+    
+    def setUp(self):
+        self.listeners = []
+        for _ in range(2):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(("127.0.0.1", 0))
+            sock.listen(16)
+            self.listeners.append(sock)
+        self.open_ports = sorted(s.getsockname()[1] for s in self.listeners)
+        self.closed_port = _free_port()
+        self.scanner = AsyncPortScanner(max_concurrency=4, connect_timeout=1.0)
+    
+    def tearDown(self):
+        for sock in self.listeners:
+            sock.close()
+    
+    def test_open_and_closed_ports(self):
+        """Тест определения открытых и закрытых портов"""
+        results = self.scanner.scan(["127.0.0.1"], self.open_ports + [self.closed_port])
+        
+        port_info = results["127.0.0.1"]
+        self.assertEqual(port_info['open_ports'], self.open_ports)
+        self.assertEqual(port_info['status'], 'up')
+    
+    def test_result_stream(self):
+        """Тест потоковой выдачи результатов по хостам"""
+        seen = []
+        results = self.scanner.scan(
+            ["127.0.0.1", "127.0.0.2"],
+            self.open_ports,
+            on_result=lambda ip, info: seen.append(ip)
+        )
+        
+        self.assertEqual(sorted(seen), ["127.0.0.1", "127.0.0.2"])
+        self.assertEqual(results["127.0.0.1"]['open_ports'], self.open_ports)
+    
+    def test_iter_results(self):
+        """Тест синхронного итератора результатов"""
+        stream = self.scanner.iter_results(["127.0.0.1", "127.0.0.2"], self.open_ports)
+        ip, port_info = next(stream)
+        stream.close()
+        
+        self.assertIn(ip, ["127.0.0.1", "127.0.0.2"])
+        self.assertIn('open_ports', port_info)
+    
+    def test_stop_scan(self):
+        """Тест прерывания сканирования"""
+        hosts = [f"127.0.0.{i}" for i in range(1, 20)]
+        results = self.scanner.scan(hosts, [self.closed_port], should_stop=lambda: True)
+        
+        self.assertEqual(len(results), 1)
+
+class TestSharedScanner(unittest.TestCase):
+    """Один сканер в нескольких потоках (как в scan_all_networks)"""
+    
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(128)
+        self.open_port = self.listener.getsockname()[1]
+        self.closed_ports = [_free_port() for _ in range(10)]
+        self.scanner = AsyncPortScanner(
+            max_concurrency=3, connect_timeout=1.0,
+            rate_controller=RateController('normal', max_parallelism=2, port_timeout=1.0)
+        )
+    
+    def tearDown(self):
+        self.listener.close()
+    
+    def test_concurrent_scans(self):
+        """Потоки со своими циклами событий делят общие лимиты без ошибок"""
+        peak = {'connections': 0, 'window': 0}
+        
+        def track(name, limiter):
+            acquire = limiter.acquire
+            
+            async def tracked():
+                await acquire()
+                peak[name] = max(peak[name], limiter.in_use)
+            limiter.acquire = tracked
+        
+        track('connections', self.scanner._connections)
+        track('window', self.scanner._window)
+        
+        hosts = [f"127.0.0.{i}" for i in range(1, 6)]
+        results = []
+        errors = []
+        
+        def worker():
+            try:
+                results.append(self.scanner.scan(hosts, [self.open_port] + self.closed_ports))
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertEqual(result["127.0.0.1"]['open_ports'], [self.open_port])
+        # Лимиты общие для всех потоков, а не для каждого цикла событий
+        self.assertLessEqual(peak['connections'], 3)
+        self.assertLessEqual(peak['window'], self.scanner.rate_controller.parallelism)
+        self.assertEqual((self.scanner._connections.in_use, self.scanner._window.in_use), (0, 0))
+    
+    def test_socket_error_releases_slots(self):
+        """Нехватка сокетов - потерянная проба, а не занятое навсегда место в окне"""
+        def no_sockets(*args):
+            raise OSError(errno.EMFILE, "Too many open files")
+        
+        # Подменяется только модуль сканера: циклу событий сокеты нужны
+        fake_socket = SimpleNamespace(socket=no_sockets, AF_INET=socket.AF_INET,
+                                      AF_INET6=socket.AF_INET6, SOCK_STREAM=socket.SOCK_STREAM)
+        with patch('src.scanner.async_port_scanner.socket', fake_socket):
+            results = self.scanner.scan(["127.0.0.1"], [self.open_port] + self.closed_ports)
+        
+        self.assertEqual(results["127.0.0.1"]['open_ports'], [])
+        self.assertEqual((self.scanner._connections.in_use, self.scanner._window.in_use), (0, 0))
+        
+        # Окно не потеряло мест: следующий скан проходит как обычно
+        results = self.scanner.scan(["127.0.0.1"], [self.open_port])
+        self.assertEqual(results["127.0.0.1"]['open_ports'], [self.open_port])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+"""
+Тесты для сборщика баннеров
+"""
+
+import socket
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from pathlib import Path
+from unittest.mock import patch
+
+from src.core.models import DeviceType
+from src.scanner.banner_grabber import BannerGrabber, HTTP_PORTS
+from src.scanner.network_scanner import NetworkScanner
+
+class _Server:
+    """Loopback-сервер с заданным поведением"""
+    
+    def __init__(self, greeting: bytes = b"", response: bytes = b""):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(4)
+        self.port = self.sock.getsockname()[1]
+        self.greeting = greeting
+        self.response = response
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+    
+    def _serve(self):
+        try:
+            conn, _ = self.sock.accept()
+        except OSError:
+            return
+        with conn:
+            if self.greeting:
+                conn.sendall(self.greeting)
+            if self.response:
+                conn.recv(1024)
+                conn.sendall(self.response)
+    
+    def close(self):
+        self.sock.close()
+
+class TestBannerGrabber(unittest.TestCase):
+    """Тесты сбора приветствий и HTTP-заголовков"""
+    
+    def setUp(self):
+        self.grabber = BannerGrabber(read_timeout=1.0, max_bytes=64)
+    
+    def tearDown(self):
+        self.grabber.close()
+    
+    def test_greeting_and_limits(self):
+        """Тест чтения приветствия с ограничением по объему"""
+        ssh = _Server(greeting=b"SSH-2.0-OpenSSH_8.9p1 Ubuntu\r\n")
+        flood = _Server(greeting=b"x" * 4096)
+        try:
+            result = self.grabber.grab_many({"127.0.0.1": [ssh.port, flood.port]})["127.0.0.1"]
+        finally:
+            ssh.close()
+            flood.close()
+        
+        self.assertEqual(result['banners'][ssh.port], "SSH-2.0-OpenSSH_8.9p1 Ubuntu")
+        self.assertEqual(len(result['banners'][flood.port]), 64)
+    
+    def test_http_headers(self):
+        """Тест разбора заголовков HTTP-ответа"""
+        http = _Server(response=b"HTTP/1.1 200 OK\r\nServer: hue/1.0\r\nContent-Length: 0\r\n\r\n")
+        HTTP_PORTS.add(http.port)
+        try:
+            result = self.grabber.grab_many({"127.0.0.1": [http.port]})["127.0.0.1"]
+        finally:
+            HTTP_PORTS.discard(http.port)
+            http.close()
+        
+        self.assertEqual(result['http_headers']['Server'], "hue/1.0")
+        self.assertEqual(result['banners'][http.port], "HTTP/1.1 200 OK | Server: hue/1.0")
+
+class TestScanWithBanners(unittest.TestCase):
+    """Тесты уточнения типа устройства по собранным баннерам"""
+    
+    BANNERS = {
+        '192.168.1.50': {554: 'RTSP/1.0 200 OK | Server: Dahua Rtsp Server'},
+        '192.168.1.60': {554: 'RTSP/1.0 200 OK | Server: GStreamer'},
+    }
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.scanner = NetworkScanner(config={
+            'port_backend': 'asyncio', 'ipv6_discovery': False,
+            'fingerprint_db_file': str(Path(self.tmp.name) / "fingerprints.db"),
+        })
+        self.addCleanup(self.scanner.close)
+        self.scanner.fingerprint_db.add_fingerprint(
+            "Dahua", "camera", banners={"554": "Dahua Rtsp Server"}, confidence=0.9
+        )
+    
+    def _scan(self):
+        arp_devices = [self.scanner._make_arp_info(ip, f"aa:bb:cc:00:00:{i:02x}") for i, ip in enumerate(self.BANNERS)]
+        
+        def fake_hosts(arp_devices):
+            for arp_info in arp_devices:
+                port_info = {'open_ports': [80, 554], 'os_info': None, 'hostname': None, 'status': 'up'}
+                yield arp_info, self.scanner.classify_device(arp_info, port_info)
+        
+        def fake_submit(ip, ports):
+            future = Future()
+            future.set_result({'banners': dict(self.BANNERS[ip]), 'http_headers': {}})
+            return future
+        
+        with patch.object(self.scanner, 'arp_scan', return_value=arp_devices), \
+                patch.object(self.scanner, '_iter_hosts_async', side_effect=fake_hosts), \
+                patch.object(self.scanner.banner_grabber, 'submit', side_effect=fake_submit):
+            return {d.ip_address: d for d in self.scanner.scan_network("192.168.1.0/24")}
+    
+    def test_banner_refines_type(self):
+        """Тип по портам заменяется типом отпечатка, совпавшего по баннеру"""
+        devices = self._scan()
+        
+        camera, other = devices['192.168.1.50'], devices['192.168.1.60']
+        self.assertEqual(camera.device_type, DeviceType.CAMERA)
+        self.assertEqual(camera.risk_score, self.scanner.classifier.calculate_risk_score(DeviceType.CAMERA, [80, 554]))
+        self.assertNotEqual(other.device_type, DeviceType.CAMERA)
+    
+    def test_matching_disabled(self):
+        """fingerprint_matching: false оставляет тип по правилам"""
+        self.scanner.fingerprint_matching = False
+        
+        self.assertNotEqual(self._scan()['192.168.1.50'].device_type, DeviceType.CAMERA)
+    
+    def test_close_stops_grabber_loop(self):
+        """close останавливает фоновый поток сборщика баннеров"""
+        self.scanner.banner_grabber.submit('127.0.0.1', []).result(timeout=5)
+        thread = self.scanner.banner_grabber._thread
+        self.assertTrue(thread.is_alive())
+        
+        self.scanner.close()
+        
+        self.assertFalse(thread.is_alive())
+        self.assertIsNone(self.scanner._fingerprint_db)
+
+if __name__ == '__main__':
+    unittest.main()
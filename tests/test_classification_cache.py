@@ -0,0 +1,105 @@
+"""
+Тесты для кэша классификации по подписи признаков
+"""
+
+import time
+import unittest
+from unittest import mock
+
+from src.core.models import NetworkDevice, DeviceType
+from src.scanner.device_classifier import DeviceClassifier
+from src.scanner.rule_compiler import Rule
+
+def camera(index: int, hostname: str = None) -> NetworkDevice:
+    # Локально администрируемый MAC: производитель по OUI не определяется
+    return NetworkDevice(f"10.0.0.{index}", mac_address=f"02:00:00:00:00:{index:02x}",
+                         vendor="Hikvision", hostname=hostname, open_ports=[8000])
+
+class TestClassificationCache(unittest.TestCase):
+    """Тесты LRU-кэша классификатора"""
+    
+    def setUp(self):
+        self.classifier = DeviceClassifier(cache_size=2)
+    
+    def test_identical_devices_hit_cache(self):
+        """Устройства одной модели классифицируются один раз"""
+        for index in range(10, 20):
+            self.assertEqual(self.classifier.classify_device(camera(index)), DeviceType.CAMERA)
+        
+        info = self.classifier.cache_info()
+        self.assertEqual((info['hits'], info['misses'], info['size']), (9, 1, 1))
+    
+    def test_key_keeps_relevant_features(self):
+        """Адрес шлюза и имя хоста дают другой ключ, адрес устройства - нет"""
+        self.assertEqual(self.classifier.classify("Hikvision", [8000], ip_address="10.0.0.5"), DeviceType.CAMERA)
+        # Другой адрес не шлюза - тот же ключ
+        self.assertEqual(self.classifier.classify("Hikvision", [8000], ip_address="10.0.7.42"), DeviceType.CAMERA)
+        self.assertEqual(self.classifier.cache_info()['hits'], 1)
+        
+        self.assertEqual(self.classifier.classify("Hikvision", [8000], ip_address="10.0.0.1"), DeviceType.ROUTER)
+        self.assertEqual(self.classifier.classify(None, [], hostname="camera-1"), DeviceType.IOT)
+        self.assertEqual(self.classifier.classify(None, [], hostname="nas"), DeviceType.UNKNOWN)
+        self.assertEqual(self.classifier.cache_info()['misses'], 4)
+    
+    def test_key_built_without_matchers(self):
+        """Попадание в кэш не запускает автоматы ключевых слов"""
+        self.classifier.classify_device(camera(10))
+        
+        with mock.patch.object(self.classifier._rules, 'matching', side_effect=AssertionError), \
+                mock.patch.object(self.classifier._keywords, 'match', side_effect=AssertionError):
+            self.assertEqual(self.classifier.classify_device(camera(11)), DeviceType.CAMERA)
+    
+    def test_cache_not_slower(self):
+        """Кэш ускоряет парк одинаковых устройств (лучшее из трех)"""
+        devices = [camera(index % 200 + 10) for index in range(20000)]
+        
+        def best(classifier):
+            timings = []
+            for _ in range(3):
+                start = time.perf_counter()
+                for device in devices:
+                    classifier.classify_device(device)
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+        
+        self.assertLess(best(DeviceClassifier(cache_size=4096)), best(DeviceClassifier(cache_size=0)))
+    
+    def test_lru_eviction(self):
+        for ports in ([22], [80], [22], [9100]):
+            self.classifier.classify(None, ports)
+        
+        self.classifier.classify(None, [22])
+        self.classifier.classify(None, [80])
+        info = self.classifier.cache_info()
+        self.assertEqual((info['hits'], info['misses'], info['size']), (2, 4, 2))
+    
+    def test_reload_invalidates_cache(self):
+        self.assertEqual(self.classifier.classify(None, [8000], ip_address="10.0.0.5"), DeviceType.UNKNOWN)
+        
+        rules = {DeviceType.NAS: [Rule(any_ports=(8000,))]}
+        with mock.patch.object(DeviceClassifier, '_get_classification_rules', lambda self: rules):
+            self.classifier.reload()
+        
+        self.assertEqual(self.classifier.cache_info()['size'], 0)
+        self.assertEqual(self.classifier.classify(None, [8000], ip_address="10.0.0.5"), DeviceType.NAS)
+    
+    def test_classify_many_uses_cache(self):
+        devices = [camera(index) for index in range(10, 20)] + [camera(30, hostname="camera-hall")]
+        
+        types = self.classifier.classify_many(devices)
+        
+        self.assertEqual(types, [DeviceType.CAMERA] * 10 + [DeviceType.IOT])
+        self.assertEqual(self.classifier.cache_info()['misses'], 2)
+        self.assertEqual(self.classifier.classify("Hikvision", [8000], ip_address="10.0.0.40"), DeviceType.CAMERA)
+        self.assertEqual(self.classifier.cache_info()['hits'], 10)
+    
+    def test_disabled_cache(self):
+        classifier = DeviceClassifier(cache_size=0)
+        classifier.classify(None, [22])
+        classifier.classify(None, [22])
+        
+        self.assertEqual(classifier.cache_info()['size'], 0)
+        self.assertEqual(classifier.cache_info()['misses'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+"""
+Тесты для пакетной классификации и оценки риска
+"""
+
+import gc
+import random
+import time
+import unittest
+from unittest import mock
+
+from src.core.models import NetworkDevice, DeviceType
+from src.scanner import device_classifier, rule_compiler
+from src.scanner.device_classifier import DeviceClassifier
+
+VENDORS = [None, "Cisco Systems", "HP Inc.", "Apple, Inc.", "Xiaomi", "Hikvision", "Canon", "Intel"]
+HOSTNAMES = [None, "camera-hall", "printer-1", "desktop", "nas"]
+PORTS = [21, 22, 23, 53, 80, 139, 443, 445, 554, 631, 1883, 3389, 5353, 5900, 8080, 9100, 37777, 62078]
+
+def inventory(size: int, seed: int = 7):
+    rng = random.Random(seed)
+    devices = [
+        NetworkDevice(
+            ip_address=f"10.0.{rng.randint(0, 3)}.{rng.choice([1, 11, 100, 254])}",
+            hostname=rng.choice(HOSTNAMES),
+            vendor=rng.choice(VENDORS),
+            open_ports=rng.sample(PORTS, rng.randint(0, 7)),
+        )
+        for _ in range(size)
+    ]
+    for device in devices[::3]:
+        device.mac_address = "b8:27:eb:%02x:%02x:%02x" % tuple(rng.randint(0, 255) for _ in range(3))
+    for device in devices[1::3]:
+        device.mac_address = "00:00:00:%02x:%02x:%02x" % tuple(rng.randint(0, 255) for _ in range(3))
+    return devices
+
+class TestClassifyMany(unittest.TestCase):
+    """Пакетная классификация совпадает с поштучной"""
+    
+    def setUp(self):
+        self.classifier = DeviceClassifier()
+    
+    def _expected(self, devices):
+        reference = DeviceClassifier(cache_size=0)
+        return [reference.classify_device(device) for device in devices]
+    
+    def test_matches_classify_device(self):
+        devices = inventory(3000)
+        expected = self._expected(inventory(3000))
+        
+        self.assertEqual(self.classifier.classify_many(devices), expected)
+    
+    @unittest.skipIf(rule_compiler.np is None, "numpy не установлен")
+    def test_numpy_path(self):
+        devices = inventory(500)
+        expected = self._expected(inventory(500))
+        
+        with mock.patch.object(rule_compiler.RuleSet, '_satisfied_matrix',
+                               autospec=True, side_effect=rule_compiler.RuleSet._satisfied_matrix) as matrix:
+            self.assertEqual(self.classifier.classify_many(devices), expected)
+        self.assertTrue(matrix.called)
+    
+    def test_without_numpy(self):
+        devices = inventory(500)
+        expected = self._expected(inventory(500))
+        
+        with mock.patch.object(rule_compiler, 'np', None):
+            self.assertEqual(self.classifier.classify_many(devices), expected)
+    
+    def test_empty_inventory(self):
+        self.assertEqual(self.classifier.classify_many([]), [])
+        self.assertEqual(self.classifier.risk_scores([]), [])
+    
+    def test_faster_than_single(self):
+        """Пакет быстрее поштучной классификации (лучшее из пяти, без кэша и GC)"""
+        single = DeviceClassifier(cache_size=0)
+        batch = DeviceClassifier(cache_size=0)
+        
+        def timed(classify):
+            devices = inventory(20000)
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                classify(devices)
+                return time.perf_counter() - start
+            finally:
+                gc.enable()
+        
+        timings = [
+            (timed(batch.classify_many), timed(lambda devices: [single.classify_device(device) for device in devices]))
+            for _ in range(5)
+        ]
+        self.assertLess(min(many for many, _ in timings), min(one for _, one in timings))
+    
+    def test_vendor_lookup_per_prefix(self):
+        """Производители по MAC ищутся один раз на префикс"""
+        devices = inventory(300)
+        with mock.patch.object(self.classifier.oui_lookup, '_vendor_for',
+                               wraps=self.classifier.oui_lookup._vendor_for) as lookup:
+            self.classifier.classify_many(devices)
+        
+        self.assertLessEqual(lookup.call_count, len({device.mac_address[:8] for device in devices if device.mac_address}))
+        self.assertEqual({device.vendor for device in devices[::3]}, {"Raspberry Pi"})
+    
+    def test_classify_by_features(self):
+        """classify() работает без MAC: производитель уже известен"""
+        self.assertEqual(self.classifier.classify("Hikvision", [8000]), DeviceType.CAMERA)
+        self.assertEqual(self.classifier.classify(None, [9100]), DeviceType.PRINTER)
+        self.assertEqual(self.classifier.classify(None, [], ip_address="10.0.0.1"), DeviceType.ROUTER)
+        self.assertEqual(self.classifier.classify(None, []), DeviceType.UNKNOWN)
+
+class TestRiskScores(unittest.TestCase):
+    """Тесты оценки риска"""
+    
+    def setUp(self):
+        self.classifier = DeviceClassifier()
+    
+    def test_insecure_services_raise_risk(self):
+        base = self.classifier.calculate_risk_score(DeviceType.CAMERA, [])
+        telnet = self.classifier.calculate_risk_score(DeviceType.CAMERA, [23, 23])
+        
+        self.assertAlmostEqual(telnet - base, device_classifier.PORT_RISK[23])
+        self.assertEqual(self.classifier.calculate_risk_score(DeviceType.IOT, [21, 23, 80, 5900, 37777]), 1.0)
+    
+    def test_batch_matches_single(self):
+        devices = inventory(2000)
+        types = self.classifier.classify_many(devices)
+        expected = [
+            self.classifier.calculate_risk_score(device_type, device.open_ports)
+            for device, device_type in zip(devices, types)
+        ]
+        
+        for actual, value in zip(self.classifier.risk_scores(devices, types), expected):
+            self.assertAlmostEqual(actual, value)
+        with mock.patch.object(device_classifier, 'np', None):
+            self.assertEqual(self.classifier.risk_scores(devices, types), expected)
+    
+    def test_defaults_to_device_type(self):
+        device = NetworkDevice("10.0.0.5", device_type=DeviceType.ROUTER, open_ports=[23])
+        
+        self.assertEqual(self.classifier.risk_scores([device]),
+                         [self.classifier.calculate_risk_score(DeviceType.ROUTER, [23])])
+
+if __name__ == '__main__':
+    unittest.main()
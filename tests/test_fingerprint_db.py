@@ -0,0 +1,412 @@
+"""
+Тесты для базы отпечатков устройств
+"""
+
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.core.models import NetworkDevice
+from src.scanner.fingerprint_db import FingerprintDatabase
+
+class TestFingerprintDatabaseConnections(unittest.TestCase):
+    """Тесты соединений базы отпечатков"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = FingerprintDatabase(Path(self.tmp.name) / "fingerprints.db")
+    
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+    
+    def test_wal_mode(self):
+        mode = self.db.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+    
+    def test_connection_reused_within_thread(self):
+        conn = self.db.connection
+        self.db.match_device(NetworkDevice("10.0.0.2", open_ports=[22]))
+        self.db.add_fingerprint("Acme", "iot", common_ports=[8888])
+        
+        self.assertIs(self.db.connection, conn)
+    
+    def test_match_by_mac_prefix(self):
+        match = self.db.match_device(NetworkDevice("10.0.0.2", mac_address="b8:27:eb:01:02:03"))
+        self.assertEqual(match['vendor'], "Raspberry Pi")
+    
+    def test_concurrent_match_and_insert(self):
+        """Потоки сканера сопоставляют и добавляют отпечатки одновременно"""
+        errors = []
+        
+        def worker(index):
+            try:
+                for step in range(20):
+                    self.db.add_fingerprint(f"Vendor{index}", "iot", model=f"M{step}",
+                                            common_ports=[10000 + index * 100 + step])
+                    self.db.match_device(NetworkDevice("10.0.0.2", open_ports=[22, 10000 + index * 100]))
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        count = self.db.connection.execute(
+            "SELECT COUNT(*) FROM device_fingerprints WHERE vendor LIKE 'Vendor%'").fetchone()[0]
+        self.assertEqual(count, 160)
+    
+    def test_failed_transaction_rolled_back(self):
+        with self.assertRaises(RuntimeError):
+            with self.db._transaction() as conn:
+                conn.execute("INSERT INTO device_fingerprints (vendor) VALUES ('Broken')")
+                raise RuntimeError
+        
+        count = self.db.connection.execute(
+            "SELECT COUNT(*) FROM device_fingerprints WHERE vendor = 'Broken'").fetchone()[0]
+        self.assertEqual(count, 0)
+    
+    def test_memory_database_shared_between_threads(self):
+        with FingerprintDatabase(":memory:") as db:
+            db.add_fingerprint("Acme", "iot", common_ports=[8888])
+            seen = []
+            thread = threading.Thread(target=lambda: seen.append(
+                db.match_device(NetworkDevice("10.0.0.2", open_ports=[8888]))))
+            thread.start()
+            thread.join()
+        
+        self.assertTrue(seen[0])
+
+class TestPortIndex(unittest.TestCase):
+    """Тесты сопоставления по обратному индексу портов"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "fingerprints.db"
+        self.db = FingerprintDatabase(self.path)
+    
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+    
+    def test_ranked_by_overlap(self):
+        """Выигрывает отпечаток с наибольшей долей общих портов"""
+        self.db.add_fingerprint("Acme", "camera", common_ports=[8000, 554, 80])
+        self.db.add_fingerprint("Other", "iot", common_ports=[8000, 1883, 5683, 80, 443])
+        
+        match = self.db.match_device(NetworkDevice("10.0.0.2", open_ports=[80, 554, 8000]))
+        
+        self.assertEqual(match['vendor'], "Acme")
+        self.assertEqual(match['match_score'], 1.0)
+    
+    def test_mac_prefix_outranks_partial_port_overlap(self):
+        match = self.db.match_device(NetworkDevice("10.0.0.2", mac_address="b8:27:eb:00:00:01", open_ports=[80]))
+        self.assertEqual(match['vendor'], "Raspberry Pi")
+    
+    def test_no_shared_ports(self):
+        self.assertEqual(self.db.match_device(NetworkDevice("10.0.0.2", open_ports=[31337])), {})
+    
+    def test_legacy_database_migrated(self):
+        """База старого формата: повторы удаляются, порты индексируются"""
+        self.db.close()
+        self.path.unlink()
+        conn = sqlite3.connect(self.path)
+        conn.execute('''
+            CREATE TABLE device_fingerprints (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, vendor TEXT NOT NULL, model TEXT,
+                mac_prefix TEXT, common_ports TEXT, http_headers TEXT, banners TEXT,
+                device_type TEXT, confidence REAL DEFAULT 0.8,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        for _ in range(3):
+            conn.execute(
+                "INSERT INTO device_fingerprints (vendor, common_ports, device_type) VALUES (?, ?, ?)",
+                ("Legacy", json.dumps([4711]), "iot")
+            )
+        conn.commit()
+        conn.close()
+        
+        self.db = FingerprintDatabase(self.path)
+        
+        count = self.db.connection.execute(
+            "SELECT COUNT(*) FROM device_fingerprints WHERE vendor = 'Legacy'").fetchone()[0]
+        self.assertEqual(count, 1)
+        self.assertEqual(self.db.match_device(NetworkDevice("10.0.0.2", open_ports=[4711]))['vendor'], "Legacy")
+    
+    def test_large_database(self):
+        """Время сопоставления не растет вместе с числом отпечатков"""
+        self.db.import_fingerprints(
+            {'vendor': f"Vendor{index}", 'device_type': "iot", 'common_ports': [20000 + index, 40000 + index % 100]}
+            for index in range(20000)
+        )
+        
+        start = time.perf_counter()
+        for index in range(200):
+            match = self.db.match_device(NetworkDevice("10.0.0.2", open_ports=[20000 + index, 40000 + index % 100]))
+            self.assertEqual(match['vendor'], f"Vendor{index}")
+        self.assertLess(time.perf_counter() - start, 5.0)
+
+class TestFingerprintImport(unittest.TestCase):
+    """Тесты пакетного импорта отпечатков"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "fingerprints.db"
+        self.db = FingerprintDatabase(self.path)
+    
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+    
+    def _count(self, where: str = "1") -> int:
+        return self.db.connection.execute(f"SELECT COUNT(*) FROM device_fingerprints WHERE {where}").fetchone()[0]
+    
+    def test_seeded_once(self):
+        """Начальные данные загружаются один раз (миграция), а не при каждом открытии"""
+        seeded = self._count()
+        self.db.close()
+        
+        self.db = FingerprintDatabase(self.path)
+        
+        self.assertEqual(self._count(), seeded)
+        self.assertEqual(self.db.connection.execute("PRAGMA user_version").fetchone()[0], 4)
+    
+    def test_reimport_updates_instead_of_duplicating(self):
+        feed = [{'vendor': "Acme", 'model': "Cam", 'device_type': "camera", 'common_ports': [554]}]
+        self.assertEqual(self.db.import_fingerprints(feed), 1)
+        
+        feed[0]['common_ports'] = [8000]
+        feed[0]['confidence'] = 0.95
+        self.db.import_fingerprints(feed)
+        
+        self.assertEqual(self._count("vendor = 'Acme'"), 1)
+        self.assertEqual(self.db.match_device(NetworkDevice("10.0.0.2", open_ports=[554])), {})
+        match = self.db.match_device(NetworkDevice("10.0.0.2", open_ports=[8000]))
+        self.assertEqual((match['vendor'], match['confidence']), ("Acme", 0.95))
+    
+    def test_duplicates_within_feed(self):
+        feed = [{'vendor': "Acme", 'device_type': "iot", 'common_ports': [port]} for port in (1, 2, 3)]
+        
+        self.assertEqual(self.db.import_fingerprints(feed), 3)
+        self.assertEqual(self._count("vendor = 'Acme'"), 1)
+        self.assertEqual(self.db.match_device(NetworkDevice("10.0.0.2", open_ports=[3]))['vendor'], "Acme")
+    
+    def test_bad_record_rolls_back_import(self):
+        feed = [{'vendor': "Good", 'device_type': "iot"}, {'vendor': "", 'device_type': "iot"}]
+        
+        with self.assertRaises(ValueError):
+            self.db.import_fingerprints(iter(feed))
+        self.assertEqual(self._count("vendor = 'Good'"), 0)
+    
+    def test_import_files(self):
+        csv_path = Path(self.tmp.name) / "feed.csv"
+        csv_path.write_text(
+            "vendor,model,mac_prefix,common_ports,device_type,confidence,http_headers\n"
+            "Acme,Cam,aa-bb-cc,80;554,camera,0.9,\"{\"\"Server\"\": \"\"acme\"\"}\"\n"
+            "Acme,Plug,,80,iot,,\n",
+            encoding='utf-8'
+        )
+        json_path = Path(self.tmp.name) / "feed.json"
+        json_path.write_text(json.dumps({
+            "widget": {"vendor": "Widget", "mac_prefixes": ["00:11:22", "00:11:23"],
+                       "common_ports": [23], "device_type": "iot"}
+        }), encoding='utf-8')
+        
+        self.assertEqual(self.db.import_file(csv_path), 2)
+        self.assertEqual(self.db.import_file(json_path), 2)
+        
+        match = self.db.match_device(NetworkDevice("10.0.0.2", mac_address="aa:bb:cc:00:00:01"))
+        self.assertEqual((match['model'], json.loads(match['http_headers'])), ("Cam", {"Server": "acme"}))
+        self.assertEqual(self._count("vendor = 'Widget'"), 2)
+
+    def test_csv_banners_must_be_objects(self):
+        """Скалярный баннер в CSV отклоняется, JSON-объект сопоставляется"""
+        bad_path = Path(self.tmp.name) / "bad.csv"
+        bad_path.write_text(
+            "vendor,model,common_ports,banners,device_type\n"
+            "OpenSSH Box,Srv,22,SSH-2.0-OpenSSH_8.9,server\n",
+            encoding='utf-8'
+        )
+        with self.assertRaises(ValueError):
+            self.db.import_file(bad_path)
+        self.assertEqual(self._count("vendor = 'OpenSSH Box'"), 0)
+        
+        good_path = Path(self.tmp.name) / "good.csv"
+        good_path.write_text(
+            "vendor,model,common_ports,banners,device_type\n"
+            "OpenSSH Box,Srv,22,\"{\"\"22\"\": \"\"SSH-2.0-OpenSSH_8.9\"\"}\",server\n",
+            encoding='utf-8'
+        )
+        self.assertEqual(self.db.import_file(good_path), 1)
+        
+        device = NetworkDevice("10.0.0.2", open_ports=[22], banners={22: "SSH-2.0-OpenSSH_8.9p1 Ubuntu"})
+        self.assertEqual(self.db.match_device(device)['vendor'], "OpenSSH Box")
+        self.assertEqual(self.db.match_devices([device])["10.0.0.2"]['vendor'], "OpenSSH Box")
+    
+    def test_stored_list_banners_ignored(self):
+        """Баннеры-списки из старых импортов не ломают сопоставление"""
+        self.db.add_fingerprint("Legacy", "server", common_ports=[2222])
+        with self.db._transaction() as conn:
+            conn.execute("UPDATE device_fingerprints SET banners = ?, http_headers = ? WHERE vendor = 'Legacy'",
+                         (json.dumps(["SSH-2.0"]), json.dumps(["nginx"])))
+        
+        device = NetworkDevice("10.0.0.2", open_ports=[2222], banners={2222: "SSH-2.0-dropbear"},
+                               http_headers={"Server": "nginx"})
+        self.assertEqual(self.db.match_device(device)['vendor'], "Legacy")
+        self.assertEqual(self.db.match_devices([device])["10.0.0.2"]['vendor'], "Legacy")
+
+class TestMatchDevices(unittest.TestCase):
+    """Тесты пакетного сопоставления скана"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = FingerprintDatabase(Path(self.tmp.name) / "fingerprints.db")
+        self.db.import_fingerprints([
+            {'vendor': "Acme", 'model': "Cam", 'device_type': "camera", 'common_ports': [80, 554, 8000]},
+            {'vendor': "Hue", 'device_type': "iot", 'common_ports': [80, 443],
+             'http_headers': {"Server": "hue"}, 'confidence': 0.9},
+        ])
+        self.devices = [
+            NetworkDevice("10.0.0.2", mac_address="b8:27:eb:00:00:01", open_ports=[22]),
+            NetworkDevice("10.0.0.3", open_ports=[80, 554, 8000]),
+            NetworkDevice("10.0.0.4", open_ports=[80], http_headers={"Server": "Hue/1.0"}),
+            NetworkDevice("10.0.0.5", open_ports=[31337]),
+            NetworkDevice("10.0.0.6"),
+        ]
+    
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+    
+    def test_same_result_as_match_device(self):
+        results = self.db.match_devices(self.devices)
+        
+        self.assertEqual(set(results), {"10.0.0.2", "10.0.0.3", "10.0.0.4"})
+        for device in self.devices:
+            self.assertEqual(results.get(device.ip_address, {}), self.db.match_device(device))
+        self.assertEqual(results["10.0.0.4"]['vendor'], "Hue")
+        self.assertEqual(results["10.0.0.4"]['match_confidence'], 0.9)
+    
+    def test_constant_number_of_queries(self):
+        """Число запросов не зависит от числа устройств"""
+        statements = []
+        self.db.connection.set_trace_callback(statements.append)
+        
+        def queries():
+            # Строки executemany во временные таблицы - не отдельные запросы
+            return [statement for statement in statements if not statement.lstrip().startswith("INSERT")]
+        
+        self.db.match_devices(self.devices[:2])
+        small = queries()
+        statements.clear()
+        self.db.match_devices([NetworkDevice(f"10.1.{i // 256}.{i % 256}", open_ports=[80, i]) for i in range(500)])
+        
+        self.db.connection.set_trace_callback(None)
+        self.assertEqual(len(queries()), len(small))
+    
+    def test_empty(self):
+        self.assertEqual(self.db.match_devices([]), {})
+
+class TestBannerSearch(unittest.TestCase):
+    """Тесты полнотекстового поиска по баннерам"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = FingerprintDatabase(Path(self.tmp.name) / "fingerprints.db")
+        self.db.import_fingerprints([
+            {'vendor': "Hikvision", 'device_type': "camera", 'http_headers': {"Server": "App-webs"}},
+            {'vendor': "Dahua", 'device_type': "camera", 'banners': {"554": "Dahua Rtsp Server"}},
+            {'vendor': "OpenSSH", 'device_type': "server", 'banners': {"22": "SSH-2.0-OpenSSH_8.9"}},
+        ])
+    
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+    
+    def test_ranked_search(self):
+        results = self.db.search_banners("RTSP/1.0 200 OK | Server: Dahua Rtsp Server")
+        
+        self.assertEqual(results[0]['vendor'], "Dahua")
+        self.assertEqual(self.db.search_banners("nothing in common"), [])
+    
+    def test_match_device_by_banner(self):
+        device = NetworkDevice("10.0.0.7", http_headers={"Server": "App-webs/"}, banners={22: "SSH-2.0-OpenSSH_8.9p1"})
+        
+        self.assertIn(self.db.match_device(device)['vendor'], {"Hikvision", "OpenSSH"})
+        self.assertEqual(self.db.match_devices([device])["10.0.0.7"], self.db.match_device(device))
+    
+    def test_index_follows_updates(self):
+        self.db.import_fingerprints([
+            {'vendor': "Dahua", 'device_type': "camera", 'banners': {"554": "Amcrest RTSP"}}
+        ])
+        
+        self.assertEqual(self.db.search_banners("Dahua Rtsp Server")[0]['vendor'], "Dahua")
+        self.assertNotIn("Dahua", [row['vendor'] for row in self.db.search_banners("Dahua")])
+    
+    def test_without_fts(self):
+        """Без FTS5 баннеры сопоставляются перебором с тем же результатом"""
+        device = NetworkDevice("10.0.0.7", banners={554: "Dahua Rtsp Server v2"})
+        expected = self.db.match_device(device)
+        
+        self.db._fts = False
+        
+        self.assertEqual(self.db.match_device(device), expected)
+        self.assertEqual(self.db.search_banners("dahua rtsp server v2")[0]['vendor'], "Dahua")
+    
+    def test_openssh_version_banner(self):
+        """Баннер OpenSSH_x.y находит отпечаток OpenSSH через индекс, как и перебором"""
+        self.db.import_fingerprints([
+            {'vendor': "Ubuntu", 'device_type': "server", 'banners': {"22": "OpenSSH"}}
+        ])
+        device = NetworkDevice("10.0.0.8", banners={22: "SSH-2.0-OpenSSH_9.6p1 Ubuntu-3ubuntu13"})
+        
+        self.assertEqual(FingerprintDatabase._search_query(["SSH-2.0-OpenSSH_9.6p1"]),
+                         '"0" OR "2" OR "6p1" OR "9" OR "openssh" OR "ssh"')
+        self.assertIn("Ubuntu", [row['vendor'] for row in self.db.search_banners(device.banners[22])])
+        
+        expected = self.db.match_device(device)
+        self.assertIn(expected['vendor'], {"Ubuntu", "OpenSSH"})
+        self.db._fts = False
+        self.assertEqual(self.db.match_device(device), expected)
+    
+    def test_index_built_when_fts_appears(self):
+        """Без FTS5 версия схемы не повышается, индекс создается при следующем открытии"""
+        path = Path(self.tmp.name) / "no_fts.db"
+        create_index = FingerprintDatabase._create_search_index
+        
+        class NoFts:
+            """Соединение SQLite, собранного без FTS5"""
+            def __init__(self, conn):
+                self.conn = conn
+            
+            def execute(self, sql, *args):
+                if "fts5" in sql:
+                    raise sqlite3.OperationalError("no such module: fts5")
+                return self.conn.execute(sql, *args)
+        
+        with patch.object(FingerprintDatabase, '_create_search_index',
+                          staticmethod(lambda conn: create_index(NoFts(conn)))):
+            with FingerprintDatabase(path) as db:
+                self.assertFalse(db._fts)
+                self.assertEqual(db.connection.execute("PRAGMA user_version").fetchone()[0], 3)
+        
+        with FingerprintDatabase(path) as db:
+            self.assertTrue(db._fts)
+            self.assertEqual(db.connection.execute("PRAGMA user_version").fetchone()[0], 4)
+            db.import_fingerprints([
+                {'vendor': "Dahua", 'device_type': "camera", 'banners': {"554": "Dahua Rtsp Server"}}
+            ])
+            self.assertEqual(db.search_banners("Dahua Rtsp Server")[0]['vendor'], "Dahua")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Тесты для обнаружения соседей IPv6
+"""
+
+import ipaddress
+import unittest
+from unittest.mock import patch
+
+from scapy.all import Ether, IPv6, ICMPv6EchoReply, ICMPv6ND_NA, ICMPv6NDOptDstLLAddr
+
+from src.core.models import NetworkDevice
+from src.scanner.ipv6_discovery import Ipv6Discovery, eui64_address, parse_neighbour_table
+from src.scanner.network_scanner import NetworkScanner
+
+OWN_MAC = "02:00:00:00:00:01"
+
+NEIGH_OUTPUT = """\
+fe80::1 dev eth0 lladdr aa:bb:cc:00:00:01 router REACHABLE
+2001:db8::ba27:ebff:fe00:1 dev eth0 lladdr B8:27:EB:00:00:01 STALE
+fe80::dead dev eth0  FAILED
+fe80::2 dev wlan0 lladdr aa:bb:cc:00:00:02 DELAY
+"""
+
+class TestIpv6Discovery(unittest.TestCase):
+    """Тесты разбора ответов и объединения с IPv4"""
+    
+    def test_neighbour_table(self):
+        """Тест разбора `ip -6 neigh`"""
+        self.assertEqual(parse_neighbour_table(NEIGH_OUTPUT, "eth0"), {
+            "aa:bb:cc:00:00:01": {"fe80::1"},
+            "b8:27:eb:00:00:01": {"2001:db8::ba27:ebff:fe00:1"},
+        })
+    
+    def test_eui64(self):
+        """Тест вычисления адреса SLAAC по MAC"""
+        network = ipaddress.IPv6Network("2001:db8::/64")
+        self.assertEqual(eui64_address(network, "b8:27:eb:00:00:01"), "2001:db8::ba27:ebff:fe00:1")
+    
+    def test_parse_reply(self):
+        """Тест извлечения соседа из Echo Reply и Neighbor Advertisement"""
+        echo = Ether(src="aa:bb:cc:00:00:01") / IPv6(src="fe80::1", dst="fe80::2") / ICMPv6EchoReply()
+        self.assertEqual(Ipv6Discovery.parse_reply(echo, OWN_MAC), ("aa:bb:cc:00:00:01", "fe80::1", []))
+        
+        advert = (
+            Ether(src="aa:bb:cc:00:00:09") / IPv6(src="fe80::9", dst="fe80::2") /
+            ICMPv6ND_NA(tgt="2001:db8::9") / ICMPv6NDOptDstLLAddr(lladdr="aa:bb:cc:00:00:09")
+        )
+        self.assertEqual(Ipv6Discovery.parse_reply(advert, OWN_MAC)[1], "2001:db8::9")
+        
+        own = Ether(src=OWN_MAC) / IPv6(src="fe80::2", dst="ff02::1") / ICMPv6EchoReply()
+        self.assertIsNone(Ipv6Discovery.parse_reply(own, OWN_MAC))
+    
+    def test_merge_by_mac(self):
+        """Тест объединения двухстековых хостов и добавления узлов только с IPv6"""
+        scanner = NetworkScanner(config={'port_backend': 'asyncio'})
+        device = NetworkDevice(ip_address="192.168.1.20", mac_address="B8:27:EB:00:00:01")
+        iface = {'interface': 'eth0', 'link_local': 'fe80::2', 'addresses': [], 'prefixes': []}
+        found = {
+            "b8:27:eb:00:00:01": {"fe80::ba27:ebff:fe00:1"},
+            "aa:bb:cc:00:00:09": {"fe80::9", "2001:db8::9"},
+        }
+        
+        with patch.object(scanner.ipv6_discovery, 'local_interfaces', return_value=[iface]), \
+                patch.object(scanner.ipv6_discovery, 'discover', return_value=found):
+            devices = scanner.discover_ipv6([device])
+        
+        self.assertEqual(device.ipv6_addresses, ["fe80::ba27:ebff:fe00:1"])
+        self.assertEqual(len(devices), 2)
+        self.assertEqual(devices[1].ip_address, "2001:db8::9")
+        self.assertEqual(devices[1].ipv6_addresses, ["2001:db8::9", "fe80::9"])
+    
+    def test_scan_network_only_local_interfaces(self):
+        """Тест поиска IPv6 только на интерфейсах сканируемой сети"""
+        scanner = NetworkScanner(config={'port_backend': 'asyncio'})
+        local = [
+            {'interface': 'eth0', 'network': '192.168.1.0/24'},
+            {'interface': 'eth1', 'network': '10.0.0.0/24'},
+        ]
+        
+        with patch.object(scanner, 'iter_scan', return_value=iter([])), \
+                patch.object(scanner, 'get_local_interfaces', return_value=local), \
+                patch.object(scanner, 'discover_ipv6', return_value=[]) as discover:
+            scanner.scan_network("192.168.1.5/24")
+            discover.assert_called_once_with([], ['eth0'])
+            
+            discover.reset_mock()
+            scanner.scan_network("172.16.0.0/24")
+            discover.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+"""
+Тесты для обратного DNS-резолвера
+"""
+
+import socket
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from src.utils import network_utils
+from src.utils.network_utils import HostnameResolver, get_hostname, get_hostname_resolver
+
+NAMES = {
+    '192.168.1.10': 'nas.local',
+    '192.168.1.20': 'tv.local',
+    '192.168.1.30': 'printer.local',
+}
+
+class TestHostnameResolver(unittest.TestCase):
+    """Тесты кэша и таймаута HostnameResolver"""
+    
+    def setUp(self):
+        self.now = 100.0
+        self.calls = []
+        
+        def gethostbyaddr(ip):
+            self.calls.append(ip)
+            if ip not in NAMES:
+                raise socket.herror(1, "Unknown host")
+            return NAMES[ip], [], [ip]
+        
+        patchers = [
+            patch.object(network_utils.socket, 'gethostbyaddr', side_effect=gethostbyaddr),
+            patch.object(network_utils, 'time', SimpleNamespace(monotonic=lambda: self.now)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_cache_hit(self):
+        """Повторный запрос берется из кэша"""
+        resolver = HostnameResolver()
+        
+        self.assertEqual(resolver.resolve('192.168.1.10'), 'nas.local')
+        self.assertEqual(resolver.resolve('192.168.1.10'), 'nas.local')
+        self.assertEqual(resolver.cached('192.168.1.10'), (True, 'nas.local'))
+        self.assertEqual(self.calls, ['192.168.1.10'])
+        
+        resolver.clear_cache()
+        self.assertEqual(resolver.cached('192.168.1.10'), (False, None))
+    
+    def test_lru_eviction(self):
+        """При переполнении вытесняется давно не запрошенный адрес"""
+        resolver = HostnameResolver(cache_size=2)
+        resolver.resolve('192.168.1.10')
+        resolver.resolve('192.168.1.20')
+        
+        # Обращение поднимает запись в начало очереди
+        self.assertTrue(resolver.cached('192.168.1.10')[0])
+        resolver.resolve('192.168.1.30')
+        
+        self.assertTrue(resolver.cached('192.168.1.10')[0])
+        self.assertFalse(resolver.cached('192.168.1.20')[0])
+        self.assertTrue(resolver.cached('192.168.1.30')[0])
+    
+    def test_ttl(self):
+        """Запись устаревает через ttl и запрашивается заново"""
+        resolver = HostnameResolver(ttl=60, negative_ttl=10)
+        resolver.resolve('192.168.1.10')
+        
+        self.now += 59
+        self.assertEqual(resolver.cached('192.168.1.10'), (True, 'nas.local'))
+        self.now += 2
+        self.assertEqual(resolver.cached('192.168.1.10'), (False, None))
+        
+        self.assertEqual(resolver.resolve('192.168.1.10'), 'nas.local')
+        self.assertEqual(self.calls, ['192.168.1.10', '192.168.1.10'])
+    
+    def test_negative_ttl(self):
+        """Отсутствие PTR-записи кэшируется на negative_ttl"""
+        resolver = HostnameResolver(ttl=60, negative_ttl=10)
+        
+        self.assertIsNone(resolver.resolve('10.0.0.1'))
+        self.assertEqual(resolver.cached('10.0.0.1'), (True, None))
+        self.assertIsNone(resolver.resolve('10.0.0.1'))
+        self.assertEqual(self.calls, ['10.0.0.1'])
+        
+        self.now += 11
+        self.assertEqual(resolver.cached('10.0.0.1'), (False, None))
+        self.assertIsNone(resolver.resolve('10.0.0.1'))
+        self.assertEqual(self.calls, ['10.0.0.1', '10.0.0.1'])
+    
+    def test_timeout(self):
+        """Медленный ответ не задерживает вызывающего и все равно попадает в кэш"""
+        release = threading.Event()
+        started = threading.Event()
+        
+        def slow_gethostbyaddr(ip):
+            self.calls.append(ip)
+            started.set()
+            release.wait(5)
+            return 'slow.local', [], [ip]
+        
+        resolver = HostnameResolver(timeout=0.05)
+        callbacks = []
+        called = threading.Event()
+        
+        def callback(hostname):
+            callbacks.append(hostname)
+            called.set()
+        
+        with patch.object(network_utils.socket, 'gethostbyaddr', side_effect=slow_gethostbyaddr):
+            begin = time.perf_counter()
+            self.assertIsNone(resolver.resolve('192.168.1.99'))
+            self.assertLess(time.perf_counter() - begin, 1)
+            self.assertTrue(started.wait(1))
+            
+            # Повторный запрос присоединяется к уже идущему
+            future = resolver.resolve_async('192.168.1.99', callback=callback)
+            self.assertIs(future, resolver.pending('192.168.1.99'))
+            self.assertIsNone(resolver.resolve('192.168.1.99', timeout=0))
+            
+            release.set()
+            self.assertEqual(future.result(timeout=5), 'slow.local')
+            self.assertTrue(called.wait(5))
+        
+        self.assertEqual(self.calls, ['192.168.1.99'])
+        self.assertEqual(callbacks, ['slow.local'])
+        self.assertIsNone(resolver.pending('192.168.1.99'))
+        self.assertEqual(resolver.cached('192.168.1.99'), (True, 'slow.local'))
+    
+    def test_bounded_pending(self):
+        """Переполненная очередь вытесняет самый старый неначатый запрос"""
+        release = threading.Event()
+        started = threading.Event()
+        
+        def slow_gethostbyaddr(ip):
+            self.calls.append(ip)
+            started.set()
+            release.wait(5)
+            return NAMES.get(ip, 'slow.local'), [], [ip]
+        
+        resolver = HostnameResolver(max_workers=1, max_pending=2)
+        
+        with patch.object(network_utils.socket, 'gethostbyaddr', side_effect=slow_gethostbyaddr):
+            running = resolver.resolve_async('192.168.1.99')
+            self.assertTrue(started.wait(1))
+            dropped = resolver.resolve_async('192.168.1.10', callback=self.calls.append)
+            queued = resolver.resolve_async('192.168.1.20')
+            
+            self.assertTrue(dropped.cancelled())
+            self.assertIsNone(resolver.pending('192.168.1.10'))
+            self.assertIs(resolver.pending('192.168.1.20'), queued)
+            
+            release.set()
+            self.assertEqual(queued.result(timeout=5), 'tv.local')
+            self.assertEqual(running.result(timeout=5), 'slow.local')
+        
+        # Отмененный запрос вызвал callback с None и не выполнялся
+        self.assertEqual(sorted(c for c in self.calls if c), ['192.168.1.20', '192.168.1.99'])
+        self.assertIn(None, self.calls)
+        self.assertFalse(resolver.cached('192.168.1.10')[0])
+    
+    def test_all_pending_running(self):
+        """Если все запросы уже выполняются, новый адрес не запрашивается"""
+        release = threading.Event()
+        started = threading.Event()
+        
+        def slow_gethostbyaddr(ip):
+            started.set()
+            release.wait(5)
+            return 'slow.local', [], [ip]
+        
+        resolver = HostnameResolver(max_workers=1, max_pending=1)
+        
+        with patch.object(network_utils.socket, 'gethostbyaddr', side_effect=slow_gethostbyaddr):
+            resolver.resolve_async('192.168.1.99')
+            self.assertTrue(started.wait(1))
+            
+            self.assertIsNone(resolver.resolve_async('192.168.1.10').result(timeout=0))
+            self.assertIsNone(resolver.pending('192.168.1.10'))
+            release.set()
+    
+    def test_shared_resolver(self):
+        """get_hostname использует общий резолвер приложения"""
+        resolver = HostnameResolver()
+        
+        with patch.object(network_utils, '_resolver', resolver):
+            self.assertIs(get_hostname_resolver(), resolver)
+            self.assertIs(get_hostname_resolver(), get_hostname_resolver())
+            self.assertEqual(get_hostname('192.168.1.20'), 'tv.local')
+        
+        self.assertTrue(resolver.cached('192.168.1.20')[0])
+
+if __name__ == '__main__':
+    unittest.main()
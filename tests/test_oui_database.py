@@ -0,0 +1,84 @@
+"""
+Тесты для индекса OUI
+"""
+
+import json
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from src.scanner.oui_database import OUILookup, compile_oui_index, mac_to_int
+
+REGISTRY_CSV = """Registry,Assignment,Organization Name,Organization Address
+MA-L,B827EB,Raspberry Pi Foundation,Cambridge GB
+MA-L,70B3D5,IEEE Registration Authority,Piscataway US
+MA-M,70B3D5A,Example Sensors Ltd,Somewhere
+MA-S,70B3D5A12,Tiny Cameras Inc,Elsewhere
+"""
+
+class TestOUILookup(unittest.TestCase):
+    """Тесты компиляции и поиска по индексу"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self.tmp.name)
+        
+        registry = tmp / "oui.csv"
+        registry.write_text(REGISTRY_CSV, encoding="utf-8")
+        
+        local = tmp / "local.json"
+        local.write_text(json.dumps({"00:11:22": "Cisco Systems"}), encoding="utf-8")
+        
+        self.index = tmp / "oui.idx"
+        self.count = compile_oui_index([registry, local], self.index)
+        self.lookup = OUILookup(self.index, sources=[])
+    
+    def tearDown(self):
+        self.lookup.close()
+        self.tmp.cleanup()
+    
+    def test_mac_formats(self):
+        """Тест разбора MAC-адресов"""
+        self.assertEqual(mac_to_int("b8:27:eb:00:00:01"), 0xB827EB000001)
+        self.assertEqual(mac_to_int("B8-27-EB-00-00-01"), 0xB827EB000001)
+        self.assertEqual(mac_to_int("b827.eb00.0001"), 0xB827EB000001)
+        self.assertIsNone(mac_to_int("b8:27:eb"))
+    
+    def test_vendor_lookup(self):
+        """Тест поиска производителя"""
+        self.assertEqual(len(self.lookup), self.count)
+        self.assertEqual(self.lookup.get_vendor("B8:27:EB:12:34:56"), "Raspberry Pi Foundation")
+        self.assertEqual(self.lookup.get_vendor("00-11-22-33-44-55"), "Cisco Systems")
+        self.assertIsNone(self.lookup.get_vendor("FF:FF:FF:00:00:00"))
+        self.assertIsNone(self.lookup.get_vendor("not-a-mac"))
+    
+    def test_longest_prefix(self):
+        """Тест выбора самого длинного префикса (MA-S > MA-M > MA-L)"""
+        self.assertEqual(self.lookup.get_vendor("70:B3:D5:A1:23:45"), "Tiny Cameras Inc")
+        self.assertEqual(self.lookup.get_vendor("70:B3:D5:A9:99:99"), "Example Sensors Ltd")
+        self.assertEqual(self.lookup.get_vendor("70:B3:D5:B0:00:00"), "IEEE Registration Authority")
+    
+    def test_bulk_lookup(self):
+        """get_vendors совпадает с get_vendor для каждого адреса"""
+        macs = ["B8:27:EB:00:00:01", "b8-27-eb-ff-ff-ff", None, "not-a-mac",
+                "70:B3:D5:A1:23:45", "70:B3:D5:A9:99:99", "FF:FF:FF:00:00:00", "00:11:22:33:44:55"]
+        
+        self.assertEqual(self.lookup.get_vendors(macs),
+                         [self.lookup.get_vendor(mac) if mac else None for mac in macs])
+    
+    def test_concurrent_builds(self):
+        """Одновременные сборки одного индекса не мешают друг другу"""
+        self.lookup.close()
+        sources = [Path(self.tmp.name) / "oui.csv", Path(self.tmp.name) / "local.json"]
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            counts = list(pool.map(lambda _: compile_oui_index(sources, self.index), range(64)))
+        
+        self.assertEqual(set(counts), {self.count})
+        self.assertEqual([path.name for path in Path(self.tmp.name).glob("*.tmp")], [])
+        self.lookup = OUILookup(self.index, sources=[])
+        self.assertEqual(self.lookup.get_vendor("b8:27:eb:12:34:56"), "Raspberry Pi Foundation")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Тесты для классификации в пуле процессов
+"""
+
+import random
+import unittest
+
+from src.core.models import NetworkDevice, DeviceType
+from src.scanner.device_classifier import DeviceClassifier
+from src.scanner.parallel_classifier import ParallelClassifier
+
+VENDORS = [None, "Cisco Systems", "HP Inc.", "Hikvision", "Xiaomi", "Intel"]
+PORTS = [22, 53, 80, 445, 554, 3389, 9100, 62078]
+
+def inventory(size: int):
+    rng = random.Random(3)
+    devices = []
+    for index in range(size):
+        devices.append(NetworkDevice(
+            ip_address=f"10.{index // 65536}.{index // 256 % 256}.{index % 256}",
+            mac_address=rng.choice([None, f"b8:27:eb:00:{index // 256 % 256:02x}:{index % 256:02x}"]),
+            hostname=rng.choice([None, "camera-1", "pc"]),
+            vendor=rng.choice(VENDORS),
+            open_ports=rng.sample(PORTS, rng.randint(0, 4)),
+        ))
+    return devices
+
+class TestParallelClassifier(unittest.TestCase):
+    """Результаты пула совпадают с последовательной классификацией"""
+    
+    def setUp(self):
+        reference = DeviceClassifier(cache_size=0)
+        self.expected_devices = inventory(2000)
+        self.expected = [reference.classify_device(device) for device in self.expected_devices]
+    
+    def test_ordered_stream(self):
+        devices = inventory(2000)
+        
+        with ParallelClassifier(workers=2, chunk_size=150, max_pending=3) as classifier:
+            results = list(classifier.iter_classify(device for device in devices))
+        
+        self.assertEqual([device for device, _ in results], devices)
+        self.assertEqual([device_type for _, device_type in results], self.expected)
+        # Производитель по MAC записан в устройство, как в classify_device
+        self.assertEqual([device.vendor for device in devices],
+                         [device.vendor for device in self.expected_devices])
+    
+    def test_single_worker_without_pool(self):
+        classifier = ParallelClassifier(workers=1, chunk_size=300)
+        
+        self.assertEqual(classifier.classify(inventory(2000)), self.expected)
+        self.assertIsNone(classifier._executor)
+    
+    def test_empty_inventory(self):
+        with ParallelClassifier(workers=2) as classifier:
+            self.assertEqual(classifier.classify([]), [])
+    
+    def test_types_are_device_types(self):
+        with ParallelClassifier(workers=2, chunk_size=10) as classifier:
+            types = classifier.classify(inventory(30))
+        
+        self.assertTrue(all(isinstance(device_type, DeviceType) for device_type in types))
+
+if __name__ == '__main__':
+    unittest.main()
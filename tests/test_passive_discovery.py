@@ -0,0 +1,125 @@
+"""
+Тесты для пассивного обнаружения устройств
+"""
+
+import ipaddress
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from scapy.all import ARP, BOOTP, DHCP, IP, TCP, UDP, Ether, wrpcap
+
+from src.scanner.passive_discovery import PassiveDiscovery
+
+FIXTURE = Path(__file__).parent / "fixtures" / "passive_discovery.pcap"
+
+ROUTER_MAC = "00:11:22:33:44:01"
+
+class TestPassiveDiscovery(unittest.TestCase):
+    """Тесты разбора pcap-файла"""
+    
+    def test_read_pcap(self):
+        """Тест извлечения сведений из ARP, DHCP, mDNS, SSDP и SYN/ACK"""
+        discovery = PassiveDiscovery()
+        devices = {d.ip_address: d for d in discovery.read_pcap(FIXTURE)}
+        
+        self.assertEqual(discovery.packets, 8)
+        self.assertEqual(sorted(devices), ['192.168.1.1', '192.168.1.20', '192.168.1.30', '192.168.1.40'])
+        
+        # DHCP: имя хоста клиента и выданный адрес
+        self.assertEqual(devices['192.168.1.30'].hostname, 'alice-laptop')
+        self.assertEqual(devices['192.168.1.30'].mac_address, '3c:22:fb:00:00:02')
+        
+        # mDNS: имя из A-записи и порт службы из SRV
+        self.assertEqual(devices['192.168.1.20'].hostname, 'cam-01')
+        self.assertEqual(devices['192.168.1.20'].open_ports, [554])
+        
+        # SSDP и SYN/ACK
+        self.assertEqual(devices['192.168.1.40'].open_ports, [9100, 49152])
+        self.assertIn('Printer', devices['192.168.1.40'].os_info)
+        
+        # SYN/ACK из интернета пришел с MAC шлюза и не приписан ему
+        self.assertEqual(devices['192.168.1.1'].open_ports, [67])
+    
+    def test_bounded_table(self):
+        """Тест вытеснения давно не виденных устройств"""
+        discovery = PassiveDiscovery(max_devices=2)
+        discovery.read_pcap(FIXTURE)
+        
+        self.assertEqual(len(discovery), 2)
+        self.assertEqual(
+            sorted(d.ip_address for d in discovery.devices()),
+            ['192.168.1.20', '192.168.1.40']
+        )
+    
+    def test_network_filter(self):
+        """Тест ограничения заданными сетями"""
+        discovery = PassiveDiscovery(networks=['192.168.1.0/28'])
+        
+        self.assertEqual([d.ip_address for d in discovery.read_pcap(FIXTURE)], ['192.168.1.1'])
+    
+    def test_foreign_capture_networks(self):
+        """Тест файла из чужой сети: сети берутся из DHCP и ARP в файле, а не с интерфейсов"""
+        packets = [
+            # SYN/ACK раньше, чем хост появился в ARP
+            Ether(src="3c:22:fb:00:00:05") / IP(src="10.77.3.9", dst="10.77.0.20") / TCP(sport=22, flags="SA"),
+            Ether(src=ROUTER_MAC) / IP(src="10.77.0.1", dst="10.77.0.20") / UDP(sport=67, dport=68)
+            / BOOTP(op=2, yiaddr="10.77.0.20", chaddr=bytes.fromhex("3c22fb000002"))
+            / DHCP(options=[('message-type', 5), ('subnet_mask', '255.255.0.0'), 'end']),
+            Ether(src="3c:22:fb:00:00:07") / ARP(op=2, psrc="172.31.5.7", hwsrc="3c:22:fb:00:00:07"),
+            Ether(src=ROUTER_MAC) / IP(src="93.184.216.34", dst="10.77.0.20") / TCP(sport=443, flags="SA"),
+        ]
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "foreign.pcap"
+            wrpcap(str(path), packets)
+            discovery = PassiveDiscovery()
+            
+            self.assertEqual(
+                discovery.capture_networks(path),
+                [ipaddress.ip_network('10.77.0.0/16'), ipaddress.ip_network('172.31.5.0/24')]
+            )
+            devices = {d.ip_address: d for d in discovery.read_pcap(path)}
+        
+        self.assertEqual(sorted(devices), ['10.77.0.1', '10.77.0.20', '10.77.3.9', '172.31.5.7'])
+        self.assertEqual(devices['10.77.3.9'].open_ports, [22])
+        # Порт внешнего хоста не приписан маршрутизатору
+        self.assertEqual(devices['10.77.0.1'].open_ports, [67])
+
+class TestLiveCapture(unittest.TestCase):
+    """Тесты сетей живого захвата"""
+    
+    def setUp(self):
+        patchers = [
+            patch('src.scanner.passive_discovery._interface_networks',
+                  return_value=[ipaddress.ip_network('192.168.1.0/24')]),
+            patch('src.scanner.passive_discovery.AsyncSniffer'),
+        ]
+        self.interface_networks = patchers[0].start()
+        patchers[1].start()
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+    
+    def test_off_link_private_source(self):
+        """Тест: частный адрес за маршрутизатором не считается локальным"""
+        discovery = PassiveDiscovery(interfaces=['eth0'])
+        discovery.start_live()
+        self.addCleanup(discovery.stop_live)
+        self.interface_networks.assert_called_once_with(['eth0'])
+        
+        routed = Ether(src=ROUTER_MAC) / IP(src="10.20.0.5", dst="192.168.1.30") / TCP(sport=443, flags="SA")
+        local = Ether(src=ROUTER_MAC) / IP(src="192.168.1.1", dst="192.168.1.30") / TCP(sport=53, flags="SA")
+        link_local = Ether(src="3c:22:fb:00:00:09") / IP(src="169.254.10.9", dst="192.168.1.30") / TCP(sport=80, flags="SA")
+        
+        self.assertIsNone(discovery.process_packet(routed))
+        self.assertEqual(discovery.process_packet(local).open_ports, [53])
+        self.assertIsNotNone(discovery.process_packet(link_local))
+        
+        devices = {d.ip_address: d for d in discovery.devices()}
+        self.assertEqual(sorted(devices), ['169.254.10.9', '192.168.1.1'])
+        # Порт внешнего хоста не приписан маршрутизатору
+        self.assertEqual(devices['192.168.1.1'].open_ports, [53])
+
+if __name__ == '__main__':
+    unittest.main()
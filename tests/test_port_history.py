@@ -0,0 +1,62 @@
+"""
+Тесты для истории открытых портов
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.core.models import DeviceType
+from src.scanner.port_history import PortHistory
+
+PORTS = [22, 80, 443, 554, 8080, 9100]
+
+class TestPortHistory(unittest.TestCase):
+    """Тесты выбора портов первого и второго прохода"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "history.json"
+        self.history = PortHistory(self.path, base_ports=PORTS, first_pass_size=2, min_samples=3)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def _train(self):
+        for _ in range(5):
+            self.history.record("HikVision", DeviceType.CAMERA, PORTS, [80, 554])
+            self.history.record("HP", DeviceType.PRINTER, PORTS, [9100])
+    
+    def test_cold_start_scans_everything(self):
+        """Без истории хост сканируется одним проходом по всем портам"""
+        self.assertEqual(self.history.first_pass("HikVision"), PORTS)
+    
+    def test_first_pass_uses_vendor_history(self):
+        """Первый проход - самые часто открытые порты производителя"""
+        self._train()
+        
+        self.assertEqual(self.history.first_pass("HikVision"), [80, 554])
+        self.assertIn(9100, self.history.first_pass("HP"))
+    
+    def test_second_pass(self):
+        """Второй проход - только если история обещает находки среди оставшихся портов"""
+        self._train()
+        
+        self.assertEqual(self.history.second_pass("HP", None, [80, 554]), [9100, 22, 443, 8080])
+        self.assertEqual(self.history.second_pass("HikVision", DeviceType.CAMERA, [80, 554]), [])
+        # Открытые порты первого прохода сами по себе второй проход не вызывают
+        self.assertEqual(self.history.second_pass("HikVision", None, [80, 554]), [])
+        # Порт без статистики проверяется (вместе с остальными)
+        self.history.base_ports.append(1883)
+        self.assertEqual(self.history.second_pass("HikVision", DeviceType.CAMERA, [80, 554])[0], 1883)
+    
+    def test_persistence(self):
+        """История сохраняется и загружается"""
+        self._train()
+        self.history.save()
+        
+        restored = PortHistory(self.path, base_ports=PORTS, first_pass_size=2, min_samples=3)
+        self.assertEqual(restored.first_pass("HikVision"), [80, 554])
+
+if __name__ == '__main__':
+    unittest.main()
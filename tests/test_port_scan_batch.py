@@ -0,0 +1,197 @@
+"""
+Тесты для пакетного сканирования портов через nmap
+"""
+
+import re
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from src.scanner.network_scanner import NetworkScanner
+
+# Результаты nmap по хостам: порт -> состояние; хоста 192.168.1.30 в выводе нет
+NMAP_HOSTS = {
+    '192.168.1.10': {'ports': {22: 'open', 80: 'closed', 443: 'open'}, 'os': 'Linux 5.4', 'hostname': 'nas'},
+    '192.168.1.20': {'ports': {22: 'filtered', 80: 'open'}, 'os': None, 'hostname': ''},
+    '192.168.1.40': {'ports': {9100: 'open'}, 'os': None, 'hostname': 'printer'},
+    '192.168.1.50': {'ports': {}, 'os': None, 'hostname': ''},
+}
+
+class FakeHost(dict):
+    """Результат nmap по одному хосту (PortScannerHostDict)"""
+    
+    def __init__(self, info):
+        super().__init__(tcp={port: {'state': state} for port, state in info['ports'].items()})
+        if info['os']:
+            self['osmatch'] = [{'name': info['os']}]
+        self._hostname = info['hostname']
+    
+    def all_protocols(self):
+        return [proto for proto in ('tcp', 'udp') if proto in self]
+    
+    def hostname(self):
+        return self._hostname
+    
+    def state(self):
+        return 'up'
+
+class FakePortScanner:
+    """nmap.PortScanner, отвечающий из NMAP_HOSTS"""
+    
+    calls = []
+    lock = threading.Lock()
+    
+    def __init__(self):
+        self._hosts = {}
+    
+    def scan(self, hosts, arguments=''):
+        with FakePortScanner.lock:
+            FakePortScanner.calls.append((hosts, arguments))
+        self._hosts = {ip: FakeHost(NMAP_HOSTS[ip]) for ip in hosts.split() if ip in NMAP_HOSTS}
+    
+    def all_hosts(self):
+        return sorted(self._hosts)
+    
+    def __getitem__(self, ip):
+        return self._hosts[ip]
+    
+    def get_nmap_last_output(self):
+        hosts = ''.join(
+            f'<host><status state="up"/><address addr="{ip}"/><times srtt="1500"/></host>'
+            for ip in self._hosts
+        )
+        return f'<nmaprun>{hosts}</nmaprun>'
+
+def arp_info(ip: str) -> dict:
+    return {'ip': ip, 'mac': f"aa:bb:cc:00:00:{ip.rsplit('.', 1)[1]}", 'vendor': None, 'hostname': None, 'interface': None}
+
+class TestPortScanBatch(unittest.TestCase):
+    """Тесты разбиения на группы и разбора вывода nmap"""
+    
+    def setUp(self):
+        FakePortScanner.calls = []
+        patcher = patch('src.scanner.network_scanner.nmap', SimpleNamespace(PortScanner=FakePortScanner))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _scanner(self, **config) -> NetworkScanner:
+        config = {'port_backend': 'nmap', 'port_prioritization': False, 'banner_grabbing': False,
+                  'ipv6_discovery': False, **config}
+        return NetworkScanner(config=config)
+    
+    def test_split_batches(self):
+        """Группы не больше batch_size и не меньше, чем нужно для загрузки потоков"""
+        hosts = [arp_info(f'10.0.0.{i}') for i in range(1, 101)]
+        scanner = self._scanner(batch_size=32)
+        
+        self.assertEqual([len(b) for b in scanner._split_batches(hosts, 2)], [32, 32, 32, 4])
+        self.assertEqual([len(b) for b in scanner._split_batches(hosts[:10], 4)], [3, 3, 3, 1])
+        self.assertEqual([len(b) for b in scanner._split_batches(hosts[:3], 10)], [1, 1, 1])
+        self.assertEqual(scanner._split_batches([], 4), [])
+        
+        batches = scanner._split_batches(hosts, 2)
+        self.assertEqual([a for batch in batches for a in batch], hosts)
+        
+        single = self._scanner(port_scan_mode='single')
+        self.assertEqual([len(b) for b in single._split_batches(hosts[:5], 2)], [1] * 5)
+    
+    def test_port_scan_batch(self):
+        """Один запуск nmap на группу; хост, которого нет в выводе, - down"""
+        scanner = self._scanner()
+        ips = ['192.168.1.10', '192.168.1.20', '192.168.1.30']
+        
+        with patch.object(scanner.rate_controller, 'record_loss') as record_loss, \
+                patch.object(scanner.rate_controller, 'record_rtt') as record_rtt:
+            results = scanner.port_scan_batch(ips, [22, 80, 443])
+        
+        self.assertEqual(len(FakePortScanner.calls), 1)
+        hosts, arguments = FakePortScanner.calls[0]
+        self.assertEqual(hosts, '192.168.1.10 192.168.1.20 192.168.1.30')
+        self.assertIn('-p 22,80,443', arguments)
+        
+        self.assertEqual(sorted(results), ips)
+        self.assertEqual(sorted(results['192.168.1.10']['open_ports']), [22, 443])
+        self.assertEqual(results['192.168.1.10']['os_info'], 'Linux 5.4')
+        self.assertEqual(results['192.168.1.10']['hostname'], 'nas')
+        self.assertEqual(results['192.168.1.20']['open_ports'], [80])
+        self.assertEqual(results['192.168.1.20']['status'], 'up')
+        self.assertEqual(
+            results['192.168.1.30'],
+            {'open_ports': [], 'os_info': None, 'hostname': None, 'status': 'down'}
+        )
+        
+        # Отсутствующий хост - потеря, остальные дали замер RTT
+        record_loss.assert_called_once_with('192.168.1.30')
+        self.assertEqual(sorted(c.args for c in record_rtt.call_args_list),
+                         [('192.168.1.10', 0.0015), ('192.168.1.20', 0.0015)])
+    
+    def test_scan_error(self):
+        """Ошибка nmap дает down для всей группы, а не исключение"""
+        scanner = self._scanner()
+        
+        with patch.object(FakePortScanner, 'scan', side_effect=RuntimeError("nmap: permission denied")):
+            results = scanner.port_scan_batch(['192.168.1.10', '192.168.1.20'])
+        
+        self.assertEqual({r['status'] for r in results.values()}, {'down'})
+        self.assertEqual(scanner.port_scan_batch([]), {})
+    
+    def test_iter_hosts_nmap(self):
+        """Все хосты проходят через группы пула потоков"""
+        scanner = self._scanner(batch_size=2, max_workers=2)
+        scanner.is_scanning = True
+        hosts = [arp_info(ip) for ip in ('192.168.1.10', '192.168.1.20', '192.168.1.30',
+                                         '192.168.1.40', '192.168.1.50')]
+        
+        results = list(scanner._iter_hosts_nmap(hosts, 2))
+        
+        self.assertEqual(sorted(a['ip'] for a, _ in results), [a['ip'] for a in hosts])
+        self.assertEqual(sorted(len(call[0].split()) for call in FakePortScanner.calls), [1, 2, 2])
+        
+        devices = {a['ip']: device for a, device in results}
+        self.assertEqual(devices['192.168.1.40'].open_ports, [9100])
+        self.assertEqual(devices['192.168.1.30'].open_ports, [])
+        self.assertEqual(devices['192.168.1.40'].hostname, 'printer')
+
+class TestPrioritizedBatch(unittest.TestCase):
+    """Тесты двухпроходного сканирования группы с историей портов"""
+    
+    def setUp(self):
+        FakePortScanner.calls = []
+        patcher = patch('src.scanner.network_scanner.nmap', SimpleNamespace(PortScanner=FakePortScanner))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+    
+    def test_fewer_probes_than_single_pass(self):
+        """Открытые порты первого прохода не запускают второй, если история не обещает находок"""
+        scanner = NetworkScanner(config={
+            'port_backend': 'nmap', 'banner_grabbing': False, 'ipv6_discovery': False,
+            'port_history_file': str(Path(self.tmp.name) / "port_history.json"),
+        })
+        scanner.is_scanning = True
+        history = scanner.port_history
+        candidates = history.candidates()
+        for _ in range(history.min_samples):
+            for info in NMAP_HOSTS.values():
+                history.record(None, None, candidates, [p for p, state in info['ports'].items() if state == 'open'])
+        
+        batch = [arp_info(ip) for ip in NMAP_HOSTS]
+        devices = {d.ip_address: d for d in scanner._scan_hosts(batch)}
+        
+        probes = sum(
+            len(hosts.split()) * len(re.search(r'-p (\S+)', arguments).group(1).split(','))
+            for hosts, arguments in FakePortScanner.calls
+        )
+        self.assertLess(probes, len(batch) * len(candidates))
+        # Один запуск nmap по портам первого прохода
+        self.assertEqual(len(FakePortScanner.calls), 1)
+        
+        self.assertEqual(devices['192.168.1.10'].open_ports, [22, 443])
+        self.assertEqual(devices['192.168.1.40'].open_ports, [9100])
+
+if __name__ == '__main__':
+    unittest.main()
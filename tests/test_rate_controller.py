@@ -0,0 +1,88 @@
+"""
+Тесты для адаптивного контроллера скорости сканирования
+"""
+
+import unittest
+
+from src.scanner.rate_controller import RateController, RttEstimator
+
+class TestRttEstimator(unittest.TestCase):
+    """Тесты оценки времени отклика"""
+    
+    def test_rfc6298_update_and_backoff(self):
+        """Тест сглаживания RTT и удвоения таймаута после потери"""
+        estimator = RttEstimator()
+        self.assertEqual(estimator.timeout(1.0, 0.01, 10.0), 1.0)
+        
+        estimator.update(0.1)
+        self.assertAlmostEqual(estimator.srtt, 0.1)
+        self.assertAlmostEqual(estimator.timeout(1.0, 0.01, 10.0), 0.1 + 4 * 0.05)
+        
+        estimator.on_loss()
+        self.assertAlmostEqual(estimator.timeout(1.0, 0.01, 10.0), 2 * (0.1 + 4 * 0.05))
+        
+        estimator.update(0.1)
+        self.assertEqual(estimator.backoff, 1)
+
+class TestRateController(unittest.TestCase):
+    """Тесты адаптации таймаутов, повторов и параллелизма"""
+    
+    def test_fast_lan_shrinks_timeout_and_grows_window(self):
+        """Тест быстрой сети: таймаут падает, окно растет до предела"""
+        controller = RateController('normal', max_parallelism=8, port_timeout=1.0)
+        self.assertEqual(controller.parallelism, 4)
+        
+        for _ in range(100):
+            controller.record_rtt('192.168.1.10', 0.002)
+        
+        self.assertEqual(controller.parallelism, 8)
+        self.assertLess(controller.timeout_for('192.168.1.10'), 0.1)
+        # Хост без замеров получает оценку своей подсети
+        self.assertLess(controller.timeout_for('192.168.1.20'), 0.1)
+        self.assertEqual(controller.timeout_for('10.0.0.1'), 1.0)
+    
+    def test_losses_halve_window_and_add_retries(self):
+        """Тест сети с потерями: окно уменьшается, повторов больше"""
+        controller = RateController('normal', max_parallelism=8)
+        base_retries = controller.retries_for('192.168.1.10')
+        
+        controller.record_loss('192.168.1.10')
+        self.assertEqual(controller.parallelism, 2)
+        
+        for _ in range(5):
+            controller.record_loss('192.168.1.10')
+        self.assertGreater(controller.retries_for('192.168.1.10'), base_retries)
+        self.assertGreaterEqual(controller.parallelism, 1)
+    
+    def test_timeout_is_not_loss(self):
+        """Тест фильтруемых портов: таймауты не сужают окно и не добавляют повторов"""
+        controller = RateController('normal', max_parallelism=8, port_timeout=1.0)
+        controller.record_rtt('192.168.1.10', 0.002)
+        parallelism = controller.parallelism
+        retries = controller.retries_for('192.168.1.10')
+        timeout = controller.timeout_for('192.168.1.10')
+        
+        for _ in range(20):
+            controller.record_timeout('192.168.1.10')
+        
+        self.assertEqual(controller.parallelism, parallelism)
+        self.assertEqual(controller.retries_for('192.168.1.10'), retries)
+        self.assertEqual(controller.timeout_for('192.168.1.10'), timeout)
+        
+        # Хост, не ответивший ни разу, получает увеличенный таймаут
+        silent = controller.timeout_for('192.168.1.20')
+        controller.record_timeout('192.168.1.20')
+        self.assertGreater(controller.timeout_for('192.168.1.20'), silent)
+    
+    def test_speed_profiles(self):
+        """Тест влияния scan_speed на параметры nmap"""
+        slow = RateController.from_config({'scan_speed': 'slow'}, max_parallelism=10)
+        fast = RateController.from_config({'scan_speed': 'fast'}, max_parallelism=10)
+        
+        self.assertIn('-T2', slow.nmap_arguments(['192.168.1.1']))
+        self.assertIn('-T5', fast.nmap_arguments(['192.168.1.1']))
+        self.assertGreater(slow.timeout_for('192.168.1.1'), fast.timeout_for('192.168.1.1'))
+        self.assertLess(slow.parallelism, fast.parallelism)
+
+if __name__ == '__main__':
+    unittest.main()
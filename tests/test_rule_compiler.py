@@ -0,0 +1,212 @@
+"""
+Тесты для компиляции правил классификации
+"""
+
+import random
+import time
+import unittest
+from unittest import mock
+
+from src.core.models import NetworkDevice, DeviceType
+from src.scanner.device_classifier import DeviceClassifier
+from src.scanner.keyword_matcher import KeywordMatcher
+from src.scanner.rule_compiler import Rule, RuleSet
+
+VENDORS = [None, "Cisco Systems", "HP Inc.", "Hewlett Packard", "Apple, Inc.", "Samsung",
+           "Xiaomi", "Philips Lighting", "Hikvision", "Dahua", "Canon", "SmartThings", "Intel"]
+HOSTNAMES = [None, "camera-hall", "printer-1", "desktop", "CAMERA2", "iot-hub", "nas"]
+PORTS = [22, 53, 67, 80, 139, 443, 445, 515, 554, 631, 1883, 3389, 5353, 8080, 9100, 37777, 62078]
+
+def reference_rules(device: NetworkDevice):
+    """Правила в исходной форме: последовательная проверка условий"""
+    ports = device.open_ports
+    vendor = device.vendor.lower() if device.vendor else None
+    
+    def any_port(*targets):
+        return any(port in ports for port in targets)
+    
+    def vendor_has(*keywords):
+        return vendor is not None and any(keyword in vendor for keyword in keywords)
+    
+    rules = [
+        (DeviceType.ROUTER, lambda: any_port(53, 67, 68)),
+        (DeviceType.ROUTER, lambda: device.ip_address.endswith('.1') or device.ip_address.endswith('.254')),
+        (DeviceType.ROUTER, lambda: vendor_has('cisco', 'mikrotik', 'asus', 'tp-link', 'ubiquiti')),
+        (DeviceType.COMPUTER, lambda: any_port(22, 3389, 445, 139)),
+        (DeviceType.COMPUTER, lambda: vendor_has('microsoft', 'apple', 'dell', 'hp', 'lenovo')),
+        (DeviceType.COMPUTER, lambda: len(ports) > 5),
+        (DeviceType.PHONE, lambda: vendor_has('apple', 'samsung', 'xiaomi', 'huawei')),
+        (DeviceType.PHONE, lambda: any_port(62078, 5353)),
+        (DeviceType.IOT, lambda: any_port(80) and len(ports) <= 3),
+        (DeviceType.IOT, lambda: vendor_has('philips', 'xiaomi', 'yeelight', 'smart')),
+        (DeviceType.IOT, lambda: 'camera' in device.hostname.lower() if device.hostname else False),
+        (DeviceType.PRINTER, lambda: any_port(9100, 515, 631)),
+        (DeviceType.PRINTER, lambda: vendor_has('hp', 'epson', 'canon', 'brother')),
+        (DeviceType.CAMERA, lambda: any_port(80, 554, 37777)),
+        (DeviceType.CAMERA, lambda: vendor_has('hikvision', 'dahua', 'camera')),
+    ]
+    for device_type, rule in rules:
+        if rule():
+            return device_type
+    return None
+
+def random_device(rng: random.Random) -> NetworkDevice:
+    return NetworkDevice(
+        ip_address=f"192.168.{rng.randint(0, 3)}.{rng.choice([1, 11, 21, 100, 254])}",
+        hostname=rng.choice(HOSTNAMES),
+        vendor=rng.choice(VENDORS),
+        open_ports=rng.sample(PORTS, rng.randint(0, 7)),
+    )
+
+class TestKeywordMatcher(unittest.TestCase):
+    """Тесты автомата поиска ключевых слов"""
+    
+    def test_overlapping_keywords(self):
+        """Находятся все слова, в том числе вложенные друг в друга"""
+        matcher = KeywordMatcher([("he", 1), ("she", 2), ("his", 4), ("hers", 8)])
+        
+        self.assertEqual(matcher.match("ushers"), 1 | 2 | 8)
+        self.assertEqual(matcher.match("this"), 4)
+        self.assertEqual(matcher.match("xyz"), 0)
+        self.assertEqual(matcher.match(""), 0)
+    
+    def test_same_keyword_for_several_masks(self):
+        """Маски одного слова объединяются"""
+        matcher = KeywordMatcher([("hp", 1), ("hp", 4), ("hpe", 2)])
+        
+        self.assertEqual(matcher.match("hpe aruba"), 1 | 2 | 4)
+        self.assertEqual(matcher.match("xhp"), 1 | 4)
+    
+    def test_categories(self):
+        """Все совпавшие категории сообщаются за один проход"""
+        matcher = KeywordMatcher.from_categories({
+            'printer': ['hp', 'canon'],
+            'computer': ['hp', 'dell'],
+            'camera': ['hikvision'],
+        })
+        
+        self.assertEqual(matcher.match_categories("hp inc."), ['printer', 'computer'])
+        self.assertEqual(matcher.match_categories("canon hikvision oem"), ['printer', 'camera'])
+        self.assertEqual(matcher.match_categories(None), [])
+    
+    def test_many_keywords(self):
+        """Сотни сигнатур производителей"""
+        matcher = KeywordMatcher.from_categories({f"vendor{index}": [f"vendor-{index:04d}"] for index in range(500)})
+        
+        self.assertEqual(matcher.match_categories("acme vendor-0042 / vendor-0499"), ['vendor42', 'vendor499'])
+    
+    def test_add_after_build_rejected(self):
+        matcher = KeywordMatcher([("a", 1)])
+        matcher.match("a")
+        
+        with self.assertRaises(RuntimeError):
+            matcher.add("b", 2)
+
+class TestRuleSet(unittest.TestCase):
+    """Тесты скомпилированного набора правил"""
+    
+    def test_first_matching_rule_wins(self):
+        rules = RuleSet([
+            (DeviceType.PRINTER, Rule(any_ports=(9100,))),
+            (DeviceType.COMPUTER, Rule(all_ports=(22, 445))),
+            (DeviceType.IOT, Rule(any_ports=(80,), max_ports=2)),
+        ])
+        
+        self.assertEqual(rules.match(NetworkDevice("10.0.0.5", open_ports=[22, 445, 9100])), DeviceType.PRINTER)
+        self.assertEqual(rules.match(NetworkDevice("10.0.0.5", open_ports=[445, 22])), DeviceType.COMPUTER)
+        self.assertIsNone(rules.match(NetworkDevice("10.0.0.5", open_ports=[22])))
+        self.assertEqual(rules.match(NetworkDevice("10.0.0.5", open_ports=[80, 22])), DeviceType.IOT)
+        self.assertIsNone(rules.match(NetworkDevice("10.0.0.5", open_ports=[80, 22, 443])))
+    
+    def test_distinct_port_count(self):
+        """Повторы портов не учитываются, если так задано"""
+        device = NetworkDevice("10.0.0.5", open_ports=[80, 80, 80, 80])
+        rule = [(DeviceType.IOT, Rule(any_ports=(80,), max_ports=3))]
+        
+        self.assertIsNone(RuleSet(rule).match(device))
+        self.assertEqual(RuleSet(rule, distinct_ports=True).match(device), DeviceType.IOT)
+    
+    def test_matches_sequential_rules(self):
+        """Результат совпадает с последовательной проверкой правил"""
+        classifier = DeviceClassifier()
+        rng = random.Random(42)
+        
+        for _ in range(5000):
+            device = random_device(rng)
+            self.assertEqual(classifier._rules.match(device), reference_rules(device), device)
+
+class TestDeviceClassifierRules(unittest.TestCase):
+    """Тесты классификатора на скомпилированных правилах"""
+    
+    def setUp(self):
+        self.classifier = DeviceClassifier()
+    
+    def test_classification_by_ports(self):
+        cases = [
+            ([], DeviceType.UNKNOWN),
+            ([9100, 22, 445], DeviceType.PRINTER),
+            ([3389], DeviceType.COMPUTER),
+            ([22, 445], DeviceType.COMPUTER),
+            ([80, 443], DeviceType.IOT),
+            ([53], DeviceType.ROUTER),
+            ([22], DeviceType.UNKNOWN),
+        ]
+        for ports, expected in cases:
+            device = NetworkDevice("10.0.0.5", open_ports=ports)
+            self.assertEqual(self.classifier.classify_device(device), expected, ports)
+    
+    def test_match_fingerprints(self):
+        with mock.patch.object(DeviceClassifier, '_load_fingerprints',
+                               lambda self: DeviceClassifier._default_fingerprints()):
+            classifier = DeviceClassifier()
+        
+        device = NetworkDevice("10.0.0.5", vendor="Xiaomi", hostname="dahua-nvr", open_ports=[8080])
+        self.assertEqual(classifier.match_fingerprints(device), ['cameras', 'iot'])
+        # Отпечаток: порт и ключевое слово в имени хоста
+        device = NetworkDevice("10.0.0.5", hostname="my-gateway", open_ports=[23])
+        self.assertEqual(classifier.classify_device(device), DeviceType.ROUTER)
+    
+    def test_one_shared_automaton(self):
+        """Правила, правила по портам и отпечатки ищут слова одним автоматом"""
+        with mock.patch.object(DeviceClassifier, '_load_fingerprints',
+                               lambda self: DeviceClassifier._default_fingerprints()):
+            classifier = DeviceClassifier()
+        
+        self.assertIs(classifier._rules._keywords, classifier._keywords)
+        self.assertIs(classifier._port_rules._keywords, classifier._keywords)
+        # Наборы слов отпечатков совпадают с наборами правил по портам и не дублируются
+        self.assertEqual(len(classifier._keywords.categories),
+                         len({rule.vendor_keywords for rules in classifier.rules.values() for rule in rules} - {()})
+                         + len({rule.hostname_keywords for rules in classifier.rules.values() for rule in rules} - {()})
+                         + len(classifier._fingerprint_bits))
+        
+        with mock.patch.object(classifier._keywords, 'match', wraps=classifier._keywords.match) as match:
+            classifier.classify_device(NetworkDevice("10.0.0.5", mac_address="02:00:00:00:00:01",
+                                                     vendor="Acme Camera", hostname="lobby", open_ports=[8000]))
+        # Одна строка - один проход: производитель и имя хоста
+        self.assertEqual(sorted(call.args[0] for call in match.call_args_list), ["acme camera", "lobby"])
+    
+    def test_asset_fingerprints_not_port_rules(self):
+        """Отпечатки assets (без ключевых слов) не участвуют в правилах по портам"""
+        with mock.patch.object(DeviceClassifier, '_load_fingerprints', lambda self: {
+            'hp_printer': {'vendor': 'HP', 'common_ports': [9100, 631], 'device_type': 'printer'}
+        }):
+            classifier = DeviceClassifier()
+        
+        self.assertEqual(len(classifier._port_rules), 5)
+        self.assertEqual(classifier.match_fingerprints(NetworkDevice("10.0.0.5", vendor="HP")), [])
+    
+    def test_inventory_throughput(self):
+        """100 тысяч записей классифицируются быстро"""
+        rng = random.Random(1)
+        devices = [random_device(rng) for _ in range(100000)]
+        
+        start = time.perf_counter()
+        for device in devices:
+            self.classifier._rules.match(device)
+        elapsed = time.perf_counter() - start
+        
+        self.assertLess(elapsed, 5.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Тесты для одновременного сканирования всех локальных сетей
+"""
+
+import threading
+import unittest
+from unittest.mock import patch
+
+from src.scanner.network_scanner import NetworkScanner
+
+INTERFACES = [
+    {'interface': 'eth0', 'network': '192.168.1.0/24'},
+    {'interface': 'wlan0', 'network': '10.0.0.0/24'},
+    {'interface': 'eth1', 'network': '172.16.0.0/24'},
+    # Второй адрес в уже известной сети не сканируется повторно
+    {'interface': 'eth0:1', 'network': '192.168.1.0/24'},
+]
+
+# Ноутбук подключен и по кабелю, и по Wi-Fi с одним MAC
+SHARED_MAC = 'aa:bb:cc:00:00:01'
+
+ARP_RESULTS = {
+    '192.168.1.0/24': [('192.168.1.10', SHARED_MAC), ('192.168.1.20', 'aa:bb:cc:00:00:20')],
+    '10.0.0.0/24': [('10.0.0.10', SHARED_MAC), ('10.0.0.30', 'aa:bb:cc:00:00:30')],
+    '172.16.0.0/24': [('172.16.0.40', 'aa:bb:cc:00:00:40')],
+}
+
+class TestScanAllNetworks(unittest.TestCase):
+    """Тесты iter_scan_all и scan_all_networks"""
+    
+    def setUp(self):
+        self.scanner = NetworkScanner(config={
+            'port_backend': 'asyncio', 'ipv6_discovery': False, 'banner_grabbing': False
+        })
+        self.arp_calls = []
+        self.scanned = []
+        self.threads = set()
+        self.lock = threading.Lock()
+        # Все сети должны оказаться в ARP-сканировании одновременно
+        self.barrier = threading.Barrier(len(ARP_RESULTS), timeout=5)
+        
+        def arp_scan(network, timeout=None, iface=None):
+            with self.lock:
+                self.arp_calls.append((network, iface))
+                self.threads.add(threading.current_thread().name)
+            self.barrier.wait()
+            return [self.scanner._make_arp_info(ip, mac, iface) for ip, mac in ARP_RESULTS[network]]
+        
+        def iter_hosts(arp_devices):
+            for arp_info in arp_devices:
+                with self.lock:
+                    self.scanned.append(arp_info['ip'])
+                port_info = {'open_ports': [22], 'os_info': None, 'hostname': None, 'status': 'up'}
+                yield arp_info, self.scanner.classify_device(arp_info, port_info)
+        
+        patchers = [
+            patch.object(self.scanner, 'get_local_interfaces', return_value=INTERFACES),
+            patch.object(self.scanner, 'arp_scan', side_effect=arp_scan),
+            patch.object(self.scanner, '_iter_hosts_async', side_effect=iter_hosts),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_concurrent_and_deduplicated(self):
+        """Сети сканируются параллельно, устройство с общим MAC - один раз"""
+        devices = list(self.scanner.iter_scan_all())
+        
+        self.assertTrue(self.scanner.last_scan_complete)
+        self.assertFalse(self.scanner.is_scanning)
+        self.assertEqual(
+            sorted(self.arp_calls),
+            [('10.0.0.0/24', 'wlan0'), ('172.16.0.0/24', 'eth1'), ('192.168.1.0/24', 'eth0')]
+        )
+        self.assertEqual(self.threads, {'scan-eth0', 'scan-wlan0', 'scan-eth1'})
+        
+        # Общий MAC достается той сети, что ответила первой
+        self.assertEqual(len(self.scanned), 4)
+        self.assertEqual(len(set(self.scanned)), 4)
+        self.assertEqual(len({'192.168.1.10', '10.0.0.10'} & set(self.scanned)), 1)
+        
+        macs = [d.mac_address for d in devices]
+        self.assertEqual(len(devices), 4)
+        self.assertEqual(macs.count(SHARED_MAC), 1)
+        
+        by_ip = {d.ip_address: d for d in devices}
+        self.assertEqual(by_ip['192.168.1.20'].interface, 'eth0')
+        self.assertEqual(by_ip['10.0.0.30'].interface, 'wlan0')
+        self.assertEqual(by_ip['172.16.0.40'].interface, 'eth1')
+    
+    def test_scan_all_networks_sorted(self):
+        """scan_all_networks возвращает общий список, отсортированный по адресу"""
+        devices = self.scanner.scan_all_networks()
+        addresses = [d.ip_address for d in devices]
+        
+        self.assertEqual(len(addresses), 4)
+        self.assertTrue(addresses[0].startswith('10.0.0.'))
+        self.assertEqual(addresses[-1], '192.168.1.20')
+        self.assertEqual(addresses, sorted(addresses, key=lambda ip: tuple(int(p) for p in ip.split('.'))))
+    
+    def test_failed_network_marks_incomplete(self):
+        """Ошибка в одной сети не прерывает остальные, но скан неполный"""
+        def arp_scan(network, timeout=None, iface=None):
+            if network == '172.16.0.0/24':
+                raise OSError("Интерфейс недоступен")
+            return [self.scanner._make_arp_info(ip, mac, iface) for ip, mac in ARP_RESULTS[network]]
+        
+        with patch.object(self.scanner, 'arp_scan', side_effect=arp_scan):
+            devices = list(self.scanner.iter_scan_all())
+        
+        self.assertFalse(self.scanner.last_scan_complete)
+        self.assertEqual(len(devices), 3)
+        self.assertNotIn('172.16.0.40', [d.ip_address for d in devices])
+
+if __name__ == '__main__':
+    unittest.main()
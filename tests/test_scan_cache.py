@@ -0,0 +1,186 @@
+"""
+Тесты для кэша результатов сканирования
+"""
+
+import tempfile
+import unittest
+from concurrent.futures import Future
+from pathlib import Path
+from unittest.mock import patch
+
+from src.core.models import DeviceType, NetworkDevice
+from src.scanner.network_scanner import NetworkScanner
+from src.scanner.scan_cache import ScanCache, ScanDiff
+
+NETWORK = "192.168.1.0/24"
+
+ARP_DEVICES = [
+    {'ip': '192.168.1.10', 'mac': 'aa:bb:cc:00:00:10', 'vendor': None, 'hostname': 'nas', 'interface': None},
+]
+
+BANNERS = {22: 'SSH-2.0-OpenSSH_8.9', 80: 'HTTP/1.1 200 OK'}
+HTTP_HEADERS = {'Server': 'nginx'}
+
+class TestScanCache(unittest.TestCase):
+    """Тесты записи, срока жизни и сохранения кэша"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "scan_cache.json"
+        self.now = 1_000_000.0
+        patcher = patch('src.scanner.scan_cache.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def _device(self, ip: str = '192.168.1.10', **kwargs) -> NetworkDevice:
+        return NetworkDevice(ip_address=ip, mac_address='aa:bb:cc:00:00:10', open_ports=[22, 80], **kwargs)
+    
+    def test_ttl_expiry(self):
+        """Запись актуальна до истечения TTL"""
+        cache = ScanCache(self.path, ttl=60)
+        cache.store(self._device())
+        
+        self.now += 59
+        self.assertEqual(cache.lookup(ARP_DEVICES[0])['open_ports'], [22, 80])
+        self.now += 2
+        self.assertIsNone(cache.lookup(ARP_DEVICES[0]))
+    
+    def test_lookup_by_mac_and_ip(self):
+        """Запись ищется по MAC в любом регистре и устаревает при смене IP"""
+        cache = ScanCache(self.path)
+        cache.store(self._device())
+        
+        self.assertIsNotNone(cache.lookup({'ip': '192.168.1.10', 'mac': 'AA-BB-CC-00-00-10'}))
+        self.assertIsNone(cache.lookup({'ip': '192.168.1.11', 'mac': 'aa:bb:cc:00:00:10'}))
+        self.assertIsNone(cache.lookup({'ip': '192.168.1.10', 'mac': None}))
+    
+    def test_store_without_rescan_keeps_age(self):
+        """rescanned=False обновляет запись, но не продлевает TTL"""
+        cache = ScanCache(self.path, ttl=60)
+        cache.store(self._device())
+        
+        self.now += 50
+        cache.store(self._device(hostname='nas'), rescanned=False)
+        self.assertEqual(cache.lookup(ARP_DEVICES[0])['hostname'], 'nas')
+        
+        self.now += 20
+        self.assertIsNone(cache.lookup(ARP_DEVICES[0]))
+        
+        # Новая запись без rescanned=False получает текущее время
+        cache.store(self._device())
+        self.assertIsNotNone(cache.lookup(ARP_DEVICES[0]))
+        
+        # Для неизвестного устройства время записи - текущее
+        cache.store(NetworkDevice(ip_address='192.168.1.20'), rescanned=False)
+        self.assertIsNotNone(cache.lookup({'ip': '192.168.1.20', 'mac': None}))
+    
+    def test_save_and_load(self):
+        """Кэш переживает сохранение и загрузку"""
+        cache = ScanCache(self.path)
+        cache.store(self._device(banners={22: 'SSH-2.0-dropbear'}))
+        cache.store(NetworkDevice(ip_address='10.0.0.5'))
+        cache.save()
+        
+        loaded = ScanCache(self.path)
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(loaded.lookup(ARP_DEVICES[0])['banners'], {22: 'SSH-2.0-dropbear'})
+        self.assertEqual([d.ip_address for d in loaded.devices(NETWORK)], ['192.168.1.10'])
+        
+        loaded.remove(self._device())
+        self.assertEqual(len(loaded), 1)
+
+class TestScanDiff(unittest.TestCase):
+    """Тесты сравнения двух сканирований"""
+    
+    def test_added_removed_changed(self):
+        """Устройства сопоставляются по MAC, без MAC - по IP"""
+        previous = [
+            NetworkDevice(ip_address='192.168.1.10', mac_address='aa:bb:cc:00:00:10', open_ports=[22, 80]),
+            NetworkDevice(ip_address='192.168.1.20', mac_address='aa:bb:cc:00:00:20'),
+            NetworkDevice(ip_address='192.168.1.30', mac_address='aa:bb:cc:00:00:30', open_ports=[443]),
+            NetworkDevice(ip_address='192.168.1.40'),
+        ]
+        current = [
+            # Порядок портов не важен
+            NetworkDevice(ip_address='192.168.1.10', mac_address='AA:BB:CC:00:00:10', open_ports=[80, 22]),
+            # Сменил IP
+            NetworkDevice(ip_address='192.168.1.21', mac_address='aa:bb:cc:00:00:20'),
+            NetworkDevice(ip_address='192.168.1.30', mac_address='aa:bb:cc:00:00:30',
+                          open_ports=[443], device_type=DeviceType.PRINTER),
+            NetworkDevice(ip_address='192.168.1.50'),
+        ]
+        
+        diff = ScanDiff.compute(previous, current)
+        
+        self.assertEqual([d.ip_address for d in diff.added], ['192.168.1.50'])
+        self.assertEqual([d.ip_address for d in diff.removed], ['192.168.1.40'])
+        self.assertEqual(
+            [(old.ip_address, new.ip_address) for old, new in diff.changed],
+            [('192.168.1.20', '192.168.1.21'), ('192.168.1.30', '192.168.1.30')]
+        )
+        self.assertTrue(diff.has_changes)
+        self.assertEqual(diff.to_dict()['changed'][1]['after']['device_type'], 'printer')
+    
+    def test_no_changes(self):
+        """Сравнение одинаковых сканирований"""
+        devices = [NetworkDevice(ip_address='192.168.1.10', mac_address='aa:bb:cc:00:00:10', risk_score=0.9)]
+        same = [NetworkDevice(ip_address='192.168.1.10', mac_address='aa:bb:cc:00:00:10', risk_score=0.1)]
+        
+        diff = ScanDiff.compute(devices, same)
+        self.assertFalse(diff.has_changes)
+        self.assertEqual(ScanDiff.compute([], []).to_dict(), {'added': [], 'removed': [], 'changed': []})
+
+class TestIncrementalScan(unittest.TestCase):
+    """Тесты инкрементального сканирования через кэш"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "scan_cache.json"
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_cached_hosts_keep_banners(self):
+        """Устройства из кэша отдаются с баннерами и не теряют их в кэше"""
+        scanner = NetworkScanner(config={
+            'port_backend': 'asyncio', 'ipv6_discovery': False,
+            'fingerprint_db_file': str(Path(self.tmp.name) / "fingerprints.db")
+        })
+        self.addCleanup(scanner.close)
+        scanned = []
+        
+        def fake_hosts(arp_devices):
+            for arp_info in arp_devices:
+                scanned.append(arp_info['ip'])
+                port_info = {'open_ports': [22, 80], 'os_info': None, 'hostname': None, 'status': 'up'}
+                yield arp_info, scanner.classify_device(arp_info, port_info)
+        
+        def fake_submit(ip, ports):
+            future = Future()
+            future.set_result({'banners': dict(BANNERS), 'http_headers': dict(HTTP_HEADERS)})
+            return future
+        
+        with patch.object(scanner, 'arp_scan', return_value=ARP_DEVICES), \
+                patch.object(scanner, '_iter_hosts_async', side_effect=fake_hosts), \
+                patch.object(scanner.banner_grabber, 'submit', side_effect=fake_submit) as submit:
+            first, _ = scanner.incremental_scan(NETWORK, cache=ScanCache(self.path))
+            second, diff = scanner.incremental_scan(NETWORK, cache=ScanCache(self.path))
+        
+        self.assertEqual(scanned, ['192.168.1.10'])
+        self.assertEqual(submit.call_count, 1)
+        self.assertEqual(first[0].banners, BANNERS)
+        
+        self.assertEqual(second[0].open_ports, [22, 80])
+        self.assertEqual(second[0].banners, BANNERS)
+        self.assertEqual(second[0].http_headers, HTTP_HEADERS)
+        self.assertFalse(diff.has_changes)
+        
+        cached = ScanCache(self.path).devices(NETWORK)
+        self.assertEqual(cached[0].banners, BANNERS)
+        self.assertEqual(cached[0].http_headers, HTTP_HEADERS)
+
+if __name__ == '__main__':
+    unittest.main()
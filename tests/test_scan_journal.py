@@ -0,0 +1,142 @@
+"""
+Тесты для журнала контрольных точек сканирования
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.core.models import NetworkDevice
+from src.scanner.network_scanner import NetworkScanner
+from src.scanner.scan_journal import ScanJournal
+
+NETWORK = "192.168.1.0/24"
+
+ARP_DEVICES = [
+    {'ip': '192.168.1.10', 'mac': 'aa:bb:cc:00:00:10', 'vendor': None, 'hostname': 'pc', 'interface': None},
+    {'ip': '192.168.1.20', 'mac': 'aa:bb:cc:00:00:20', 'vendor': None, 'hostname': 'tv', 'interface': None},
+]
+
+class TestScanJournal(unittest.TestCase):
+    """Тесты записи журнала и возобновления сканирования"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "scan.jsonl"
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_resume_restores_progress(self):
+        """Повторное открытие с resume восстанавливает ARP и готовые хосты"""
+        with ScanJournal(self.path) as journal:
+            journal.record_arp(NETWORK, ARP_DEVICES)
+            journal.record_host(NETWORK, NetworkDevice(ip_address='192.168.1.10', open_ports=[22]))
+        
+        # Недописанная строка после сбоя игнорируется
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"type": "host", "netw')
+        
+        with ScanJournal(self.path, resume=True) as journal:
+            self.assertEqual(journal.arp_results(NETWORK), ARP_DEVICES)
+            self.assertEqual(list(journal.finished_devices(NETWORK)), ['192.168.1.10'])
+            self.assertFalse(journal.is_complete(NETWORK))
+        
+        with ScanJournal(self.path) as journal:
+            self.assertIsNone(journal.arp_results(NETWORK))
+    
+    def test_scanner_skips_finished_hosts(self):
+        """При возобновлении сканируются только незавершенные хосты"""
+        with ScanJournal(self.path) as journal:
+            journal.record_arp(NETWORK, ARP_DEVICES)
+            journal.record_host(NETWORK, NetworkDevice(ip_address='192.168.1.10', open_ports=[22]))
+        
+        scanner = NetworkScanner(config={'port_backend': 'asyncio', 'ipv6_discovery': False})
+        scanned = []
+        
+        def fake_hosts(arp_devices):
+            for arp_info in arp_devices:
+                scanned.append(arp_info['ip'])
+                yield arp_info, NetworkDevice(ip_address=arp_info['ip'], mac_address=arp_info['mac'])
+        
+        with ScanJournal(self.path, resume=True) as journal, \
+                patch.object(scanner, 'arp_scan') as arp_scan, \
+                patch.object(scanner, '_iter_hosts_async', side_effect=fake_hosts):
+            devices = scanner.scan_network(NETWORK, journal=journal)
+            arp_scan.assert_not_called()
+        
+        self.assertEqual(scanned, ['192.168.1.20'])
+        self.assertEqual(sorted(d.ip_address for d in devices), ['192.168.1.10', '192.168.1.20'])
+        self.assertTrue(scanner.last_scan_complete)
+        
+        with ScanJournal(self.path, resume=True) as journal:
+            self.assertTrue(journal.is_complete(NETWORK))
+            self.assertEqual(len(journal.finished_devices(NETWORK)), 2)
+    
+    def test_resume_after_sharded_sweep(self):
+        """Устройства, записанные до ARP-записи большой сети, не теряются при возобновлении"""
+        network = "10.0.0.0/22"
+        hosts = [(f"10.0.{i}.1", f"aa:bb:cc:00:01:0{i}") for i in range(4)]
+        config = {'port_backend': 'asyncio', 'ipv6_discovery': False,
+                  'banner_grabbing': False, 'arp_batch_size': 2}
+        
+        def run(journal, fail_on=None):
+            scanner = NetworkScanner(config=config)
+            scanned = []
+            
+            def fake_arp(network, iface=None, timeout=None):
+                for ip, mac in hosts:
+                    yield scanner._make_arp_info(ip, mac, iface)
+            
+            def fake_hosts(arp_devices):
+                for arp_info in arp_devices:
+                    if arp_info['ip'] == fail_on:
+                        raise RuntimeError("Сбой сканирования")
+                    scanned.append(arp_info['ip'])
+                    yield arp_info, NetworkDevice(ip_address=arp_info['ip'], mac_address=arp_info['mac'])
+            
+            with patch.object(scanner, 'iter_arp_scan', side_effect=fake_arp), \
+                    patch.object(scanner, '_iter_hosts_async', side_effect=fake_hosts):
+                try:
+                    devices = scanner.scan_network(network, journal=journal)
+                except RuntimeError:
+                    devices = None
+            return scanned, devices
+        
+        # Сбой во второй группе: ARP-записи еще нет, готовы два устройства
+        with ScanJournal(self.path) as journal:
+            scanned, _ = run(journal, fail_on="10.0.3.1")
+        self.assertEqual(scanned, ["10.0.0.1", "10.0.1.1", "10.0.2.1"])
+        
+        with ScanJournal(self.path, resume=True) as journal:
+            self.assertIsNone(journal.arp_results(network))
+            self.assertEqual(len(journal.finished_devices(network)), 3)
+            scanned, devices = run(journal)
+        self.assertEqual(scanned, ["10.0.3.1"])
+        self.assertEqual(len(devices), 4)
+        
+        # ARP-запись идет после устройств и не сбрасывает их
+        with ScanJournal(self.path, resume=True) as journal:
+            self.assertEqual(len(journal.arp_results(network)), 4)
+            self.assertEqual(len(journal.finished_devices(network)), 4)
+            self.assertTrue(journal.is_complete(network))
+    
+    def test_new_scan_after_complete(self):
+        """Запись после отметки о завершении начинает новое сканирование сети"""
+        with ScanJournal(self.path) as journal:
+            journal.record_arp(NETWORK, ARP_DEVICES)
+            journal.record_host(NETWORK, NetworkDevice(ip_address='192.168.1.10'))
+            journal.record_host(NETWORK, NetworkDevice(ip_address='192.168.1.20'))
+            journal.record_complete(NETWORK)
+            journal.record_host(NETWORK, NetworkDevice(ip_address='192.168.1.20'))
+            self.assertEqual(list(journal.finished_devices(NETWORK)), ['192.168.1.20'])
+        
+        with ScanJournal(self.path, resume=True) as journal:
+            self.assertIsNone(journal.arp_results(NETWORK))
+            self.assertEqual(list(journal.finished_devices(NETWORK)), ['192.168.1.20'])
+            self.assertFalse(journal.is_complete(NETWORK))
+
+
+if __name__ == '__main__':
+    unittest.main()